@@ -1,10 +1,29 @@
 import streamlit as st
 import pandas as pd
-import requests
-import re
 import time
 import io
-from supabase import create_client
+from executor import BatchExecutor
+from db import (
+    COLUMN_MAP, REVERSE_COLUMN_MAP, LIST_COLUMNS, EDITABLE_COLUMNS, supabase, artifacts,
+    TASK_SORTS, DEFAULT_SORT, DEFAULT_PAGE_SIZE, fetch_task_page, task_cursor, fetch_task_rows, count_task_page,
+    fetch_rows_by_ids, fetch_tasks_page, bulk_update_cells,
+    find_existing_tasks, insert_tasks, upsert_tasks
+)
+from exporter import EXPORT_FORMATS, export_tasks
+from stages import (
+    STAGES, STAGE_DEFS, WRITING_RESTART_STATUS, configured_cache_modes, configured_concurrency,
+    configured_writing_context, dify_cache, metrics, process_row, workflow_guard
+)
+from dify_cache import CACHE_MODES, use_cache_modes
+from writing_context import CONTEXT_MODES, use_writing_context
+from telemetry import summarize, timeline
+from importer import (
+    SKIP, MERGE, DEFAULT_BATCH_SIZE, import_chunks, iter_import_chunks, read_import_preview
+)
+from job_queue import SupabaseJobQueue, QUEUED_STATUS
+from pipeline import PipelineScheduler, HELD
+from task_table import TaskTable
+from profiler import RerunProfiler, new_history, timed_fragment
 
 # --- KONFIGURACJA STRONY ---
 st.set_page_config(page_title="SEO 3.0 Content Factory", page_icon="🏭", layout="wide")
@@ -19,45 +38,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- MAPOWANIE KOLUMN (BAZA -> UI) ---
-COLUMN_MAP = {
-    'id': 'ID',
-    'keyword': 'Słowo kluczowe',
-    'language': 'Język',
-    'aio_prompt': 'AIO',
-    'status_research': 'Status Research',
-    'serp_phrases': 'Frazy z wyników',
-    'senuto_phrases': 'Frazy Senuto',
-    'info_graph': 'Graf informacji',
-    'competitors_headers': 'Nagłówki konkurencji',
-    'knowledge_graph': 'Knowledge graph',
-    'status_headers': 'Status Nagłówki',
-    'headers_expanded': 'Nagłówki rozbudowane',
-    'headers_h2': 'Nagłówki H2',
-    'headers_questions': 'Nagłówki pytania',
-    'headers_final': 'Nagłówki (Finalne)',
-    'status_rag': 'Status RAG',
-    'rag_content': 'RAG',
-    'rag_general': 'RAG General',
-    'status_brief': 'Status Brief',
-    'brief_json': 'Brief',
-    'brief_html': 'Brief plik',
-    'instructions': 'Dodatkowe instrukcje',
-    'status_writing': 'Status Generacja',
-    'final_article': 'Generowanie contentu'
-}
-
-REVERSE_COLUMN_MAP = {v: k for k, v in COLUMN_MAP.items()}
-
-# --- SUPABASE INIT ---
-@st.cache_resource
-def init_supabase():
-    url = st.secrets["SUPABASE"]["URL"]
-    key = st.secrets["SUPABASE"]["KEY"]
-    return create_client(url, key)
-
-supabase = init_supabase()
-
 # --- FUNKCJE POMOCNICZE EXCEL ---
 
 def to_excel(df):
@@ -68,49 +48,104 @@ def to_excel(df):
         df.to_excel(writer, index=False, sheet_name='SEO Content')
     return output.getvalue()
 
+@st.cache_data(show_spinner=False)
 def generate_template_excel():
-    """Generuje pusty szablon do importu."""
+    """Generuje pusty szablon do importu (raz na proces; cache unieważnia zmiana kodu funkcji)."""
     # Tworzymy pusty DF z sugerowanymi kolumnami
     df_template = pd.DataFrame(columns=["Słowo kluczowe", "Język", "AIO"])
     # Dodajemy przykładowy wiersz
     df_template.loc[0] = ["Przykład: Jaki rower kupić", "pl", "Tutaj wpisz opcjonalne instrukcje AIO"]
     return to_excel(df_template)
 
-# --- FUNKCJE DIFY ---
-def run_dify_workflow(api_key, inputs, user_id="streamlit_user"):
-    url = f"{st.secrets['dify']['BASE_URL']}/workflows/run"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "inputs": inputs,
-        "response_mode": "blocking",
-        "user": user_id
+# --- KONFIGURACJA TABELI ---
+# Ustawiamy szerokość na ~200px (approx 3-4cm) dla kolumn tekstowych
+# ID i Język - małe i wyśrodkowane (via CSS hack na górze + mała szerokość)
+PREVIEW_HELP = "Podgląd - pełna treść w szczegółach artykułu poniżej"
+
+@st.cache_data(show_spinner=False)
+def build_column_config():
+    """Konfiguracja kolumn st.data_editor (statyczna - budowana raz, cache unieważnia zmiana kodu funkcji)."""
+    return {
+        "Select": st.column_config.CheckboxColumn("Zaznacz", default=False, width="small"),
+        "ID": st.column_config.NumberColumn(width="small", disabled=True, format="%d"),
+        "Słowo kluczowe": st.column_config.TextColumn(width=200),
+        "Język": st.column_config.TextColumn(width="small"),
+        "AIO": st.column_config.TextColumn(width=200),
+        
+        # Statusy
+        "Status Research": st.column_config.TextColumn(width="small"),
+        "Status Nagłówki": st.column_config.TextColumn(width="small"),
+        "Status RAG": st.column_config.TextColumn(width="small"),
+        "Status Brief": st.column_config.TextColumn(width="small"),
+        "Status Generacja": st.column_config.TextColumn(width="small"),
+
+        # Dane merytoryczne - szerokość ok. 3-4cm (medium/200px)
+        # Kolumny ciężkie pokazują tylko podgląd i są tylko do odczytu
+        "Frazy z wyników": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Frazy Senuto": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Graf informacji": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Nagłówki konkurencji": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Knowledge graph": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Nagłówki rozbudowane": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Nagłówki H2": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Nagłówki pytania": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Nagłówki (Finalne)": st.column_config.TextColumn(width=300, help="Główne źródło do generowania"), # Trochę szersze dla wygody
+        "RAG": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "RAG General": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Brief": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Brief plik": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
+        "Dodatkowe instrukcje": st.column_config.TextColumn(width=200),
+        "Generowanie contentu": st.column_config.TextColumn(width=200, disabled=True, help=PREVIEW_HELP),
     }
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=450)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        return {"error": str(e)}
 
 # --- OBSŁUGA DANYCH ---
 
-def fetch_data():
-    """Pobiera dane i dodaje kolumnę 'Select' do zaznaczania."""
-    response = supabase.table("seo_content_tasks").select("*").order("id", desc=True).execute()
-    data = response.data
-    if not data:
-        return pd.DataFrame(columns=['Select'] + list(COLUMN_MAP.values()))
-    
-    df = pd.DataFrame(data)
-    df = df.rename(columns=COLUMN_MAP)
+def get_task_table():
+    """Strona listy zadań trzymana w sesji między rerunami (odświeżana przyrostowo)."""
+    if "task_table" not in st.session_state:
+        st.session_state["task_table"] = TaskTable(
+            COLUMN_MAP, fetch_task_page, task_cursor, fetch_task_rows, count_task_page, DEFAULT_PAGE_SIZE
+        )
+    return st.session_state["task_table"]
+
+def fetch_data(query=None, page_size=DEFAULT_PAGE_SIZE):
+    """Pobiera bieżącą stronę listy i dodaje kolumnę 'Select' do zaznaczania.
+
+    Filtry, wyszukiwanie i sortowanie wykonuje baza; tylko kolumny lekkie i podgląd ciężkich.
+    Z bazy przychodzą tylko wiersze strony zmienione od poprzedniego reruna. Gdy edytor ma
+    niezapisane zmiany (albo zaznaczenie), zwracana jest ta sama strona co przy ostatnim
+    pokazaniu - edycje st.data_editor są kluczowane pozycją wiersza.
+    """
+    table = get_task_table()
+    if editor_has_edits() and "task_table_frame" in st.session_state:
+        frame = st.session_state["task_table_frame"]
+    else:
+        table.set_query(query or {}, page_size)
+        table.refresh()
+        frame = st.session_state["task_table_frame"] = table.frame
+        st.session_state["task_table_shown"] = table.version
+    df = frame.reset_index(drop=True).rename(columns=COLUMN_MAP)
     df.insert(0, 'Select', False)
     return df
 
-def update_db_record(row_id, updates):
-    supabase.table("seo_content_tasks").update(updates).eq("id", row_id).execute()
+@st.cache_data(ttl=60, max_entries=32, show_spinner=False)
+def fetch_task_detail(row_id, version):
+    """Pełny wiersz do podglądu. `version` (statusy wiersza) unieważnia cache po zmianie etapu."""
+    rows = fetch_rows_by_ids([row_id])
+    return rows[0] if rows else None
+
+def load_full_rows(selected_rows):
+    """Dociąga kolumny ciężkie dla wierszy do przetworzenia; niezapisane edycje z tabeli mają pierwszeństwo."""
+    full = {row['ID']: row for row in fetch_rows_by_ids([row['ID'] for row in selected_rows])}
+    edited_cols = [COLUMN_MAP[c] for c in LIST_COLUMNS]
+    merged = []
+    for row in selected_rows:
+        base = full.get(row['ID'])
+        if base is None:
+            continue
+        base.update({col: row[col] for col in edited_cols if col in row})
+        merged.append(base)
+    return merged
 
 def delete_records(ids_list):
     """Usuwa rekordy z bazy na podstawie listy ID."""
@@ -118,149 +153,484 @@ def delete_records(ids_list):
         return
     supabase.table("seo_content_tasks").delete().in_("id", ids_list).execute()
 
-def save_manual_changes(edited_df):
-    df_to_save = edited_df.drop(columns=['Select'], errors='ignore')
-    df_to_save = df_to_save.rename(columns=REVERSE_COLUMN_MAP)
-    records = df_to_save.to_dict('records')
-    
-    progress_text = "Zapisywanie zmian..."
-    my_bar = st.progress(0, text=progress_text)
-    total = len(records)
-    for i, record in enumerate(records):
-        if record.get('id'):
-            supabase.table("seo_content_tasks").upsert(record).execute()
-        my_bar.progress((i + 1) / total, text=f"Zapisano wiersz {i+1}/{total}")
-    my_bar.empty()
-    st.success("Zmiany zapisane w bazie!")
-
-def extract_headers_from_text(text):
-    if not isinstance(text, str): return []
-    html_headers = re.findall(r'<h2.*?>(.*?)</h2>', text, re.IGNORECASE)
-    if html_headers:
-        return [re.sub(r'<.*?>', '', h).strip() for h in html_headers]
-    return [line.strip() for line in text.split('\n') if line.strip()]
-
-# --- LOGIKA BIZNESOWA (ETAPY) ---
-# (Funkcje stage_research, stage_headers, stage_rag, stage_brief, stage_writing
-# pozostają bez zmian w logice, więc dla czytelności kodu wklejam je skrótowo,
-# ale w pełnym pliku muszą tam być)
-
-def stage_research(row):
-    inputs = {"keyword": row['Słowo kluczowe'], "language": row['Język'], "aio": row['AIO'] if row['AIO'] else ""}
-    resp = run_dify_workflow(st.secrets['dify']['API_KEY_RESEARCH'], inputs)
-    if "data" in resp and "outputs" in resp["data"]:
-        out = resp["data"]["outputs"]
-        return {
-            "status_research": "✅ Gotowe",
-            "serp_phrases": out.get("frazy z serp", ""),
-            "senuto_phrases": out.get("frazy_senuto", ""),
-            "info_graph": out.get("grafinformacji", ""),
-            "competitors_headers": out.get("naglowki", ""),
-            "knowledge_graph": out.get("knowledge_graph", "")
-        }
-    else:
-        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
-
-def stage_headers(row):
-    frazy_full = f"{row['Frazy z wyników']}\n{row['Frazy Senuto']}"
-    inputs = {"keyword": row['Słowo kluczowe'], "language": row['Język'], "frazy": frazy_full, "graf": row['Graf informacji'], "headings": row['Nagłówki konkurencji']}
-    resp = run_dify_workflow(st.secrets['dify']['API_KEY_HEADERS'], inputs)
-    if "data" in resp and "outputs" in resp["data"]:
-        out = resp["data"]["outputs"]
-        h2 = out.get("naglowki_h2", "")
-        questions = out.get("naglowki_pytania", "")
-        final_headers = row['Nagłówki (Finalne)']
-        if not final_headers: final_headers = questions if questions else h2
-        return {
-            "status_headers": "✅ Gotowe",
-            "headers_expanded": out.get("naglowki_rozbudowane", ""),
-            "headers_h2": h2,
-            "headers_questions": questions,
-            "headers_final": final_headers
-        }
-    else:
-        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
-
-def stage_rag(row):
-    inputs = {"keyword": row['Słowo kluczowe'], "language": row['Język'], "headings": row['Nagłówki konkurencji']}
-    resp = run_dify_workflow(st.secrets['dify']['API_KEY_RAG'], inputs)
-    if "data" in resp and "outputs" in resp["data"]:
-        out = resp["data"]["outputs"]
-        return {"status_rag": "✅ Gotowe", "rag_content": out.get("dokladne", ""), "rag_general": out.get("ogolne", "")}
-    else:
-        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
-
-def stage_brief(row):
-    h2_source = row['Nagłówki H2'] if row['Nagłówki H2'] else row['Nagłówki (Finalne)']
-    if not h2_source: raise Exception("Brak nagłówków H2 do stworzenia briefu.")
-    frazy_full = f"{row['Frazy z wyników']}\n{row['Frazy Senuto']}"
-    inputs = {"keyword": row['Słowo kluczowe'], "keywords": frazy_full, "headings": h2_source, "knowledge_graph": row['Knowledge graph'], "information_graph": row['Graf informacji']}
-    resp = run_dify_workflow(st.secrets['dify']['API_KEY_BRIEF'], inputs)
-    if "data" in resp and "outputs" in resp["data"]:
-        out = resp["data"]["outputs"]
-        return {"status_brief": "✅ Gotowe", "brief_json": out.get("brief", ""), "brief_html": out.get("html", "")}
+def editor_key():
+    """Klucz st.data_editor; nowa generacja (po zapisie / cofnięciu) czyści edycje trzymane przez widget."""
+    return f"data_editor_{st.session_state.get('editor_generation', 0)}"
+
+def reset_editor():
+    st.session_state["editor_generation"] = st.session_state.get("editor_generation", 0) + 1
+
+def snapshot_editor_rows(df):
+    """Zapamiętuje, co pokazano w edytorze: ID wiersza na każdej pozycji i wczytane komórki edytowalne.
+
+    Edycje st.data_editor są kluczowane pozycją wiersza, a zapis porównuje je z tą migawką -
+    nie z tabelą pobraną ponownie w rerunie zapisu (ta zawiera już zmiany z batchy i workera).
+    """
+    editable = df[[COLUMN_MAP[c] for c in EDITABLE_COLUMNS]].astype(object)
+    editable = editable.where(editable.notna(), None)
+    ids = [int(i) for i in df['ID']]
+    st.session_state["editor_snapshot"] = {
+        "ids": ids,
+        "cells": {row_id: dict(zip(EDITABLE_COLUMNS, values)) for row_id, values in zip(ids, editable.itertuples(index=False))},
+    }
+
+def diff_editor_changes(snapshot, edited_rows):
+    """Zmiany z edytora: {id: {kolumna_db: (wczytana, nowa)}} tylko dla komórek różnych od migawki.
+
+    `edited_rows`: {pozycja: {kolumna_ui: wartość}} ze stanu st.data_editor.
+    """
+    editable = {COLUMN_MAP[col]: col for col in EDITABLE_COLUMNS}
+    changes = {}
+    for position, cells in edited_rows.items():
+        row_id = snapshot["ids"][int(position)]
+        loaded_row = snapshot["cells"][row_id]
+        for ui_col, new in cells.items():
+            col = editable.get(ui_col)
+            if col is None:
+                continue
+            loaded = loaded_row[col]
+            if (loaded if loaded is not None else "") != (new if new is not None else ""):
+                changes.setdefault(row_id, {})[col] = (loaded, new)
+    return changes
+
+def save_manual_changes():
+    """Callback przycisku zapisu - działa przed rerunem, więc widzi migawkę tabeli, którą edytowano."""
+    state = st.session_state.get(editor_key()) or {}
+    snapshot = st.session_state.get("editor_snapshot")
+    changes = diff_editor_changes(snapshot, state.get("edited_rows", {})) if snapshot else {}
+    if not changes:
+        st.session_state["save_message"] = ("info", "Brak zmian do zapisania.")
+        return
+    saved, conflicts = bulk_update_cells(changes)
+    message = f"Zmiany zapisane w bazie! Zaktualizowano wierszy: {saved}"
+    if conflicts:
+        details = ", ".join(f"#{row_id}" + (f" ({COLUMN_MAP[col]})" if col else " (usunięty)") for row_id, col in conflicts[:20])
+        st.session_state["save_message"] = (
+            "warning", f"{message}. Pominięto {len(conflicts)} komórek zmienionych w międzyczasie w bazie: {details}"
+        )
     else:
-        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
-
-def stage_writing(row):
-    headers_text = row['Nagłówki (Finalne)']
-    headers_list = extract_headers_from_text(headers_text)
-    if not headers_list: raise Exception("Pusta kolumna 'Nagłówki (Finalne)'.")
-    full_knowledge = f"{row['RAG']}\n{row['RAG General']}"
-    full_keywords = f"{row['Frazy z wyników']}, {row['Frazy Senuto']}"
-    article_content = ""
-    for h2 in headers_list:
-        inputs = {
-            "naglowek": h2, "language": row['Język'], "knowledge": full_knowledge, "keywords": full_keywords,
-            "headings": row['Nagłówki rozbudowane'], "done": article_content, "keyword": row['Słowo kluczowe'], "instruction": row['Dodatkowe instrukcje']
-        }
-        resp = run_dify_workflow(st.secrets['dify']['API_KEY_WRITE'], inputs)
-        if "data" in resp and "outputs" in resp["data"]:
-            section = resp["data"]["outputs"].get("result", "")
-            article_content += f"<h2>{h2}</h2>\n{section}\n\n"
-        else:
-            article_content += f"<h2>{h2}</h2>\n[BŁĄD GENEROWANIA: {resp.get('error')}]\n\n"
-    return {"status_writing": "✅ Gotowe", "final_article": article_content}
+        st.session_state["save_message"] = ("success", message)
+    reset_editor()
+
+# --- ODŚWIEŻANIE NA ŻYWO ---
+LIVE_REFRESH_SECONDS = 5    # gdy któryś wiersz jest w toku / w kolejce
+IDLE_REFRESH_SECONDS = 30
+ACTIVE_STATUS_PREFIXES = ("🔄", "⏳")
+
+def has_active_jobs(frame):
+    return any(
+        frame[STAGE_DEFS[stage][1]].astype(str).str.startswith(ACTIVE_STATUS_PREFIXES).any() for stage in STAGES
+    )
+
+def editor_has_edits():
+    state = st.session_state.get(editor_key()) or {}
+    return any(state.get(key) for key in ("edited_rows", "added_rows", "deleted_rows"))
+
+def live_status():
+    """Fragment odświeżany cyklicznie: statusy etapów z bazy (zmiany z workerów i innych sesji)."""
+    table = get_task_table()
+    table.refresh(max_age=LIVE_REFRESH_SECONDS / 2)
+    if table.version != st.session_state.get("task_table_shown"):
+        if not editor_has_edits():
+            st.rerun()
+        st.caption("🔔 W bazie są nowsze dane - zapisz lub cofnij zmiany w tabeli, aby ją odświeżyć.")
+    counts = []
+    for stage in STAGES:
+        statuses = table.frame[STAGE_DEFS[stage][1]].astype(str)
+        counts.append(
+            f"**{stage.upper()}** ✅ {statuses.str.startswith('✅').sum()} 🔄 {statuses.str.startswith('🔄').sum()} "
+            f"⏳ {statuses.str.startswith('⏳').sum()} ❌ {statuses.str.startswith('❌').sum()}"
+        )
+    st.markdown(" | ".join(counts))
+    st.caption(f"Bieżąca strona, stan z {time.strftime('%H:%M:%S')}")
 
 # --- UNIWERSALNY PROCESOR BATCHOWY ---
-def run_batch_process(selected_rows, process_func, status_col_db, success_msg):
+EXECUTION_MODES = ["W tej sesji", "Kolejka (worker)"]
+STATUS_FILTERS = ["Wszystkie", "Oczekuje", "⏳ W kolejce", "🔄 W trakcie", "✅ Gotowe", "❌ Błąd"]
+SORT_LABELS = {"newest": "Najnowsze", "oldest": "Najstarsze", "keyword": "Słowo kluczowe A-Z", "updated": "Ostatnio zmienione"}
+PAGE_SIZES = [50, 100, 250, 500]
+CACHE_MODE_LABELS = {"use": "Użyj", "refresh": "Odśwież", "bypass": "Pomiń"}
+METRIC_WINDOWS = {"1 godzina": (3600, "5min"), "24 godziny": (86400, "1h"), "7 dni": (7 * 86400, "6h")}
+CONTEXT_MODE_LABELS = {
+    "full": "Cały artykuł", "window": "Okno + konspekt", "outline": "Tylko nagłówki", "summary": "Streszczenie"
+}
+
+job_queue = SupabaseJobQueue(supabase)
+
+def get_stage_concurrency(stage):
+    """Limit wierszy w locie dla etapu: sesja > secrets [concurrency] > domyślne."""
+    session_key = f"concurrency_{stage}"
+    if session_key in st.session_state:
+        return int(st.session_state[session_key])
+    return configured_concurrency(stage)
+
+def get_cache_modes():
+    """Tryby cache wyników Dify dla etapów: sesja > secrets [cache] > domyślne."""
+    modes = configured_cache_modes()
+    for stage in STAGES:
+        modes[stage] = st.session_state.get(f"cache_mode_{stage}", modes[stage])
+    return modes
+
+def get_writing_context():
+    """Strategia kontekstu "done" dla pisania: sesja > secrets [writing] > domyślne."""
+    context = configured_writing_context()
+    for name in context:
+        context[name] = st.session_state.get(f"writing_{name}", context[name])
+    return context
+
+def with_session_settings(func):
+    """Przenosi ustawienia z sesji (tryby cache, kontekst pisania) z wątku skryptu do wątków roboczych."""
+    modes = get_cache_modes()
+    context = get_writing_context()
+    def wrapped(*args):
+        with use_cache_modes(modes), use_writing_context(context):
+            return func(*args)
+    return wrapped
+
+def run_batch_process(selected_rows, process_func, status_col_db, success_msg, max_workers=1):
     progress_container = st.empty()
     status_log = st.empty()
     stop_button_placeholder = st.empty()
     
-    stop_process = False
-    if stop_button_placeholder.button("⛔ ZATRZYMAJ PO OBECNYM REKORDZIE"):
-        stop_process = True
+    # Kliknięcie przerywa bieżący przebieg skryptu (rerun) - blok finally poniżej
+    # anuluje wtedy wszystkie wiersze, które jeszcze nie wystartowały.
+    stop_button_placeholder.button("⛔ ZATRZYMAJ (anuluj oczekujące rekordy)")
     
     total = len(selected_rows)
-    success_count = 0
-    error_count = 0
     my_bar = progress_container.progress(0)
     
-    for i, row in enumerate(selected_rows):
-        row_id = row['ID']
-        keyword = row['Słowo kluczowe']
-        status_log.info(f"⏳ [{i+1}/{total}] Przetwarzanie: **{keyword}**...")
-        update_db_record(row_id, {status_col_db: "🔄 W trakcie..."})
-        
-        try:
-            updates = process_func(row)
-            update_db_record(row_id, updates)
-            success_count += 1
-        except Exception as e:
-            error_count += 1
-            error_msg = str(e)[:100]
-            update_db_record(row_id, {status_col_db: f"❌ Błąd: {error_msg}"})
-            st.toast(f"Błąd przy '{keyword}': {error_msg}", icon="⚠️")
-        
-        my_bar.progress((i + 1) / total)
+    executor = BatchExecutor(max_workers=max_workers)
+    progress = executor.start(selected_rows, with_session_settings(lambda row: process_row(row, process_func, status_col_db)))
+    try:
+        finished = False
+        while not finished:
+            finished = executor.wait(timeout=0.5)
+            snap = progress.snapshot()
+            my_bar.progress(snap["done"] / total if total else 1.0)
+            status_log.info(
+                f"⏳ [{snap['done']}/{total}] W locie maks. {executor.max_workers} | "
+                f"Sukces: {snap['success']}, Błędy: {snap['errors']}"
+            )
+            for row, error_msg in progress.pop_new_errors():
+                st.toast(f"Błąd przy '{row['Słowo kluczowe']}': {error_msg[:100]}", icon="⚠️")
+    finally:
+        executor.stop()
+        # Zaznaczenie to też edycja tabeli - bez resetu (także po ZATRZYMAJ) strona zostałaby wstrzymana na starych statusach
+        reset_editor()
     
+    snap = progress.snapshot()
     my_bar.empty()
     stop_button_placeholder.empty()
-    status_log.success(f"Zakończono! Sukces: {success_count}, Błędy: {error_count}")
+    status_log.success(f"Zakończono! Sukces: {snap['success']}, Błędy: {snap['errors']}")
+    fetch_task_detail.clear()
+    time.sleep(2)
+    st.rerun()
+
+def run_pipeline(selected_rows, review_headers=True, skip_done=True):
+    """Pełny pipeline: każdy wiersz przechodzi przez graf etapów niezależnie od innych."""
+    def run_stage(row, stage):
+        process_func, status_col_db = STAGE_DEFS[stage]
+        updates = process_row(row, process_func, status_col_db)
+        return {COLUMN_MAP.get(k, k): v for k, v in updates.items()}
+
+    def is_done(row, stage):
+        return skip_done and row.get(COLUMN_MAP[STAGE_DEFS[stage][1]]) == "✅ Gotowe"
+
+    progress_container = st.empty()
+    status_log = st.empty()
+    stop_button_placeholder = st.empty()
+    stop_button_placeholder.button("⛔ ZATRZYMAJ PIPELINE (nie uruchamiaj kolejnych etapów)")
+    
+    scheduler = PipelineScheduler(
+        with_session_settings(run_stage), {stage: get_stage_concurrency(stage) for stage in STAGES},
+        is_done=is_done, hold={"writing"} if review_headers else ()
+    )
+    scheduler.start(load_full_rows(selected_rows))
+    try:
+        finished = False
+        while not finished:
+            finished = scheduler.wait(timeout=0.5)
+            snap = scheduler.snapshot()
+            progress_container.markdown(" | ".join(
+                f"**{stage.upper()}** ✅ {counts.get('done', 0)} 🔄 {counts.get('running', 0)} "
+                f"⏳ {counts.get('queued', 0) + counts.get('pending', 0)} ❌ {counts.get('failed', 0)}"
+                for stage, counts in snap.items()
+            ))
+            status_log.info(f"⏳ Pipeline w toku dla {len(selected_rows)} wierszy...")
+            for row, stage, error_msg in scheduler.pop_new_errors():
+                st.toast(f"Błąd ({stage}) przy '{row['Słowo kluczowe']}': {error_msg[:100]}", icon="⚠️")
+    finally:
+        scheduler.stop()
+        reset_editor()
+    
+    stop_button_placeholder.empty()
+    held = scheduler.rows_in_state("writing", HELD)
+    status_log.success(f"Pipeline zakończony! Błędów: {len(scheduler.errors)}")
+    fetch_task_detail.clear()
+    if held:
+        st.info(f"{len(held)} wierszy czeka na akceptację 'Nagłówki (Finalne)' - sprawdź je i uruchom krok 5.")
     time.sleep(2)
     st.rerun()
 
+def enqueue_rows(selected_rows, stage):
+    """Tryb kolejki: UI tylko dodaje zadania, przetwarza je worker.py."""
+    _, status_col_db = STAGE_DEFS[stage]
+    # Wierszy przetwarzanych właśnie przez worker kolejka nie resetuje
+    queued = set(job_queue.enqueue(stage, [row['ID'] for row in selected_rows]))
+    skipped = len(selected_rows) - len(queued)
+    selected_rows = [row for row in selected_rows if row['ID'] in queued]
+    ids = [row['ID'] for row in selected_rows]
+    if stage == "writing":
+        restart_ids = [row['ID'] for row in selected_rows if row['Status Generacja'] == "✅ Gotowe"]
+        resume_ids = [i for i in ids if i not in set(restart_ids)]
+        if restart_ids:
+            supabase.table("seo_content_tasks").update({status_col_db: WRITING_RESTART_STATUS}).in_("id", restart_ids).execute()
+        ids = resume_ids
+    if ids:
+        supabase.table("seo_content_tasks").update({status_col_db: QUEUED_STATUS}).in_("id", ids).execute()
+    st.success(f"Dodano do kolejki: {len(selected_rows)} wierszy. Uruchom worker: `python worker.py --stage {stage}`")
+    if skipped:
+        st.warning(f"Pominięto {skipped} wierszy, które worker właśnie przetwarza.")
+    reset_editor()
+    time.sleep(1)
+    st.rerun()
+
+def start_stage(selected_rows, stage, success_msg):
+    if st.session_state.get("execution_mode") == EXECUTION_MODES[1]:
+        enqueue_rows(selected_rows, stage)
+    else:
+        process_func, status_col_db = STAGE_DEFS[stage]
+        rows = load_full_rows(selected_rows)
+        run_batch_process(rows, process_func, status_col_db, success_msg, get_stage_concurrency(stage))
+
+# --- PROFIL RERUNA ---
+def profile_history(key="profile_history"):
+    """Sumy ostatnich rerunów aplikacji (albo osobnych rerunów fragmentów) w sesji."""
+    if key not in st.session_state:
+        st.session_state[key] = new_history()
+    return st.session_state[key]
+
+def profile_enabled():
+    return st.session_state.get("profile_rerun", False)
+
+def profiled_fragment(name, run_every=None):
+    """st.fragment z pomiarem czasu: rerun samego fragmentu nie przechodzi przez profil całej aplikacji."""
+    timed = timed_fragment(name, lambda: profile_history("profile_fragments"), profile_enabled)
+    return lambda func: st.fragment(timed(func), run_every=run_every)
+
+def show_profile(profiler, slot):
+    """Rozbicie czasu reruna na sekcje (w kontenerze zarezerwowanym na górze panelu bocznego)."""
+    median, worst = profiler.recent()
+    with slot.container():
+        st.metric("Ten rerun", f"{profiler.total_ms:.0f} ms")
+        st.caption(
+            f"Ostatnie {len(profiler.history)}: mediana {median:.0f} ms, maks. {worst:.0f} ms "
+            f"(budżet {profiler.budget_ms} ms)"
+        )
+        st.dataframe(profiler.breakdown(), hide_index=True, use_container_width=True)
+        fragments = profile_history("profile_fragments")
+        if fragments:
+            st.caption(f"Fragmenty (ostatnie {len(fragments)}): maks. {max(fragments):.0f} ms")
+
+# --- PANELE LENIWE ---
+# Panele ciężkie (import, eksport, szczegóły, wydajność) są fragmentami w expanderach
+# ze stanem: treść wykonuje się dopiero po rozwinięciu, a interakcja wewnątrz panelu
+# przelicza tylko fragment, nie całą stronę z tabelą.
+
+def lazy_expander(label, key):
+    """Expander, którego treść jest wykonywana tylko, gdy jest rozwinięty (inaczej None)."""
+    panel = st.expander(label, key=key, on_change="rerun")
+    return panel if panel.open else None
+
+@profiled_fragment("import")
+def import_panel():
+    panel = lazy_expander("📥 Szablon i wgrywanie pliku", "panel_import")
+    if panel is None:
+        return
+    with panel:
+        # Link do szablonu
+        template_bytes = generate_template_excel()
+        st.download_button(
+            label="📥 Pobierz szablon importu (XLSX)",
+            data=template_bytes,
+            file_name="example-import.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            help="Pobierz pusty plik Excel z odpowiednimi kolumnami"
+        )
+
+        uploaded_file = st.file_uploader("Wgraj plik (XLSX/CSV)", type=['xlsx', 'csv'])
+
+        if uploaded_file:
+            try:
+                preview_df = read_import_preview(uploaded_file, uploaded_file.name)
+
+                st.write("Podgląd pliku:", preview_df)
+
+                # Mapowanie
+                cols = preview_df.columns.tolist()
+                c_kw = st.selectbox("Kolumna: Słowo kluczowe", cols, index=0)
+                c_lang = st.selectbox("Kolumna: Język", [None] + cols, index=None)
+                c_aio = st.selectbox("Kolumna: AIO (opcjonalnie)", [None] + cols, index=None)
+                on_existing = st.radio(
+                    "Istniejące słowo kluczowe + język", [SKIP, MERGE],
+                    format_func={SKIP: "Pomiń", MERGE: "Uzupełnij AIO"}.get, horizontal=True
+                )
+                batch_size = st.number_input("Wierszy na zapytanie", min_value=50, max_value=5000, value=DEFAULT_BATCH_SIZE, step=50)
+
+                if st.button("📥 Importuj do Bazy"):
+                    progress_text = st.empty()
+                    def show_progress(report):
+                        progress_text.info(
+                            f"Przeczytano {report.read} wierszy, dodano {report.inserted} "
+                            f"({report.rows_per_second:.0f} wierszy/s)..."
+                        )
+
+                    report = import_chunks(
+                        iter_import_chunks(uploaded_file, uploaded_file.name),
+                        c_kw, c_lang, c_aio,
+                        lookup_existing=find_existing_tasks, insert_rows=insert_tasks, merge_rows=upsert_tasks,
+                        batch_size=int(batch_size), on_existing=on_existing, on_progress=show_progress
+                    )
+
+                    progress_text.empty()
+                    st.success(
+                        f"Zaimportowano {report.inserted} wierszy w {report.elapsed:.1f} s "
+                        f"({report.rows_per_second:.0f} wierszy/s). Uzupełniono: {report.merged}, "
+                        f"duplikaty: {report.duplicates}, odrzucone: {len(report.rejected)}."
+                    )
+                    if report.rejected:
+                        st.dataframe(pd.DataFrame(report.rejected, columns=["Wiersz", "Powód"]), hide_index=True)
+                    else:
+                        time.sleep(1)
+                        st.rerun()
+            except Exception as e:
+                st.error(f"Błąd pliku: {e}")
+
+@profiled_fragment("eksport")
+def export_panel():
+    panel = lazy_expander("📤 Przygotuj eksport", "panel_export")
+    if panel is None:
+        return
+    with panel:
+        export_fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][1])
+        export_cols = st.multiselect("Kolumny", list(COLUMN_MAP.values()), default=list(COLUMN_MAP.values()))
+        e1, e2 = st.columns(2)
+        export_stage = e1.selectbox("Etap", STAGES, format_func=str.upper)
+        export_status = e2.selectbox("Status", STATUS_FILTERS)
+        if not export_cols:
+            st.warning("Wybierz co najmniej jedną kolumnę.")
+            return
+        db_cols = [REVERSE_COLUMN_MAP[c] for c in export_cols]
+        filters = {} if export_status == "Wszystkie" else {STAGE_DEFS[export_stage][1]: export_status}
+
+        def build_export():
+            # Plik powstaje dopiero po kliknięciu (bez blokowania reruna); Streamlit i tak wczytuje
+            # gotowy plik do pamięci, żeby go wysłać - patrz README, "Export"
+            output, _ = export_tasks(
+                lambda after_id, limit: fetch_tasks_page(db_cols, after_id, limit, filters),
+                db_cols, export_fmt, headers=export_cols
+            )
+            with output:
+                return output.read()
+
+        st.download_button(
+            label=f"💾 Pobierz ({EXPORT_FORMATS[export_fmt][1]})",
+            data=build_export,
+            file_name=f"seo_export.{export_fmt}",
+            mime=EXPORT_FORMATS[export_fmt][0],
+            on_click="ignore"
+        )
+
+@profiled_fragment("szczegóły")
+def detail_panel():
+    panel = lazy_expander("🔍 Pokaż szczegóły artykułu", "panel_detail")
+    if panel is None:
+        return
+    with panel:
+        frame = get_task_table().frame
+        if frame.empty:
+            st.info("Brak zadań na bieżącej stronie.")
+            return
+        options = {f"#{row_id} - {kw}": row_id for row_id, kw in zip(frame.index, frame['keyword'])}
+        selected_option = st.selectbox("Wybierz artykuł do podglądu:", options.keys(), key="detail_row")
+        selected_id_view = options[selected_option]
+
+        # Pełny wiersz pobieramy z bazy dopiero tutaj (cache per wiersz i wersja statusów)
+        version = tuple(frame.at[selected_id_view, c] for c in LIST_COLUMNS if c.startswith('status_'))
+        view_row = fetch_task_detail(int(selected_id_view), version)
+        if view_row is None:
+            st.warning("Wybierz poprawny wiersz.")
+            return
+        # Kolumny lekkie z bieżącej strony - `version` nie obejmuje ręcznych edycji (nagłówki, AIO, instrukcje)
+        light = frame.loc[selected_id_view, LIST_COLUMNS]
+        view_row = {**view_row, **{COLUMN_MAP[c]: (v if pd.notna(v) else None) for c, v in light.items()}}
+
+        # Renderowana jest tylko otwarta zakładka (brief HTML i artykuł bywają duże)
+        t1, t2, t3, t4, t5 = st.tabs(["Research", "Nagłówki", "RAG", "Brief", "Wynik"], key="detail_tab",
+                                     on_change="rerun")
+
+        if t1.open:
+            with t1:
+                col_a, col_b = st.columns(2)
+                col_a.text_area("SERP", view_row['Frazy z wyników'], height=200)
+                col_a.text_area("Graf", view_row['Graf informacji'], height=200)
+                col_b.text_area("Senuto", view_row['Frazy Senuto'], height=200)
+                col_b.text_area("Knowledge Graph", view_row['Knowledge graph'], height=200)
+
+        if t2.open:
+            with t2:
+                st.markdown("### Struktura")
+                c_h1, c_h2 = st.columns(2)
+                c_h1.text_area("H2 (Robocze)", view_row['Nagłówki H2'], height=250)
+                c_h1.text_area("Pytania (Robocze)", view_row['Nagłówki pytania'], height=250)
+
+                c_h2.success("👇 Źródło do generowania")
+                c_h2.text_area("⭐ NAGŁÓWKI (FINALNE)", view_row['Nagłówki (Finalne)'], height=530)
+
+        if t3.open:
+            with t3:
+                st.text_area("Wiedza Dokładna", view_row['RAG'], height=300)
+                st.text_area("Wiedza Ogólna", view_row['RAG General'], height=300)
+
+        if t4.open:
+            with t4:
+                if view_row['Brief plik']:
+                    st.components.v1.html(view_row['Brief plik'], height=600, scrolling=True)
+                else:
+                    st.info("Brak briefu HTML")
+
+        if t5.open:
+            with t5:
+                if view_row['Generowanie contentu']:
+                    st.markdown(view_row['Generowanie contentu'], unsafe_allow_html=True)
+                    st.divider()
+                    st.code(view_row['Generowanie contentu'], language='html')
+                else:
+                    st.warning("Brak treści.")
+
+@profiled_fragment("wydajność")
+def metrics_panel():
+    panel = lazy_expander("📈 Wydajność workflow", "panel_metrics")
+    if panel is None:
+        return
+    with panel:
+        if not metrics.enabled:
+            st.info("Telemetria wyłączona (secrets [telemetry] ENABLED = false).")
+        else:
+            window_label = st.radio("Okres", list(METRIC_WINDOWS), horizontal=True, index=1)
+            window_seconds, freq = METRIC_WINDOWS[window_label]
+            records = metrics.query(time.time() - window_seconds)
+            if not records:
+                st.info("Brak wywołań w wybranym okresie.")
+            else:
+                st.dataframe(summarize(records, window_seconds), use_container_width=True)
+                p95, tokens = timeline(records, freq)
+                m1, m2 = st.columns(2)
+                m1.caption("p95 opóźnienia [s]")
+                m1.line_chart(p95)
+                m2.caption("Tokeny")
+                m2.bar_chart(tokens)
+
 # --- AUTORYZACJA ---
 def check_password():
     if "password_correct" not in st.session_state:
@@ -277,66 +647,19 @@ def check_password():
 
 # --- MAIN APP ---
 if check_password():
+    profiler = RerunProfiler(profile_history(), enabled=profile_enabled())
     
     # SIDEBAR - IMPORT / EXPORT / ADD
     with st.sidebar:
         st.title("🏭 Content Factory")
+        st.toggle("⏱️ Profil reruna", key="profile_rerun",
+                  help="Czas każdej sekcji strony w tym rerunie (także w logu 'profiler')")
+        profile_slot = st.empty()
         
         # 1. IMPORT
         st.header("1. Import z Excela")
-        
-        # Link do szablonu
-        template_bytes = generate_template_excel()
-        st.download_button(
-            label="📥 Pobierz szablon importu (XLSX)",
-            data=template_bytes,
-            file_name="example-import.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            help="Pobierz pusty plik Excel z odpowiednimi kolumnami"
-        )
-        
-        uploaded_file = st.file_uploader("Wgraj plik (XLSX/CSV)", type=['xlsx', 'csv'])
-        
-        if uploaded_file:
-            try:
-                if uploaded_file.name.endswith('.csv'):
-                    import_df = pd.read_csv(uploaded_file)
-                else:
-                    import_df = pd.read_excel(uploaded_file)
-                
-                st.write("Podgląd pliku:", import_df.head(2))
-                
-                # Mapowanie
-                cols = import_df.columns.tolist()
-                c_kw = st.selectbox("Kolumna: Słowo kluczowe", cols, index=0)
-                c_lang = st.selectbox("Kolumna: Język", [None] + cols, index=None)
-                c_aio = st.selectbox("Kolumna: AIO (opcjonalnie)", [None] + cols, index=None)
-                
-                if st.button("📥 Importuj do Bazy"):
-                    count = 0
-                    progress_text = "Importowanie..."
-                    my_bar = st.progress(0, text=progress_text)
-                    
-                    for i, row in import_df.iterrows():
-                        kw = row[c_kw]
-                        lang = row[c_lang] if c_lang else "pl"
-                        aio = row[c_aio] if c_aio and not pd.isna(row[c_aio]) else ""
-                        
-                        supabase.table("seo_content_tasks").insert({
-                            "keyword": str(kw),
-                            "language": str(lang),
-                            "aio_prompt": str(aio),
-                            "headers_final": ""
-                        }).execute()
-                        count += 1
-                        my_bar.progress((i + 1) / len(import_df))
-                    
-                    my_bar.empty()
-                    st.success(f"Zaimportowano {count} wierszy!")
-                    time.sleep(1)
-                    st.rerun()
-            except Exception as e:
-                st.error(f"Błąd pliku: {e}")
+        import_panel()
+        profiler.mark("import")
         
         st.divider()
         
@@ -353,96 +676,158 @@ if check_password():
                 }).execute()
                 st.success("Dodano!")
                 st.rerun()
+        profiler.mark("dodaj ręcznie")
 
         st.divider()
 
-        # 3. EXPORT
-        st.header("3. Eksport Danych")
-        if st.button("Przygotuj plik Excel"):
-            # Pobieramy wszystko
-            full_df = fetch_data()
-            if not full_df.empty:
-                # Usuwamy kolumnę select jeśli jest
-                export_df = full_df.drop(columns=['Select'], errors='ignore')
-                excel_data = to_excel(export_df)
-                st.download_button(
-                    label="💾 Pobierz wszystko (XLSX)",
-                    data=excel_data,
-                    file_name="seo_export_full.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        # 3. WYKONANIE
+        st.header("3. Wykonanie")
+        st.radio(
+            "Tryb", EXECUTION_MODES, key="execution_mode",
+            help="Kolejka: przyciski tylko dodają zadania, przetwarza je `python worker.py --stage ...` - zamknięcie karty nie przerywa pracy."
+        )
+        with st.expander("Maks. wierszy w locie na etap"):
+            for stage in STAGES:
+                st.number_input(
+                    stage.upper(), min_value=1, max_value=64, step=1,
+                    value=get_stage_concurrency(stage), key=f"concurrency_{stage}"
                 )
-            else:
-                st.warning("Brak danych do pobrania")
+        with st.expander("Cache wyników Dify"):
+            default_modes = configured_cache_modes()
+            for stage in STAGES:
+                st.selectbox(
+                    stage.upper(), CACHE_MODES, key=f"cache_mode_{stage}",
+                    index=CACHE_MODES.index(default_modes[stage]), format_func=CACHE_MODE_LABELS.get
+                )
+            stats = dify_cache.local.stats()
+            st.caption(f"Wpisy: {stats['entries']}, rozmiar: {stats['bytes'] / 1024 / 1024:.1f} MB")
+            counters = dify_cache.counters()
+            if counters:
+                st.dataframe(pd.DataFrame(counters).T, use_container_width=True)
+            if st.button("🧹 Wyczyść cache"):
+                dify_cache.clear()
+                st.success("Cache wyczyszczony.")
+        with st.expander("Limity wywołań Dify"):
+            guard_state = workflow_guard.snapshot()
+            if guard_state:
+                st.dataframe(pd.DataFrame(guard_state).T, use_container_width=True)
+            st.caption("Tempo [żądań/s] per klucz API maleje po 429 i wraca przy sukcesach; "
+                       "otwarty bezpiecznik wstrzymuje wywołania workflow.")
+        with st.expander("Magazyn artefaktów"):
+            if not artifacts.enabled:
+                st.caption("Wyłączony - duże wyniki etapów zapisywane są w wierszach (secrets [artifacts] ENABLED).")
+            artifact_counters = artifacts.counters()
+            st.caption(
+                f"Od startu: zapisane {artifact_counters['stored']}, duplikaty {artifact_counters['deduplicated']}, "
+                f"{artifact_counters['bytes_raw'] / 1024 / 1024:.1f} MB → {artifact_counters['bytes_stored'] / 1024 / 1024:.1f} MB"
+            )
+        with st.expander("Kontekst pisania (WRITING)"):
+            default_context = configured_writing_context()
+            st.selectbox(
+                "Poprzednie sekcje", CONTEXT_MODES, key="writing_mode",
+                index=CONTEXT_MODES.index(default_context["mode"]), format_func=CONTEXT_MODE_LABELS.get
+            )
+            st.number_input("Okno (sekcje w całości)", min_value=0, max_value=50, step=1,
+                            value=default_context["window"], key="writing_window")
+            st.number_input("Budżet (bajty)", min_value=1000, max_value=1000000, step=1000,
+                            value=default_context["budget_bytes"], key="writing_budget_bytes")
+            st.checkbox("Dobieraj fragmenty RAG i frazy do nagłówka", value=default_context["retrieval"],
+                        key="writing_retrieval")
+            st.number_input("Budżet wiedzy na sekcję (bajty)", min_value=1000, max_value=1000000, step=1000,
+                            value=default_context["knowledge_bytes"], key="writing_knowledge_bytes")
+            st.number_input("Maks. fragmentów RAG", min_value=1, max_value=200, step=1,
+                            value=default_context["top_k"], key="writing_top_k")
+            st.number_input("Maks. fraz", min_value=1, max_value=500, step=1,
+                            value=default_context["keywords_limit"], key="writing_keywords_limit")
+            st.checkbox("Tryb równoległy (szkice wszystkich sekcji naraz)", value=default_context["parallel"],
+                        key="writing_parallel")
+            st.number_input("Sekcje w locie na artykuł", min_value=1, max_value=32, step=1,
+                            value=default_context["parallel_workers"], key="writing_parallel_workers")
+            st.checkbox("Usuń powtórzone akapity po złożeniu", value=default_context["stitch"], key="writing_stitch")
+            st.checkbox("Użyj ponownie sekcji niezmienionych nagłówków", value=default_context["reuse_sections"],
+                        key="writing_reuse_sections")
+
+        profiler.mark("wykonanie")
+
+        st.divider()
+
+        # 4. EXPORT
+        st.header("4. Eksport Danych")
+        export_panel()
+        profiler.mark("eksport")
 
     # --- GŁÓWNY OBSZAR ---
     
-    df = fetch_data()
-    
     st.header("📋 Lista Zadań")
     
-    # Filtrowanie
-    col_f1, col_f2 = st.columns([2, 2])
-    with col_f1:
-        status_filter = st.selectbox("Filtruj wg statusu Research", ["Wszystkie", "Oczekuje", "✅ Gotowe", "❌ Błąd"])
-    
-    if status_filter != "Wszystkie":
-        df = df[df['Status Research'].str.contains(status_filter, na=False)]
-
-    # KONFIGURACJA KOLUMN DLA ST.DATA_EDITOR
-    # Ustawiamy szerokość na ~200px (approx 3-4cm) dla kolumn tekstowych
-    # ID i Język - małe i wyśrodkowane (via CSS hack na górze + mała szerokość)
-    column_cfg = {
-        "Select": st.column_config.CheckboxColumn("Zaznacz", default=False, width="small"),
-        "ID": st.column_config.NumberColumn(width="small", disabled=True, format="%d"),
-        "Słowo kluczowe": st.column_config.TextColumn(width=200),
-        "Język": st.column_config.TextColumn(width="small"),
-        "AIO": st.column_config.TextColumn(width=200),
-        
-        # Statusy
-        "Status Research": st.column_config.TextColumn(width="small"),
-        "Status Nagłówki": st.column_config.TextColumn(width="small"),
-        "Status RAG": st.column_config.TextColumn(width="small"),
-        "Status Brief": st.column_config.TextColumn(width="small"),
-        "Status Generacja": st.column_config.TextColumn(width="small"),
-
-        # Dane merytoryczne - szerokość ok. 3-4cm (medium/200px)
-        "Frazy z wyników": st.column_config.TextColumn(width=200),
-        "Frazy Senuto": st.column_config.TextColumn(width=200),
-        "Graf informacji": st.column_config.TextColumn(width=200),
-        "Nagłówki konkurencji": st.column_config.TextColumn(width=200),
-        "Knowledge graph": st.column_config.TextColumn(width=200),
-        "Nagłówki rozbudowane": st.column_config.TextColumn(width=200),
-        "Nagłówki H2": st.column_config.TextColumn(width=200),
-        "Nagłówki pytania": st.column_config.TextColumn(width=200),
-        "Nagłówki (Finalne)": st.column_config.TextColumn(width=300, help="Główne źródło do generowania"), # Trochę szersze dla wygody
-        "RAG": st.column_config.TextColumn(width=200),
-        "RAG General": st.column_config.TextColumn(width=200),
-        "Brief": st.column_config.TextColumn(width=200),
-        "Brief plik": st.column_config.TextColumn(width=200),
-        "Dodatkowe instrukcje": st.column_config.TextColumn(width=200),
-        "Generowanie contentu": st.column_config.TextColumn(width=200, disabled=True),
-    }
+    # Filtrowanie, wyszukiwanie i sortowanie wykonuje baza - pobierana jest tylko bieżąca strona
+    col_f1, col_f2, col_f3, col_f4 = st.columns([3, 1, 2, 1])
+    search = col_f1.text_input("Szukaj (słowo kluczowe)", key="list_search")
+    language = col_f2.text_input("Język", key="list_language")
+    sort = col_f3.selectbox("Sortowanie", list(TASK_SORTS), index=list(TASK_SORTS).index(DEFAULT_SORT),
+                            format_func=SORT_LABELS.get, key="list_sort")
+    page_size = col_f4.selectbox("Wierszy na stronę", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+                                 key="list_page_size")
+    status_cols = st.columns(len(STAGES) + 1)
+    status_filters = {}
+    for status_col, stage in zip(status_cols, STAGES):
+        value = status_col.selectbox(f"Status {stage.upper()}", STATUS_FILTERS, key=f"list_status_{stage}")
+        if value != "Wszystkie":
+            status_filters[STAGE_DEFS[stage][1]] = value
+    with status_cols[-1]:
+        live_refresh = st.toggle("Odświeżaj na żywo", value=True, key="live_refresh",
+                                 help="Statusy z bazy co kilka sekund, gdy wiersze są w toku (worker, inne sesje)")
+
+    list_query = {"statuses": status_filters, "language": language.strip(), "search": search.strip(), "sort": sort}
+    profiler.mark("filtry")
+    df = fetch_data(list_query, page_size)
+    task_table = get_task_table()
+    profiler.mark("dane")
+
+    if live_refresh:
+        interval = LIVE_REFRESH_SECONDS if has_active_jobs(task_table.frame) else IDLE_REFRESH_SECONDS
+        profiled_fragment("na żywo", run_every=interval)(live_status)()
+        profiler.mark("na żywo")
 
     edited_df = st.data_editor(
         df,
-        key="data_editor",
+        key=editor_key(),
         height=500,
         use_container_width=False, # Ważne: False pozwala respektować szerokości kolumn w pixelach
         hide_index=True,
-        column_config=column_cfg
+        column_config=build_column_config()
+    )
+    if not editor_has_edits():
+        snapshot_editor_rows(df)  # migawka z chwili, od której użytkownik zaczyna edytować
+    profiler.mark("tabela")
+
+    # STRONICOWANIE (keyset - kolejna strona zaczyna się po ostatnim wierszu bieżącej)
+    frozen = editor_has_edits()
+    nav_prev, nav_next, nav_info = st.columns([1, 1, 4])
+    nav_prev.button("◀ Poprzednia", on_click=task_table.prev_page, disabled=frozen or task_table.page == 0)
+    nav_next.button("Następna ▶", on_click=task_table.next_page, disabled=frozen or not task_table.has_next)
+    first_row = task_table.page * task_table.page_size + 1
+    nav_info.caption(
+        f"Strona {task_table.page + 1} · wiersze {first_row}–{first_row + len(df) - 1} z {task_table.total}"
+        if len(df) else "Brak zadań spełniających filtry."
     )
+    if frozen:
+        nav_info.caption("⏸️ Tabela wstrzymana (niezapisane zmiany lub zaznaczenie) - filtry, strony i dane z bazy "
+                         "odświeżą się po zapisie albo cofnięciu zmian.")
+
+    profiler.mark("stronicowanie")
 
     # AKCJE POD TABELĄ (Zapisz / Usuń / Info)
-    col_save, col_del, col_info = st.columns([1, 1, 4])
+    col_save, col_undo, col_del, col_info = st.columns([1, 1, 1, 3])
     
     selected_rows = edited_df[edited_df['Select'] == True]
     count_selected = len(selected_rows)
 
     with col_save:
-        if st.button("💾 Zapisz Zmiany"):
-            save_manual_changes(edited_df)
-            time.sleep(1)
-            st.rerun()
+        st.button("💾 Zapisz Zmiany", on_click=save_manual_changes)
+
+    with col_undo:
+        st.button("↩️ Cofnij zmiany", on_click=reset_editor, disabled=not frozen)
             
     with col_del:
         if st.button("🗑️ Usuń zaznaczone", type="primary"):
@@ -450,6 +835,7 @@ if check_password():
                 ids_to_del = selected_rows['ID'].tolist()
                 delete_records(ids_to_del)
                 st.success(f"Usunięto {count_selected} wierszy.")
+                reset_editor()
                 time.sleep(1)
                 st.rerun()
             else:
@@ -457,6 +843,9 @@ if check_password():
 
     with col_info:
         st.info(f"Zaznaczono wierszy: **{count_selected}**")
+    if "save_message" in st.session_state:
+        kind, text = st.session_state.pop("save_message")
+        getattr(st, kind)(text)
 
     st.divider()
     
@@ -471,76 +860,49 @@ if check_password():
 
         with c1:
             if st.button(f"1. RESEARCH ({count_selected})"):
-                run_batch_process(rows_to_process, stage_research, "status_research", "Research zakończony")
+                start_stage(rows_to_process, "research", "Research zakończony")
 
         with c2:
             if st.button(f"2. NAGŁÓWKI ({count_selected})"):
-                run_batch_process(rows_to_process, stage_headers, "status_headers", "Nagłówki wygenerowane")
+                start_stage(rows_to_process, "headers", "Nagłówki wygenerowane")
 
         with c3:
             if st.button(f"3. RAG ({count_selected})"):
-                run_batch_process(rows_to_process, stage_rag, "status_rag", "Baza RAG zbudowana")
+                start_stage(rows_to_process, "rag", "Baza RAG zbudowana")
 
         with c4:
             if st.button(f"4. BRIEF ({count_selected})"):
-                run_batch_process(rows_to_process, stage_brief, "status_brief", "Briefy gotowe")
+                start_stage(rows_to_process, "brief", "Briefy gotowe")
         
         with c5:
             if st.button(f"5. GENERUJ CONTENT ({count_selected})"):
                 st.warning("Generowanie na podstawie kolumny 'Nagłówki (Finalne)'")
-                run_batch_process(rows_to_process, stage_writing, "status_writing", "Treści wygenerowane")
+                start_stage(rows_to_process, "writing", "Treści wygenerowane")
+
+        st.markdown("##### 🚀 Pełny pipeline")
+        p1, p2, p3 = st.columns([2, 2, 2])
+        review_headers = p1.checkbox("Zatrzymaj przed pisaniem (akceptacja Nagłówków Finalnych)", value=True)
+        skip_done = p2.checkbox("Pomiń etapy już gotowe", value=True)
+        with p3:
+            queue_mode = st.session_state.get("execution_mode") == EXECUTION_MODES[1]
+            start_pipeline = st.button(
+                f"🚀 URUCHOM PIPELINE ({count_selected})", disabled=queue_mode,
+                help="Research → Nagłówki + RAG (równolegle) → Brief / Pisanie. Dostępne w trybie 'W tej sesji'."
+            )
+        if start_pipeline:
+            run_pipeline(rows_to_process, review_headers=review_headers, skip_done=skip_done)
+    profiler.mark("akcje")
 
     # --- PODGLĄD SZCZEGÓŁÓW ---
     st.divider()
-    
-    if not df.empty:
-        all_ids = df['ID'].tolist()
-        keywords = df['Słowo kluczowe'].tolist()
-        # Tworzymy listę wyboru
-        options = {f"#{ids} - {kw}": ids for ids, kw in zip(all_ids, keywords)}
-        
-        selected_option = st.selectbox("Wybierz artykuł do podglądu:", options.keys())
-        selected_id_view = options[selected_option]
-        
-        # Pobieramy wiersz z edited_df
-        try:
-            view_row = edited_df[edited_df['ID'] == selected_id_view].iloc[0]
-            
-            with st.expander("🔍 Pokaż szczegóły artykułu", expanded=False):
-                t1, t2, t3, t4, t5 = st.tabs(["Research", "Nagłówki", "RAG", "Brief", "Wynik"])
-                
-                with t1:
-                    col_a, col_b = st.columns(2)
-                    col_a.text_area("SERP", view_row['Frazy z wyników'], height=200)
-                    col_a.text_area("Graf", view_row['Graf informacji'], height=200)
-                    col_b.text_area("Senuto", view_row['Frazy Senuto'], height=200)
-                    col_b.text_area("Knowledge Graph", view_row['Knowledge graph'], height=200)
-                
-                with t2:
-                    st.markdown("### Struktura")
-                    c_h1, c_h2 = st.columns(2)
-                    c_h1.text_area("H2 (Robocze)", view_row['Nagłówki H2'], height=250)
-                    c_h1.text_area("Pytania (Robocze)", view_row['Nagłówki pytania'], height=250)
-                    
-                    c_h2.success("👇 Źródło do generowania")
-                    c_h2.text_area("⭐ NAGŁÓWKI (FINALNE)", view_row['Nagłówki (Finalne)'], height=530)
-                
-                with t3:
-                    st.text_area("Wiedza Dokładna", view_row['RAG'], height=300)
-                    st.text_area("Wiedza Ogólna", view_row['RAG General'], height=300)
-                    
-                with t4:
-                    if view_row['Brief plik']:
-                        st.components.v1.html(view_row['Brief plik'], height=600, scrolling=True)
-                    else:
-                        st.info("Brak briefu HTML")
-                
-                with t5:
-                    if view_row['Generowanie contentu']:
-                        st.markdown(view_row['Generowanie contentu'], unsafe_allow_html=True)
-                        st.divider()
-                        st.code(view_row['Generowanie contentu'], language='html')
-                    else:
-                        st.warning("Brak treści.")
-        except IndexError:
-            st.warning("Wybierz poprawny wiersz.")
\ No newline at end of file
+    detail_panel()
+    profiler.mark("szczegóły")
+
+    # --- WYDAJNOŚĆ (telemetria wywołań Dify) ---
+    st.divider()
+    metrics_panel()
+    profiler.mark("wydajność")
+
+    profiler.finish()
+    if profiler.enabled:
+        show_profile(profiler, profile_slot)
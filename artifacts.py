@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # opcjonalnie - bez pakietu zapisujemy gzipem
+    zstandard = None
+
+# --- MAGAZYN ARTEFAKTÓW (SKOMPRESOWANY, ADRESOWANY TREŚCIĄ) ---
+# Duże wyniki etapów (grafy, RAG, brief HTML, artykuł) trafiają do magazynu jako
+# skompresowany blob o nazwie = sha256 treści, a w wierszu seo_content_tasks zostaje
+# tylko referencja "artifact:<kodek>:<sha256>". Identyczne treści (np. RAG podobnych
+# fraz) są przechowywane raz. Odczyt rozpoznaje referencje, więc stare wiersze
+# z treścią w kolumnie działają bez migracji.
+
+ARTIFACT_COLUMNS = ["info_graph", "knowledge_graph", "rag_content", "rag_general", "brief_html", "final_article"]
+REFERENCE_PREFIX = "artifact:"
+CODECS = ["zst", "gz"]
+DEFAULT_CODEC = "zst"
+DEFAULT_MIN_BYTES = 2048   # krótsze wartości zostają w wierszu
+DEFAULT_CACHE_ENTRIES = 64
+LOAD_WORKERS = 8
+# Tylko pełna referencja - treść zaczynająca się od "artifact:" (np. słowo kluczowe) nią nie jest
+REFERENCE_PATTERN = re.compile(rf"{REFERENCE_PREFIX}(?:{'|'.join(CODECS)}):[0-9a-f]{{64}}")
+
+
+def is_reference(value):
+    return isinstance(value, str) and REFERENCE_PATTERN.fullmatch(value) is not None
+
+
+def compress(data, codec):
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(blob, codec):
+    if codec == "zst":
+        if zstandard is None:
+            raise ImportError("Odczyt artefaktu zstd wymaga pakietu zstandard (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class LocalArtifactStore:
+    """Magazyn w katalogu lokalnym: <root>/<2 znaki hasha>/<hash>.<kodek>."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def put(self, name, blob):
+        """Zapisuje blob, jeśli go jeszcze nie ma. Zwraca False dla duplikatu."""
+        path = self._path(name)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)  # atomowo - równoległy zapis tej samej treści daje ten sam plik
+        return True
+
+    def get(self, name):
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+
+class SupabaseArtifactStore:
+    """Magazyn współdzielony: bucket Supabase Storage (wymagany, gdy worker działa na innej maszynie)."""
+
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+
+    def put(self, name, blob):
+        try:
+            self.client.storage.from_(self.bucket).upload(
+                f"{name[:2]}/{name}", blob, {"content-type": "application/octet-stream"}
+            )
+        except Exception as e:
+            if "Duplicate" in str(e) or "already exists" in str(e):
+                return False
+            raise
+        return True
+
+    def get(self, name):
+        return self.client.storage.from_(self.bucket).download(f"{name[:2]}/{name}")
+
+
+class Artifacts:
+    """Zamiana dużych wartości kolumn na referencje (offload) i z powrotem (resolve).
+
+    Zapis działa tylko przy `enabled`; odczyt referencji zawsze, żeby wyłączenie
+    magazynu nie odcięło dostępu do już zapisanych treści.
+    """
+
+    def __init__(self, store, enabled=False, codec=DEFAULT_CODEC, min_bytes=DEFAULT_MIN_BYTES,
+                 cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.store = store
+        self.enabled = enabled
+        self.codec = codec if codec in CODECS and (codec != "zst" or zstandard is not None) else "gz"
+        self.min_bytes = min_bytes
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._counters = {"stored": 0, "deduplicated": 0, "bytes_raw": 0, "bytes_stored": 0}
+        self._lock = threading.Lock()
+
+    def save(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        blob = compress(data, self.codec)
+        stored = self.store.put(f"{digest}.{self.codec}", blob)
+        ref = f"{REFERENCE_PREFIX}{self.codec}:{digest}"
+        with self._lock:
+            self._counters["stored" if stored else "deduplicated"] += 1
+            self._counters["bytes_raw"] += len(data)
+            self._counters["bytes_stored"] += len(blob) if stored else 0
+        self._remember(ref, text)
+        return ref
+
+    def load(self, ref):
+        with self._lock:
+            if ref in self._cache:
+                self._cache.move_to_end(ref)
+                return self._cache[ref]
+        _, codec, digest = ref.split(":", 2)
+        text = decompress(self.store.get(f"{digest}.{codec}"), codec).decode("utf-8")
+        self._remember(ref, text)
+        return text
+
+    def _remember(self, ref, text):
+        with self._lock:
+            self._cache[ref] = text
+            self._cache.move_to_end(ref)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def offload(self, updates):
+        """Kopia `updates` (kolumny bazy), w której duże wartości kolumn artefaktów są referencjami."""
+        if not self.enabled:
+            return updates
+        result = dict(updates)
+        for col in ARTIFACT_COLUMNS:
+            value = result.get(col)
+            if isinstance(value, str) and not is_reference(value) and len(value.encode("utf-8")) >= self.min_bytes:
+                result[col] = self.save(value)
+        return result
+
+    def resolve_many(self, records):
+        """Zamienia referencje w kolumnach artefaktów na treść (w miejscu); unikalne pobierane równolegle."""
+        refs = list({record.get(col) for record in records for col in ARTIFACT_COLUMNS if is_reference(record.get(col))})
+        if not refs:
+            return records
+        with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(refs))) as pool:
+            texts = dict(zip(refs, pool.map(self.load, refs)))
+        for record in records:
+            for col in ARTIFACT_COLUMNS:
+                if is_reference(record.get(col)):
+                    record[col] = texts[record[col]]
+        return records
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
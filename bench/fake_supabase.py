@@ -0,0 +1,335 @@
+import copy
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+
+# --- ATRAPA KLIENTA SUPABASE (W PAMIĘCI) ---
+# Obsługuje podzbiór łańcucha zapytań używany w db.py / job_queue.py / dify_cache.py:
+# select (z count)/insert/upsert/update/delete + eq/neq/in_/gt/gte/lt/like/ilike/or_/order/limit/range.
+# Opcjonalne opóźnienie na zapytanie symuluje RTT do bazy.
+
+PRIMARY_KEYS = {
+    "seo_content_tasks": ("id",),
+    "seo_article_sections": ("task_id", "heading"),
+    "seo_task_jobs": ("task_id", "stage"),
+    "dify_result_cache": ("key",),
+    "seo_workflow_metrics": ("id",),
+}
+AUTO_ID_TABLES = {"seo_content_tasks", "seo_workflow_metrics"}
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _like(pattern, case=False):
+    """LIKE -> regex: % i _ jako wieloznaczniki, \\ jako ucieczka."""
+    regex, escaped = "", False
+    for char in pattern:
+        if escaped:
+            regex, escaped = regex + re.escape(char), False
+        elif char == "\\":
+            escaped = True
+        else:
+            regex += {"%": ".*", "_": "."}.get(char) or re.escape(char)
+    return re.compile("^" + regex + "$", re.DOTALL if case else re.IGNORECASE | re.DOTALL)
+
+
+def _split_terms(expression):
+    """Dzieli listę warunków po przecinkach najwyższego poziomu (poza nawiasami i cudzysłowami)."""
+    terms, depth, quoted, current, escaped = [], 0, False, "", False
+    for char in expression:
+        if escaped:
+            current, escaped = current + char, False
+            continue
+        if char == "\\" and quoted:
+            current, escaped = current + char, True
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            terms.append(current)
+            current = ""
+            continue
+        current += char
+    return terms + [current] if current else terms
+
+
+def _operand(raw):
+    if raw.startswith('"') and raw.endswith('"'):
+        return re.sub(r"\\(.)", r"\1", raw[1:-1])
+    return int(raw) if re.fullmatch(r"-?\d+", raw) else raw
+
+
+def _condition(term):
+    if term.startswith("and(") and term.endswith(")"):
+        parts = [_condition(t) for t in _split_terms(term[4:-1])]
+        return lambda r: all(cond(r) for cond in parts)
+    col, op, raw = term.split(".", 2)
+    if op == "is" and raw == "null":
+        return lambda r: r.get(col) is None
+    value = _operand(raw)
+    if op in ("like", "ilike"):
+        regex = _like(value, case=op == "like")
+        return lambda r: regex.match(str(r.get(col) or "")) is not None
+    compare = {
+        "eq": lambda a, b: a == b, "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+        "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+    }[op]
+    return lambda r: r.get(col) is not None and compare(r.get(col), value)
+
+
+class Query:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = None
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.row_limit = None
+        self.offset = 0
+        self.count = None
+
+    # --- akcje ---
+    def select(self, columns="*", count=None):
+        self.action = "select"
+        self.count = count
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",") if c.strip()]
+        return self
+
+    def insert(self, records):
+        self.action, self.payload = "insert", records
+        return self
+
+    def upsert(self, records):
+        self.action, self.payload = "upsert", records
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- filtry ---
+    def eq(self, col, value):
+        self.filters.append(lambda r: r.get(col) == value)
+        return self
+
+    def neq(self, col, value):
+        self.filters.append(lambda r: r.get(col) != value)
+        return self
+
+    def in_(self, col, values):
+        values = set(values)
+        self.filters.append(lambda r: r.get(col) in values)
+        return self
+
+    def gt(self, col, value):
+        self.filters.append(lambda r: r.get(col) is not None and r.get(col) > value)
+        return self
+
+    def gte(self, col, value):
+        self.filters.append(lambda r: r.get(col) is not None and r.get(col) >= value)
+        return self
+
+    def lt(self, col, value):
+        self.filters.append(lambda r: r.get(col) is not None and r.get(col) < value)
+        return self
+
+    def ilike(self, col, pattern):
+        regex = _like(pattern)
+        self.filters.append(lambda r: regex.match(str(r.get(col) or "")) is not None)
+        return self
+
+    def like(self, col, pattern):
+        regex = _like(pattern, case=True)
+        self.filters.append(lambda r: regex.match(str(r.get(col) or "")) is not None)
+        return self
+
+    def or_(self, expression):
+        """Wyrażenie `or` PostgREST: `kol.op.wartość` (eq/gt/gte/lt/lte/like/ilike/is.null), także `and(...)`."""
+        alternatives = [_condition(term) for term in _split_terms(expression)]
+        self.filters.append(lambda r: any(cond(r) for cond in alternatives))
+        return self
+
+    def order(self, col, desc=False):
+        self.order_by.append((col, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def range(self, start, end):
+        self.offset, self.row_limit = start, end - start + 1
+        return self
+
+    def execute(self):
+        self.db.simulate_latency()
+        with self.db.lock:
+            data = getattr(self, f"_{self.action}")()
+            return Response(data, len(self._matching()) if self.count else None)
+
+    # --- wykonanie ---
+    def _rows(self):
+        return self.db.table_rows(self.table)
+
+    def _matching(self):
+        return [r for r in self._rows() if all(f(r) for f in self.filters)]
+
+    def _project(self, row):
+        if self.columns is None:
+            return copy.copy(row)
+        return {c: row.get(c) for c in self.columns}
+
+    def _select(self):
+        rows = self._matching()
+        for col, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: (r.get(col) is None, 0 if r.get(col) is None else r.get(col)), reverse=desc)
+        rows = rows[self.offset:]
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        return [self._project(r) for r in rows]
+
+    def _records(self):
+        return self.payload if isinstance(self.payload, list) else [self.payload]
+
+    def _insert(self):
+        return [self.db.put(self.table, dict(r), replace=False) for r in self._records()]
+
+    def _upsert(self):
+        return [self.db.put(self.table, dict(r), replace=True) for r in self._records()]
+
+    def _update(self):
+        rows = self._matching()
+        for row in rows:
+            row.update(self.payload)
+            row["updated_at"] = _now_iso()
+        return [copy.copy(r) for r in rows]
+
+    def _delete(self):
+        rows = self._matching()
+        self.db.remove(self.table, rows)
+        return [copy.copy(r) for r in rows]
+
+
+class RpcCall:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        self.db.simulate_latency()
+        handler = self.db.rpc_handlers.get(self.name)
+        if handler is None:
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{self.name}"})
+        with self.db.lock:
+            return Response(handler(self.db, **self.params))
+
+
+def _find_existing_tasks(db, p_keywords):
+    wanted = set(p_keywords)
+    return [
+        {"id": r["id"], "keyword": r["keyword"], "language": r.get("language")}
+        for r in db.table_rows("seo_content_tasks") if (r.get("keyword") or "").lower() in wanted
+    ]
+
+
+def _update_task_cells(db, p_cells):
+    rows = {r["id"]: r for r in db.table_rows("seo_content_tasks")}
+    conflicts = []
+    for cell in p_cells:
+        row = rows.get(cell["id"])
+        if row is None:
+            conflicts.append({"task_id": cell["id"], "col": None})
+        elif (row.get(cell["col"]) or "") != (cell["loaded"] or ""):
+            conflicts.append({"task_id": cell["id"], "col": cell["col"]})
+        else:
+            row[cell["col"]] = cell["new"]
+            row["updated_at"] = _now_iso()
+    return conflicts
+
+
+class FakeSupabase:
+    """`supabase.table(...)` / `supabase.rpc(...)` na słownikach w pamięci."""
+
+    def __init__(self, latency=0.0, views=None):
+        self.latency = latency
+        self.tables = {}
+        self.views = views or {}
+        self.next_ids = {}
+        self.lock = threading.RLock()
+        self.queries = 0
+        self.rpc_handlers = {"find_existing_tasks": _find_existing_tasks, "update_task_cells": _update_task_cells}
+
+    def simulate_latency(self):
+        with self.lock:
+            self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name):
+        return Query(self, name)
+
+    def rpc(self, name, params):
+        return RpcCall(self, name, params)
+
+    def table_rows(self, name):
+        if name in self.views:
+            return self.views[name](self)
+        return list(self.tables.setdefault(name, {}).values())
+
+    def _key(self, table, row):
+        return tuple(row.get(k) for k in PRIMARY_KEYS.get(table, ("id",)))
+
+    def put(self, table, row, replace):
+        rows = self.tables.setdefault(table, {})
+        if table in AUTO_ID_TABLES and row.get("id") is None:
+            row["id"] = self.next_ids.get(table, 1)
+        if "id" in row and isinstance(row["id"], int):
+            self.next_ids[table] = max(self.next_ids.get(table, 1), row["id"] + 1)
+        key = self._key(table, row)
+        if key in rows:
+            if not replace:
+                raise Exception(f"duplicate key value violates unique constraint on {table}")
+            rows[key].update(row)
+        else:
+            rows[key] = row
+        rows[key]["updated_at"] = _now_iso()
+        return copy.copy(rows[key])
+
+    def remove(self, table, rows):
+        stored = self.tables.setdefault(table, {})
+        for row in rows:
+            stored.pop(self._key(table, row), None)
+
+
+def task_list_view(preview_chars, light_columns, heavy_columns):
+    """Odpowiednik widoku seo_content_tasks_list: kolumny lekkie + podgląd ciężkich."""
+    def view(db):
+        rows = []
+        for record in db.tables.get("seo_content_tasks", {}).values():
+            row = {c: record.get(c) for c in list(light_columns) + ["updated_at"]}
+            for col in heavy_columns:
+                value = record.get(col)
+                row[col] = value[:preview_chars] if isinstance(value, str) else value
+            rows.append(row)
+        return rows
+    return view
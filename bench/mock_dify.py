@@ -0,0 +1,170 @@
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- ATRAPA DIFY /workflows/run ---
+# Lokalny serwer HTTP odpowiadający jak Dify (blocking i streaming SSE), z opóźnieniem
+# z rozkładu log-normalnego, zadanym odsetkiem błędów 503 i rozmiarem wyników.
+# Zwraca pola `outputs` czytane przez wszystkie etapy z stages.py.
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt "
+    "ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation. "
+)
+
+
+def _text(size):
+    return (LOREM * (size // len(LOREM) + 1))[:size]
+
+
+def build_outputs(inputs, output_bytes):
+    keyword = inputs.get("keyword", "temat")
+    headings = "\n".join(f"{keyword} - aspekt {i + 1}" for i in range(8))
+    return {
+        # research
+        "frazy z serp": ", ".join(f"{keyword} fraza {i}" for i in range(30)),
+        "frazy_senuto": ", ".join(f"{keyword} senuto {i}" for i in range(30)),
+        "grafinformacji": _text(output_bytes),
+        "naglowki": headings,
+        "knowledge_graph": _text(output_bytes),
+        # headers
+        "naglowki_rozbudowane": headings,
+        "naglowki_h2": headings,
+        "naglowki_pytania": "\n".join(f"Jak {keyword} {i}?" for i in range(4)),
+        # rag
+        "dokladne": _text(output_bytes * 4),
+        "ogolne": _text(output_bytes * 2),
+        # brief
+        "brief": json.dumps({"keyword": keyword, "sections": 8}),
+        "html": f"<html><body>{_text(output_bytes)}</body></html>",
+        # writing
+        "result": f"<p>{_text(output_bytes)}</p>",
+    }
+
+
+class MockDifyConfig:
+    def __init__(self, latency_median=0.05, latency_sigma=0.5, error_rate=0.0, output_bytes=2000, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.output_bytes = output_bytes
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.request_bytes = 0
+
+    def sample(self, body_size):
+        with self.lock:
+            self.requests += 1
+            self.request_bytes += body_size
+            latency = self.latency_median * self.random.lognormvariate(0, self.latency_sigma) if self.latency_median else 0
+            failed = self.random.random() < self.error_rate
+        return latency, failed
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Nagłówki i ciało idą osobnymi zapisami - bez TCP_NODELAY Nagle + opóźniony ACK dokładają ~40 ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            latency, failed = config.sample(len(body))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            payload = json.loads(body or b"{}")
+            time.sleep(latency)
+            if failed:
+                return self._send(503, {"code": "unavailable", "message": "mock overload"}, {"Retry-After": "1"})
+            data = {
+                "id": str(uuid.uuid4()), "workflow_id": "mock", "status": "succeeded",
+                "outputs": build_outputs(payload.get("inputs", {}), config.output_bytes),
+                "error": None, "elapsed_time": latency, "total_tokens": config.output_bytes // 4,
+                "total_steps": 3, "created_at": int(time.time()), "finished_at": int(time.time()),
+            }
+            result = {"workflow_run_id": data["id"], "task_id": str(uuid.uuid4()), "data": data}
+            if payload.get("response_mode") == "streaming":
+                return self._send_stream(result)
+            self._send(200, result)
+
+        def _send(self, status, obj, headers=None):
+            raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _send_stream(self, result):
+            events = [
+                {"event": "workflow_started", "task_id": result["task_id"], "data": {"id": result["workflow_run_id"]}},
+                {"event": "text_chunk", "data": {"text": result["data"]["outputs"]["result"][:200]}},
+                {"event": "workflow_finished", "task_id": result["task_id"],
+                 "workflow_run_id": result["workflow_run_id"], "data": result["data"]},
+            ]
+            raw = b"".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n".encode("utf-8") for e in events)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+    return Handler
+
+
+class MockDifyServer:
+    """Serwer w wątku tła: `with MockDifyServer(config) as server: server.base_url`."""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockDifyConfig()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.config))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atrapa Dify /workflows/run")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.5, help="mediana opóźnienia (s)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="rozrzut log-normalny")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output-bytes", type=int, default=2000)
+    args = parser.parse_args()
+    config = MockDifyConfig(args.latency, args.sigma, args.error_rate, args.output_bytes)
+    server = MockDifyServer(config, port=args.port)
+    print(f"Mock Dify: {server.base_url}")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+import argparse
+import ast
+import csv
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# --- BENCHMARKI ŚCIEŻEK BATCHOWYCH ---
+# Uruchamia prawdziwy kod aplikacji (stages, db, importer, exporter, funkcje z app.py)
+# na atrapie Dify (mock_dify.py) i bazie w pamięci (fake_supabase.py) - bez wywołań LLM
+# i bez dotykania produkcyjnej bazy. Wynik: JSON z przepustowością, percentylami
+# opóźnień i szczytowym zużyciem pamięci per scenariusz.
+#
+#   python bench/run.py --rows 200 --latency 0.05 --output bench.json
+#
+# Atrapa Dify działa w tym samym procesie (wątek tła), więc jej CPU (budowanie odpowiedzi)
+# wlicza się do wyników - porównuj przebiegi z tymi samymi parametrami.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = [
+    "batch_research", "batch_headers", "batch_rag", "batch_brief", "batch_writing",
+    "writing_loop", "writing_loop_parallel", "import", "save_manual_changes", "fetch_data",
+    "fetch_data_delta", "browse_pages", "export_xlsx", "export_csv", "export_jsonl", "export_parquet",
+]
+
+SECRETS = """
+[general]
+APP_PASSWORD = "bench"
+
+[SUPABASE]
+URL = "http://127.0.0.1:9"
+KEY = "bench"
+
+[dify]
+BASE_URL = "{base_url}"
+API_KEY_RESEARCH = "bench-research"
+API_KEY_HEADERS = "bench-headers"
+API_KEY_RAG = "bench-rag"
+API_KEY_BRIEF = "bench-brief"
+API_KEY_WRITE = "bench-write"
+API_KEY_AUDIT = "bench-audit"
+RESPONSE_MODE = "{response_mode}"
+
+[cache]
+PATH = "{workdir}/dify_results.sqlite"
+
+[telemetry]
+PATH = "{workdir}/metrics.sqlite"
+
+[rate_limit]
+RATE = {rate}
+BURST = {rate}
+
+[artifacts]
+ENABLED = {artifacts}
+PATH = "{workdir}/artifacts"
+"""
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+def measure(name, setup, run, memory=True):
+    """`setup()` przygotowuje dane (poza pomiarem), `run(stan)` -> (liczba_elementów, opóźnienia_s)."""
+    state = setup()
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    error = None
+    try:
+        items, latencies = run(state)
+    except Exception as e:
+        items, latencies, error = 0, [], f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result = {
+        "name": name,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(items / seconds, 2) if seconds > 0 else None,
+        "latency_ms": percentiles(latencies),
+        "peak_mem_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def load_app_functions(names):
+    """Funkcje z app.py bez uruchamiania interfejsu: importy modułu + wybrane definicje."""
+    with open(os.path.join(REPO_ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    nodes += [n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name in names]
+    namespace = {}
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), "app.py", "exec"), namespace)
+    return namespace
+
+
+def seed_tasks(fake, rows, filled=True, seed=1):
+    """Zadania z wypełnionymi wynikami etapów (treść jak z atrapy Dify)."""
+    from mock_dify import build_outputs
+    rng = random.Random(seed)
+    for i in range(rows):
+        keyword = f"fraza testowa {i} {rng.randint(0, 10 ** 6)}"
+        record = {"keyword": keyword, "language": "pl", "aio_prompt": "", "headers_final": ""}
+        if filled:
+            out = build_outputs({"keyword": keyword}, 2000)
+            record.update({
+                "status_research": "✅ Gotowe", "serp_phrases": out["frazy z serp"], "senuto_phrases": out["frazy_senuto"],
+                "info_graph": out["grafinformacji"], "competitors_headers": out["naglowki"],
+                "knowledge_graph": out["knowledge_graph"], "status_headers": "✅ Gotowe",
+                "headers_expanded": out["naglowki_rozbudowane"], "headers_h2": out["naglowki_h2"],
+                "headers_questions": out["naglowki_pytania"], "headers_final": out["naglowki_h2"],
+                "status_rag": "✅ Gotowe", "rag_content": out["dokladne"], "rag_general": out["ogolne"],
+                "status_brief": "✅ Gotowe", "brief_json": out["brief"], "brief_html": out["html"],
+                "instructions": "", "status_writing": "✅ Gotowe", "final_article": out["result"] * 8,
+            })
+        fake.table("seo_content_tasks").insert(record).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarki SEO Content Factory (atrapa Dify + baza w pamięci)")
+    parser.add_argument("--rows", type=int, default=100, help="liczba wierszy w scenariuszach batch/eksport")
+    parser.add_argument("--import-rows", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="mediana opóźnienia Dify (s)")
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output-bytes", type=int, default=2000)
+    parser.add_argument("--db-latency", type=float, default=0.0, help="opóźnienie każdego zapytania do bazy (s)")
+    parser.add_argument("--response-mode", choices=["blocking", "streaming"], default="blocking")
+    parser.add_argument("--rate", type=float, default=1000.0, help="limit żądań/s na klucz API")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="tylko wybrane (można powtarzać)")
+    parser.add_argument("--artifacts", action="store_true", help="duże wyniki etapów w magazynie artefaktów")
+    parser.add_argument("--no-memory", action="store_true", help="bez tracemalloc (mniejszy narzut)")
+    parser.add_argument("--output", help="plik JSON (domyślnie stdout)")
+    args = parser.parse_args()
+
+    sys.path[:0] = [REPO_ROOT, BENCH_DIR]
+    from mock_dify import MockDifyConfig, MockDifyServer
+    from fake_supabase import FakeSupabase
+
+    config = MockDifyConfig(args.latency, args.sigma, args.error_rate, args.output_bytes, seed=42)
+    server = MockDifyServer(config).start()
+    workdir = tempfile.mkdtemp(prefix="seo-bench-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+        f.write(SECRETS.format(base_url=server.base_url, response_mode=args.response_mode, workdir=workdir,
+                               rate=args.rate, artifacts=str(args.artifacts).lower()))
+    os.chdir(workdir)  # st.secrets czyta .streamlit/secrets.toml z katalogu bieżącego
+
+    import db
+    import stages
+    from dify_cache import BYPASS, use_cache_modes
+    from executor import BatchExecutor
+    from exporter import EXPORT_FORMATS, export_tasks
+    from importer import import_chunks, iter_import_chunks
+    from writing_context import DEFAULT_CONTEXT, use_writing_context
+    from fake_supabase import task_list_view
+
+    def fresh_db(rows, filled=True):
+        fake = FakeSupabase(latency=args.db_latency, views={
+            "seo_content_tasks_list": task_list_view(db.PREVIEW_CHARS, db.LIST_COLUMNS, db.HEAVY_COLUMNS)
+        })
+        seed_tasks(fake, rows, filled)
+        db.supabase = stages.supabase = fake
+        return fake
+
+    no_cache = {stage: BYPASS for stage in stages.STAGES}
+
+    def seeded(rows, filled=True):
+        return lambda: fresh_db(rows, filled)
+
+    def batch(stage, context=None):
+        def run(fake):
+            process_func, status_col = stages.STAGE_DEFS[stage]
+            latencies = []
+
+            def task(row):
+                started = time.perf_counter()
+                with use_cache_modes(no_cache), use_writing_context(context or DEFAULT_CONTEXT):
+                    stages.process_row(row, process_func, status_col)
+                latencies.append(time.perf_counter() - started)
+
+            executor = BatchExecutor(max_workers=stages.configured_concurrency(stage))
+            ids = [record["id"] for record in fake.table_rows("seo_content_tasks")]
+            progress = executor.start(db.fetch_rows_by_ids(ids), task)
+            while not executor.wait(timeout=0.5):
+                pass
+            snap = progress.snapshot()
+            if snap["errors"]:
+                print(f"{stage}: {snap['errors']} błędów", file=sys.stderr)
+            return snap["success"], latencies
+        return run
+
+    def import_setup():
+        fresh_db(0, filled=False)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Słowo kluczowe", "Język", "AIO"])
+        for i in range(args.import_rows):
+            writer.writerow([f"import {i % max(1, args.import_rows * 9 // 10)}", "pl", ""])  # ~10% duplikatów
+        return io.BytesIO(buffer.getvalue().encode("utf-8"))
+
+    def import_run(data):
+        latencies = []
+        last = [time.perf_counter()]
+
+        def on_progress(report):
+            now = time.perf_counter()
+            latencies.append(now - last[0])
+            last[0] = now
+
+        report = import_chunks(
+            iter_import_chunks(data, "bench.csv"), "Słowo kluczowe", "Język", "AIO",
+            lookup_existing=db.find_existing_tasks, insert_rows=db.insert_tasks, merge_rows=db.upsert_tasks,
+            on_progress=on_progress
+        )
+        return report.read, latencies
+
+    app_funcs = load_app_functions({
+        "fetch_data", "get_task_table", "editor_key", "editor_has_edits", "snapshot_editor_rows", "diff_editor_changes"
+    })
+    session_state = app_funcs["st"].session_state
+
+    def fetch_data_run(fake):
+        # Pełne pobranie pierwszej strony (pierwsze wejście / nowa sesja)
+        latencies, items = [], 0
+        for _ in range(5):
+            session_state.pop("task_table", None)
+            started = time.perf_counter()
+            items += len(app_funcs["fetch_data"]())
+            latencies.append(time.perf_counter() - started)
+        return items, latencies
+
+    def fetch_delta_setup():
+        fake = fresh_db(args.rows)
+        session_state.pop("task_table", None)
+        app_funcs["fetch_data"]()
+        return fake
+
+    def fetch_delta_run(fake):
+        # Rerun po zmianie ok. 1% wierszy (np. statusy z workera)
+        latencies, items = [], 0
+        ids = sorted(fake.tables["seo_content_tasks"])
+        for i in range(5):
+            for key in ids[i::100]:
+                fake.table("seo_content_tasks").update({"status_brief": f"🔄 W trakcie... {i}"}).eq("id", key[0]).execute()
+            started = time.perf_counter()
+            items += len(app_funcs["fetch_data"]())
+            latencies.append(time.perf_counter() - started)
+        return items, latencies
+
+    def browse_run(fake):
+        # Kolejne strony listy z filtrem statusu i wyszukiwaniem
+        query = {"statuses": {"status_research": "✅ Gotowe"}, "search": "fraza", "sort": "keyword"}
+        session_state.pop("task_table", None)
+        latencies, items = [], 0
+        for _ in range(5):
+            started = time.perf_counter()
+            items += len(app_funcs["fetch_data"](query, 50))
+            latencies.append(time.perf_counter() - started)
+            app_funcs["get_task_table"]().next_page()
+        return items, latencies
+
+    def save_setup():
+        fresh_db(args.rows)
+        shown = app_funcs["fetch_data"]()
+        app_funcs["snapshot_editor_rows"](shown)
+        # Stan st.data_editor: {pozycja: {kolumna: nowa wartość}}
+        return {pos: {"Dodatkowe instrukcje": "zmienione w benchmarku"} for pos in range(0, len(shown), 2)}
+
+    def save_run(edited_rows):
+        # save_manual_changes bez komunikatów st.*: diff względem migawki + zapis
+        started = time.perf_counter()
+        changes = app_funcs["diff_editor_changes"](session_state["editor_snapshot"], edited_rows)
+        db.bulk_update_cells(changes)
+        return len(changes), [time.perf_counter() - started]
+
+    def export_run(fmt):
+        def run(fake):
+            latencies = []
+            last = [time.perf_counter()]
+
+            def on_progress(count):
+                now = time.perf_counter()
+                latencies.append(now - last[0])
+                last[0] = now
+
+            columns = list(db.COLUMN_MAP)
+            output, count = export_tasks(
+                lambda after_id, limit: db.fetch_tasks_page(columns, after_id, limit), columns, fmt,
+                on_progress=on_progress
+            )
+            output.close()
+            return count, latencies
+        return run
+
+    writing_rows = max(1, args.rows // 10)
+    scenarios = {
+        **{f"batch_{stage}": (seeded(args.rows), batch(stage)) for stage in stages.STAGES},
+        "writing_loop": (seeded(writing_rows), batch("writing")),
+        "writing_loop_parallel": (seeded(writing_rows), batch("writing", dict(DEFAULT_CONTEXT, parallel=True))),
+        "import": (import_setup, import_run),
+        "save_manual_changes": (save_setup, save_run),
+        "fetch_data": (seeded(args.rows), fetch_data_run),
+        "fetch_data_delta": (fetch_delta_setup, fetch_delta_run),
+        "browse_pages": (seeded(args.rows), browse_run),
+        **{f"export_{fmt}": (seeded(args.rows), export_run(fmt)) for fmt in EXPORT_FORMATS},
+    }
+
+    results = []
+    for name in args.scenario or SCENARIOS:
+        if name not in scenarios:
+            # export_parquet bez pyarrow
+            print(f"{name}: pominięty (brak opcjonalnej zależności)", file=sys.stderr)
+            continue
+        setup, run = scenarios[name]
+        counters = {}
+
+        def counted_setup():
+            state = setup()
+            counters.update(queries=db.supabase.queries, requests=config.requests)
+            return state
+
+        result = measure(name, counted_setup, run, memory=not args.no_memory)
+        result["db_queries"] = db.supabase.queries - counters["queries"]
+        result["dify_requests"] = config.requests - counters["requests"]
+        results.append(result)
+        print(f"{name}: {result['items']} w {result['seconds']} s", file=sys.stderr)
+    server.stop()
+
+    try:
+        revision = subprocess.run(["git", "-C", REPO_ROOT, "rev-parse", "--short", "HEAD"],
+                                  capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = None
+    report = {
+        "meta": {
+            "revision": revision, "python": platform.python_version(), "timestamp": int(time.time()),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "scenario")},
+        },
+        "scenarios": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import streamlit as st
+from supabase import create_client
+
+from artifacts import (
+    ARTIFACT_COLUMNS, DEFAULT_CODEC, DEFAULT_MIN_BYTES, Artifacts, LocalArtifactStore, SupabaseArtifactStore,
+    is_reference
+)
+
+# Wspólny dostęp do bazy dla aplikacji Streamlit i workera (worker.py).
+# st.secrets / st.cache_resource działają także poza `streamlit run`.
+
+# --- MAPOWANIE KOLUMN (BAZA -> UI) ---
+COLUMN_MAP = {
+    'id': 'ID',
+    'keyword': 'Słowo kluczowe',
+    'language': 'Język',
+    'aio_prompt': 'AIO',
+    'status_research': 'Status Research',
+    'serp_phrases': 'Frazy z wyników',
+    'senuto_phrases': 'Frazy Senuto',
+    'info_graph': 'Graf informacji',
+    'competitors_headers': 'Nagłówki konkurencji',
+    'knowledge_graph': 'Knowledge graph',
+    'status_headers': 'Status Nagłówki',
+    'headers_expanded': 'Nagłówki rozbudowane',
+    'headers_h2': 'Nagłówki H2',
+    'headers_questions': 'Nagłówki pytania',
+    'headers_final': 'Nagłówki (Finalne)',
+    'status_rag': 'Status RAG',
+    'rag_content': 'RAG',
+    'rag_general': 'RAG General',
+    'status_brief': 'Status Brief',
+    'brief_json': 'Brief',
+    'brief_html': 'Brief plik',
+    'instructions': 'Dodatkowe instrukcje',
+    'status_writing': 'Status Generacja',
+    'final_article': 'Generowanie contentu'
+}
+
+REVERSE_COLUMN_MAP = {v: k for k, v in COLUMN_MAP.items()}
+
+# --- PROJEKCJA KOLUMN LISTY ZADAŃ ---
+# Tabela główna pobiera pełną treść tylko kolumn lekkich (ID, słowo kluczowe, statusy,
+# pola edytowane ręcznie). Z kolumn ciężkich (RAG, grafy, brief, artykuł) widok
+# seo_content_tasks_list zwraca jedynie podgląd - pełna treść jest dociągana na żądanie.
+LIST_COLUMNS = [
+    'id', 'keyword', 'language', 'aio_prompt',
+    'status_research', 'status_headers', 'status_rag', 'status_brief', 'status_writing',
+    'headers_final', 'instructions'
+]
+HEAVY_COLUMNS = [c for c in COLUMN_MAP if c not in LIST_COLUMNS]
+PREVIEW_CHARS = 120
+# Kolumny edytowalne ręcznie w tabeli
+EDITABLE_COLUMNS = [c for c in LIST_COLUMNS if c != 'id']
+# Limit ID w jednym zapytaniu `in_` (długość URL PostgREST)
+ID_CHUNK_SIZE = 500
+# Sortowania listy zadań: klucz -> (kolumna, malejąco); remis rozstrzyga id
+TASK_SORTS = {
+    'newest': ('id', True),
+    'oldest': ('id', False),
+    'keyword': ('keyword', False),
+    'updated': ('updated_at', True),
+}
+DEFAULT_SORT = 'newest'
+DEFAULT_PAGE_SIZE = 100
+
+# --- SUPABASE INIT ---
+@st.cache_resource(show_spinner=False)
+def init_supabase():
+    url = st.secrets["SUPABASE"]["URL"]
+    key = st.secrets["SUPABASE"]["KEY"]
+    return create_client(url, key)
+
+supabase = init_supabase()
+
+# --- ARTEFAKTY (duże wyniki etapów poza wierszem) ---
+@st.cache_resource(show_spinner=False)
+def init_artifacts():
+    """Magazyn artefaktów - secrets [artifacts] (ENABLED, BACKEND, PATH, BUCKET, CODEC, MIN_BYTES)."""
+    cfg = st.secrets.get("artifacts", {})
+    if cfg.get("BACKEND", "local") == "supabase":
+        store = SupabaseArtifactStore(supabase, cfg.get("BUCKET", "seo-artifacts"))
+    else:
+        store = LocalArtifactStore(cfg.get("PATH", ".cache/artifacts"))
+    return Artifacts(
+        store, enabled=bool(cfg.get("ENABLED", False)), codec=cfg.get("CODEC", DEFAULT_CODEC),
+        min_bytes=int(cfg.get("MIN_BYTES", DEFAULT_MIN_BYTES))
+    )
+
+artifacts = init_artifacts()
+
+# Podgląd kolumny, w której zamiast treści jest referencja do artefaktu
+ARTIFACT_PREVIEW = "📦 (artefakt - pełna treść w szczegółach)"
+
+def _preview_references(records):
+    for record in records:
+        for col in ARTIFACT_COLUMNS:
+            if is_reference(record.get(col)):
+                record[col] = ARTIFACT_PREVIEW
+    return records
+
+def update_db_record(row_id, updates, offload=True):
+    """Zapis wyniku etapu; duże wartości kolumn artefaktów trafiają do magazynu (`offload=False`: w wierszu)."""
+    if offload:
+        updates = artifacts.offload(updates)
+    supabase.table("seo_content_tasks").update(updates).eq("id", row_id).execute()
+
+# Kody PostgREST/Postgres: brak funkcji RPC albo tabeli/widoku (nieuruchomiona migracja)
+MISSING_OBJECT_CODES = {"PGRST202", "PGRST205", "42883", "42P01"}
+
+def _missing_in_db(error):
+    """Tylko brak obiektu w bazie uzasadnia wariant zastępczy - inne błędy (sieć, filtry) są zgłaszane."""
+    return getattr(error, "code", None) in MISSING_OBJECT_CODES
+
+def _filtered(request, query):
+    for col, prefix in (query.get("statuses") or {}).items():
+        request = request.like(col, f"{prefix}%")
+    if query.get("language"):
+        request = request.eq("language", query["language"])
+    if query.get("search"):
+        request = request.ilike("keyword", f"%{query['search']}%")
+    return request
+
+def _quoted(value):
+    """Wartość w filtrze `or` PostgREST: w cudzysłowie, z ucieczką."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _like_literal(value):
+    """Wzorzec LIKE dopasowujący dokładnie `value` (ucieczka \\, % i _)."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _task_page(source, columns, query, after, limit):
+    col, desc = TASK_SORTS[query.get("sort") or DEFAULT_SORT]
+    request = _filtered(supabase.table(source).select(columns), query)
+    if after is not None:
+        value, last_id = after
+        op = "lt" if desc else "gt"
+        if col == "id":
+            request = getattr(request, op)("id", last_id)
+        else:
+            request = request.or_(f"{col}.{op}.{_quoted(value)},and({col}.eq.{_quoted(value)},id.{op}.{last_id})")
+    return _preview_references(request.order(col, desc=desc).order("id", desc=desc).limit(limit).execute().data)
+
+def fetch_task_page(query, after=None, limit=DEFAULT_PAGE_SIZE, keys_only=False):
+    """Jedna strona listy zadań: kolumny lekkie + podgląd ciężkich (widok seo_content_tasks_list).
+
+    `query`: {"statuses": {kolumna_statusu: prefiks}, "language", "search", "sort"} - filtry,
+    wyszukiwanie i sortowanie wykonuje baza. `after`: kursor z task_cursor() (keyset pagination).
+    `keys_only`: tylko id i kolumna sortowania - do sprawdzenia składu strony przy odświeżaniu.
+    """
+    col, _ = TASK_SORTS[query.get("sort") or DEFAULT_SORT]
+    try:
+        columns = ",".join(dict.fromkeys(['id', col])) if keys_only else "*"
+        return _task_page("seo_content_tasks_list", columns, query, after, limit)
+    except Exception as e:
+        if not _missing_in_db(e):
+            raise
+        # Brak widoku (nieuruchomiona migracja) - same kolumny lekkie i kolumna sortowania (kursor strony)
+        columns = ",".join(dict.fromkeys(['id', col] if keys_only else LIST_COLUMNS + [col]))
+        return _task_page("seo_content_tasks", columns, query, after, limit)
+
+def task_cursor(query, record):
+    """Kursor strony następnej po `record`: (wartość kolumny sortowania, id)."""
+    col, _ = TASK_SORTS[query.get("sort") or DEFAULT_SORT]
+    return record.get(col), record['id']
+
+def count_task_page(query):
+    """Liczba zadań spełniających filtry `query`."""
+    return _filtered(supabase.table("seo_content_tasks").select("id", count="exact"), query).limit(1).execute().count
+
+def _task_rows(source, columns, ids_list, updated_since):
+    records = []
+    for start in range(0, len(ids_list), ID_CHUNK_SIZE):
+        request = supabase.table(source).select(columns).in_("id", ids_list[start:start + ID_CHUNK_SIZE])
+        if updated_since is not None:
+            request = request.gte("updated_at", updated_since)
+        records.extend(request.execute().data)
+    return records
+
+def fetch_task_rows(ids_list, updated_since=None):
+    """Wiersze listy (widok) o podanych ID; z `updated_since` (ISO) tylko zmienione od tej chwili."""
+    ids_list = list(ids_list)
+    try:
+        records = _task_rows("seo_content_tasks_list", "*", ids_list, updated_since)
+    except Exception as e:
+        if not _missing_in_db(e):
+            raise
+        # Brak widoku - jak w fetch_task_page; updated_at jest, skoro strona odświeża się przyrostowo
+        records = _task_rows("seo_content_tasks", ",".join(LIST_COLUMNS + ['updated_at']), ids_list, updated_since)
+    return _preview_references(records)
+
+def fetch_rows_by_ids(ids_list):
+    """Pobiera pełne wiersze (nazwy kolumn jak w UI) dla podanych ID."""
+    ids_list = list(ids_list)
+    records = []
+    for start in range(0, len(ids_list), ID_CHUNK_SIZE):
+        chunk = ids_list[start:start + ID_CHUNK_SIZE]
+        records.extend(supabase.table("seo_content_tasks").select("*").in_("id", chunk).execute().data)
+    artifacts.resolve_many(records)
+    return [{COLUMN_MAP.get(k, k): v for k, v in record.items()} for record in records]
+
+def _update_cells_by_value(cells):
+    """Wariant bez funkcji update_task_cells: warunkowy UPDATE na grupę komórek (kolumna, wczytana, nowa).
+
+    Warunek na wczytaną wartość jest w WHERE, więc sprawdzenie i zapis to jedna instrukcja.
+    Zwraca konflikty jak update_task_cells.
+    """
+    groups = {}
+    for cell in cells:
+        loaded = "" if cell["loaded"] is None else cell["loaded"]
+        groups.setdefault((cell["col"], loaded, cell["new"]), []).append(cell["id"])
+    unsaved = []
+    for (col, loaded, new), ids in groups.items():
+        for start in range(0, len(ids), ID_CHUNK_SIZE):
+            chunk = ids[start:start + ID_CHUNK_SIZE]
+            request = supabase.table("seo_content_tasks").update({col: new}).in_("id", chunk)
+            request = request.or_(f'{col}.is.null,{col}.eq.""') if loaded == "" else request.eq(col, loaded)
+            updated = {record['id'] for record in request.execute().data}
+            unsaved.extend((row_id, col) for row_id in chunk if row_id not in updated)
+    existing = set()
+    ids = list(dict.fromkeys(row_id for row_id, _ in unsaved))
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        response = supabase.table("seo_content_tasks").select("id").in_("id", ids[start:start + ID_CHUNK_SIZE]).execute()
+        existing.update(record['id'] for record in response.data)
+    return [(row_id, col if row_id in existing else None) for row_id, col in unsaved]
+
+def bulk_update_cells(changes):
+    """Zapisuje tylko zmienione komórki, z kontrolą współbieżności (compare-and-set w bazie).
+
+    `changes`: {id: {kolumna: (wartość_wczytana, nowa_wartość)}}. Komórka jest zapisywana tylko,
+    jeśli w bazie ma nadal wczytaną wartość - warunek i zapis to jedna instrukcja UPDATE, więc
+    wynik batcha lub workera zapisany w międzyczasie nie zostanie nadpisany. Usunięte wiersze nie
+    są tworzone ponownie. Zwraca (liczba_wierszy, konflikty): (id, kolumna), a dla usuniętego (id, None).
+    """
+    cells = [
+        {"id": row_id, "col": col, "loaded": loaded, "new": new}
+        for row_id, row_cells in changes.items() for col, (loaded, new) in row_cells.items()
+    ]
+    if not cells:
+        return 0, []
+    try:
+        response = supabase.rpc("update_task_cells", {"p_cells": cells}).execute()
+        conflicts = [(record['task_id'], record['col']) for record in response.data or []]
+    except Exception as e:
+        if not _missing_in_db(e):
+            raise
+        conflicts = _update_cells_by_value(cells)
+    conflicts = list(dict.fromkeys(conflicts))  # usunięty wiersz raz, nie dla każdej komórki
+    skipped = set(conflicts)
+    deleted = {row_id for row_id, col in conflicts if col is None}
+    saved = sum(
+        1 for row_id, row_cells in changes.items()
+        if row_id not in deleted and any((row_id, col) not in skipped for col in row_cells)
+    )
+    return saved, conflicts
+
+def find_existing_tasks(keywords_lower):
+    """Istniejące zadania dla słów kluczowych (porównanie bez wielkości liter): [{id, keyword, language}]."""
+    if not keywords_lower:
+        return []
+    try:
+        return supabase.rpc("find_existing_tasks", {"p_keywords": list(keywords_lower)}).execute().data or []
+    except Exception as e:
+        if not _missing_in_db(e):
+            raise
+        # Brak funkcji RPC - zapytania `ilike` w mniejszych porcjach (limit długości URL)
+        found = []
+        for start in range(0, len(keywords_lower), 50):
+            chunk = keywords_lower[start:start + 50]
+            query = supabase.table("seo_content_tasks").select("id,keyword,language")
+            query = query.or_(",".join(f'keyword.ilike.{_quoted(_like_literal(k))}' for k in chunk))
+            found.extend(query.execute().data)
+        return found
+
+def insert_tasks(records):
+    supabase.table("seo_content_tasks").insert(records).execute()
+
+def upsert_tasks(records):
+    supabase.table("seo_content_tasks").upsert(records).execute()
+
+def fetch_article_sections(task_id):
+    """Zapisane sekcje artykułu: {nagłówek: {"input_hash", "content"}} (tabela seo_article_sections)."""
+    response = supabase.table("seo_article_sections").select("heading,input_hash,content").eq("task_id", task_id).execute()
+    return {record["heading"]: record for record in response.data}
+
+def save_article_section(task_id, heading, input_hash, content):
+    supabase.table("seo_article_sections").upsert({
+        "task_id": task_id, "heading": heading, "input_hash": input_hash, "content": content
+    }).execute()
+
+def delete_article_sections(task_id, headings):
+    """Usuwa sekcje nagłówków, których nie ma już w konspekcie."""
+    headings = list(headings)
+    for start in range(0, len(headings), 50):
+        chunk = headings[start:start + 50]
+        supabase.table("seo_article_sections").delete().eq("task_id", task_id).in_("heading", chunk).execute()
+
+def fetch_tasks_page(columns, after_id=None, limit=500, filters=None):
+    """Jedna strona zadań (keyset pagination po id). `filters`: {kolumna: fragment tekstu}."""
+    query = supabase.table("seo_content_tasks").select(",".join(dict.fromkeys(['id'] + list(columns))))
+    for col, value in (filters or {}).items():
+        query = query.ilike(col, f"%{value}%")
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    return artifacts.resolve_many(query.order("id").limit(limit).execute().data)
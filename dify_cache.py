@@ -0,0 +1,233 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+# --- CACHE WYNIKÓW DIFY (ADRESOWANY TREŚCIĄ) ---
+# Klucz = sha256(workflow + znormalizowane wejścia), więc ten sam research/RAG
+# dla tej samej pary słowo kluczowe/język wraca z dysku w milisekundach -
+# niezależnie od tego, w którym wierszu czy projekcie się powtórzył.
+
+USE = "use"          # czytaj z cache i zapisuj wyniki
+REFRESH = "refresh"  # pomiń odczyt, zapisz świeży wynik
+BYPASS = "bypass"    # nie dotykaj cache
+CACHE_MODES = [USE, REFRESH, BYPASS]
+
+# Etapy "twórcze" (nagłówki, brief, pisanie) uruchamia się ponownie zwykle po to,
+# żeby dostać nową wersję - domyślnie nie są cache'owane.
+DEFAULT_CACHE_MODES = {"research": USE, "headers": BYPASS, "rag": USE, "brief": BYPASS, "writing": BYPASS}
+
+# Wejścia, w których wielkość liter nie zmienia wyniku workflow
+CASE_INSENSITIVE_INPUTS = {"keyword", "language"}
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_modes = contextvars.ContextVar("dify_cache_modes", default=None)
+
+
+@contextmanager
+def use_cache_modes(modes):
+    """Ustawia tryby cache (etap -> USE/REFRESH/BYPASS) dla bieżącego wątku/zadania."""
+    token = _modes.set(dict(modes))
+    try:
+        yield
+    finally:
+        _modes.reset(token)
+
+
+def current_mode(stage):
+    modes = _modes.get() or DEFAULT_CACHE_MODES
+    return modes.get(stage, DEFAULT_CACHE_MODES.get(stage, BYPASS))
+
+
+def normalize_value(key, value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        value = " ".join(unicodedata.normalize("NFC", value).split())
+        return value.casefold() if key in CASE_INSENSITIVE_INPUTS else value
+    if isinstance(value, float) and value != value:  # NaN z pandas
+        return ""
+    return value
+
+
+def cache_key(api_key, inputs):
+    """Hash workflow (po kluczu API, nie samym kluczu) i znormalizowanych wejść."""
+    workflow = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    normalized = {k: normalize_value(k, v) for k, v in sorted(inputs.items())}
+    digest = hashlib.sha256(json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+    return workflow, f"{workflow}:{digest.hexdigest()}"
+
+
+def is_cacheable(result):
+    data = result.get("data") if isinstance(result, dict) else None
+    return bool(data) and "error" not in result and data.get("status") in (None, "succeeded") and data.get("outputs") is not None
+
+
+class SQLiteCacheStore:
+    """Lokalny magazyn: SQLite z TTL i ograniczeniem rozmiaru (LRU po czasie ostatniego odczytu)."""
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, workflow TEXT, value BLOB, "
+            "size INTEGER, created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_idx ON results (accessed_at)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._delete([key])
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, workflow, value):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, workflow, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, workflow, blob, len(blob), now, now)
+            )
+            self._total += len(blob) - (old[0] if old else 0)
+            self._evict(now)
+            self._conn.commit()
+
+    def _delete(self, keys):
+        for key in keys:
+            row = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._total -= row[0]
+        self._conn.commit()
+
+    def _evict(self, now):
+        expired = self._conn.execute(
+            "SELECT key FROM results WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).fetchall()
+        self._delete([r[0] for r in expired])
+        while self._total > self.max_bytes:
+            oldest = self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at LIMIT 100").fetchall()
+            if not oldest:
+                break
+            victims, freed = [], 0
+            for key, size in oldest:
+                if self._total - freed <= self.max_bytes:
+                    break
+                victims.append(key)
+                freed += size
+            self._delete(victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._total = 0
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return {"entries": count, "bytes": self._total}
+
+
+class SupabaseCacheStore:
+    """Opcjonalny magazyn współdzielony między maszynami (tabela dify_result_cache)."""
+
+    def __init__(self, client, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        now = datetime.now(timezone.utc).isoformat()
+        response = self.client.table("dify_result_cache").select("value").eq("key", key).gt("expires_at", now).execute()
+        return json.loads(response.data[0]["value"]) if response.data else None
+
+    def put(self, key, workflow, value):
+        expires_at = (datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)).isoformat()
+        self.client.table("dify_result_cache").upsert({
+            "key": key, "workflow": workflow, "value": json.dumps(value, ensure_ascii=False), "expires_at": expires_at
+        }).execute()
+
+
+class DifyResultCache:
+    """Cache wokół wywołań workflow: lokalny magazyn + opcjonalny współdzielony, liczniki per etap."""
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _count(self, stage, what):
+        with self._lock:
+            counters = self._counters.setdefault(stage or "-", {"hits": 0, "misses": 0, "bypass": 0})
+            counters[what] += 1
+
+    def run(self, stage, api_key, inputs, call):
+        """Zwraca wynik z cache albo wykonuje `call()` i zapamiętuje poprawny wynik."""
+        mode = current_mode(stage)
+        if mode == BYPASS:
+            self._count(stage, "bypass")
+            return call()
+        workflow, key = cache_key(api_key, inputs)
+        if mode == USE:
+            cached = self._get(key, workflow)
+            if cached is not None:
+                self._count(stage, "hits")
+                return cached
+        self._count(stage, "misses")
+        result = call()
+        if is_cacheable(result):
+            self._put(key, workflow, result)
+        return result
+
+    def _get(self, key, workflow):
+        cached = self.local.get(key)
+        if cached is None and self.shared is not None:
+            try:
+                cached = self.shared.get(key)
+            except Exception:
+                cached = None
+            if cached is not None:
+                self.local.put(key, workflow, cached)
+        return cached
+
+    def _put(self, key, workflow, value):
+        self.local.put(key, workflow, value)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, workflow, value)
+            except Exception:
+                pass  # współdzielony cache jest tylko optymalizacją
+
+    def counters(self):
+        with self._lock:
+            return {stage: dict(c) for stage, c in self._counters.items()}
+
+    def clear(self):
+        self.local.clear()
@@ -0,0 +1,280 @@
+import asyncio
+import gzip
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # httpx jest zależnością supabase-py, więc zwykle jest już zainstalowany
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+DEFAULT_TIMEOUT = 450
+DEFAULT_POOL_SIZE = 32
+# Mniejszych payloadów nie opłaca się kompresować
+GZIP_MIN_BYTES = 1024
+
+
+def encode_payload(payload, gzip_requests=False):
+    """Serializuje payload do JSON; opcjonalnie kompresuje gzipem duże ciała żądań."""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"}
+    if gzip_requests and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def build_payload(inputs, user_id, response_mode="blocking"):
+    return {
+        "inputs": inputs,
+        "response_mode": response_mode,
+        "user": user_id
+    }
+
+
+# --- TRYB STREAMING (SSE) ---
+# Dify w trybie "streaming" wysyła zdarzenia Server-Sent Events:
+# workflow_started, node_started/node_finished, text_chunk, ping, workflow_finished
+# (oraz error). Wynik końcowy składamy z workflow_finished do tego samego
+# kształtu, jaki zwraca tryb blokujący: {"workflow_run_id", "task_id", "data": {...}}.
+
+class SSEParser:
+    """Przyrostowy parser SSE: `feed(line)` zwraca zdarzenie (dict) po pustej linii."""
+
+    def __init__(self):
+        self._data_lines = []
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r")
+        if not line:
+            return self.flush()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if field == "data":
+            self._data_lines.append(value[1:] if value.startswith(" ") else value)
+        elif field == "event" and value.strip() == "ping":
+            self._data_lines = []
+        return None
+
+    def flush(self):
+        if not self._data_lines:
+            return None
+        raw = "\n".join(self._data_lines)
+        self._data_lines = []
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return {"event": "unknown", "raw": raw}
+
+
+def iter_sse_events(lines):
+    """Parsuje linie strumienia SSE na słowniki zdarzeń (pola `data:` jako JSON)."""
+    parser = SSEParser()
+    for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            yield event
+    event = parser.flush()
+    if event is not None:
+        yield event
+
+
+def _counting(lines, stats):
+    """Przepuszcza linie strumienia (bajty), zliczając ich rozmiar w stats["response_bytes"]."""
+    for line in lines:
+        stats["response_bytes"] += len(line) + 1
+        yield line
+
+
+async def _aiter_byte_lines(chunks):
+    """Linie (bajty) z asynchronicznego strumienia fragmentów - dekodowanie UTF-8 robi SSEParser."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+class StreamCollector:
+    """Zbiera zdarzenia SSE jednego wywołania i składa wynik jak w trybie blokującym."""
+
+    def __init__(self, on_text_chunk=None):
+        self.on_text_chunk = on_text_chunk
+        self.result = None
+        self.error = None
+
+    def feed(self, event):
+        kind = event.get("event")
+        if kind == "text_chunk" and self.on_text_chunk:
+            self.on_text_chunk(event.get("data", {}).get("text", ""))
+        elif kind == "workflow_finished":
+            data = event.get("data", {})
+            if data.get("status") not in (None, "succeeded"):
+                self.error = data.get("error") or f"Workflow status: {data.get('status')}"
+            self.result = {
+                "workflow_run_id": event.get("workflow_run_id"),
+                "task_id": event.get("task_id"),
+                "data": data
+            }
+        elif kind == "error":
+            self.error = event.get("message") or event.get("code") or "Dify stream error"
+
+    def outcome(self):
+        if self.error:
+            return {"error": self.error}
+        if self.result is None:
+            return {"error": "Strumień zakończony bez zdarzenia workflow_finished"}
+        return self.result
+
+
+class DifyClient:
+    """Współdzielony klient Dify: pula połączeń keep-alive, gzip dla żądań i odpowiedzi."""
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, gzip_requests=False,
+                 response_mode="blocking"):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.gzip_requests = gzip_requests
+        self.response_mode = response_mode
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def workflow_url(self):
+        return f"{self.base_url}/workflows/run"
+
+    def run_workflow(self, api_key, inputs, user_id="streamlit_user", response_mode=None, on_text_chunk=None,
+                     stats=None):
+        """Odpowiednik dawnego `requests.post`: zwraca JSON Dify albo {"error": ...}.
+
+        W trybie "streaming" `timeout` dotyczy przerwy między zdarzeniami, a nie całego
+        wywołania, a `on_text_chunk` dostaje kolejne fragmenty tekstu na bieżąco.
+        Opcjonalny słownik `stats` dostaje request_bytes, response_bytes, http_status i retry_after.
+        """
+        stats = {} if stats is None else stats
+        mode = response_mode or self.response_mode
+        body, headers = encode_payload(build_payload(inputs, user_id, mode), self.gzip_requests)
+        headers["Authorization"] = f"Bearer {api_key}"
+        stats["request_bytes"] = len(body)
+        try:
+            if mode == "streaming":
+                return self._run_streaming(body, headers, on_text_chunk, stats)
+            response = self.session.post(self.workflow_url, headers=headers, data=body, timeout=self.timeout)
+            stats["http_status"] = response.status_code
+            stats["retry_after"] = response.headers.get("Retry-After")
+            stats["response_bytes"] = len(response.content)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            # Tylko błąd nawiązania połączenia gwarantuje, że workflow nie ruszył (ReadTimeout nie jest ConnectionError)
+            stats["connect_error"] = isinstance(e, requests.ConnectionError)
+            return {"error": str(e)}
+
+    def _run_streaming(self, body, headers, on_text_chunk, stats):
+        collector = StreamCollector(on_text_chunk)
+        with self.session.post(self.workflow_url, headers=headers, data=body, timeout=self.timeout, stream=True) as response:
+            stats["http_status"] = response.status_code
+            stats["retry_after"] = response.headers.get("Retry-After")
+            response.raise_for_status()
+            stats["response_bytes"] = 0
+            # SSE jest zawsze w UTF-8; bez charset w Content-Type requests dekodowałby jako ISO-8859-1
+            for event in iter_sse_events(_counting(response.iter_lines(), stats)):
+                collector.feed(event)
+        return collector.outcome()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncDifyClient:
+    """Asynchroniczny odpowiednik DifyClient (httpx) - wiele wywołań z jednego procesu."""
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, gzip_requests=False,
+                 response_mode="blocking"):
+        if httpx is None:
+            raise ImportError("AsyncDifyClient wymaga pakietu httpx (pip install httpx)")
+        self.base_url = base_url.rstrip("/")
+        self.gzip_requests = gzip_requests
+        self.response_mode = response_mode
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    @property
+    def workflow_url(self):
+        return f"{self.base_url}/workflows/run"
+
+    async def run_workflow(self, api_key, inputs, user_id="streamlit_user", response_mode=None, on_text_chunk=None,
+                           stats=None):
+        stats = {} if stats is None else stats
+        mode = response_mode or self.response_mode
+        body, headers = encode_payload(build_payload(inputs, user_id, mode), self.gzip_requests)
+        headers["Authorization"] = f"Bearer {api_key}"
+        stats["request_bytes"] = len(body)
+        try:
+            if mode == "streaming":
+                return await self._run_streaming(body, headers, on_text_chunk, stats)
+            response = await self.client.post(self.workflow_url, headers=headers, content=body)
+            stats["http_status"] = response.status_code
+            stats["retry_after"] = response.headers.get("Retry-After")
+            stats["response_bytes"] = len(response.content)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            stats["connect_error"] = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            return {"error": str(e)}
+
+    async def _run_streaming(self, body, headers, on_text_chunk, stats):
+        collector = StreamCollector(on_text_chunk)
+        async with self.client.stream("POST", self.workflow_url, headers=headers, content=body) as response:
+            stats["http_status"] = response.status_code
+            stats["retry_after"] = response.headers.get("Retry-After")
+            response.raise_for_status()
+            stats["response_bytes"] = 0
+            parser = SSEParser()
+            async for line in _aiter_byte_lines(response.aiter_bytes()):
+                stats["response_bytes"] += len(line) + 1
+                event = parser.feed(line)
+                if event is not None:
+                    collector.feed(event)
+            event = parser.flush()
+            if event is not None:
+                collector.feed(event)
+        return collector.outcome()
+
+    async def run_many(self, calls, concurrency=8):
+        """Wykonuje listę (api_key, inputs) z limitem równoległości; wyniki w kolejności wejścia."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(api_key, inputs):
+            async with semaphore:
+                return await self.run_workflow(api_key, inputs)
+
+        return await asyncio.gather(*(_one(api_key, inputs) for api_key, inputs in calls))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
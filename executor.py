@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- RÓWNOLEGŁE PRZETWARZANIE WIERSZY ---
+# Wątki robocze nie mogą dotykać elementów Streamlit (brak ScriptRunContext),
+# dlatego cały postęp i błędy zbieramy w BatchProgress, a UI odświeża
+# wyłącznie główny wątek skryptu.
+
+
+class BatchProgress:
+    """Bezpieczny wątkowo licznik postępu i agregator błędów batcha."""
+
+    def __init__(self, total):
+        self.total = total
+        self.success = 0
+        self.cancelled = 0
+        self.errors = []
+        self._reported_errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        with self._lock:
+            return self.success + len(self.errors) + self.cancelled
+
+    def record_success(self):
+        with self._lock:
+            self.success += 1
+
+    def record_error(self, row, message):
+        with self._lock:
+            self.errors.append((row, message))
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def pop_new_errors(self):
+        """Zwraca błędy, które pojawiły się od poprzedniego wywołania."""
+        with self._lock:
+            new = self.errors[self._reported_errors:]
+            self._reported_errors = len(self.errors)
+            return new
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "total": self.total,
+                "done": self.success + len(self.errors) + self.cancelled,
+                "success": self.success,
+                "errors": len(self.errors),
+                "cancelled": self.cancelled,
+            }
+
+
+class BatchExecutor:
+    """Pula wątków z limitem wierszy w locie i prawdziwym anulowaniem oczekujących."""
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max(1, int(max_workers))
+        self.progress = None
+        self._stop = threading.Event()
+        self._pool = None
+        self._futures = []
+
+    def start(self, rows, task):
+        """Uruchamia `task(row)` dla każdego wiersza. Wyjątek z `task` = błąd wiersza."""
+        rows = list(rows)
+        self.progress = BatchProgress(len(rows))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch")
+        self._futures = [self._pool.submit(self._run_one, task, row) for row in rows]
+        return self.progress
+
+    def _run_one(self, task, row):
+        if self._stop.is_set():
+            self.progress.record_cancelled()
+            return
+        try:
+            task(row)
+            self.progress.record_success()
+        except Exception as e:
+            self.progress.record_error(row, str(e))
+
+    def wait(self, timeout=None):
+        """Czeka maks. `timeout` sekund na kolejne wyniki. True = wszystko zakończone."""
+        pending = [f for f in self._futures if not f.done()]
+        if not pending:
+            return True
+        wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        return all(f.done() for f in self._futures)
+
+    def stop(self):
+        """Anuluje wiersze, które jeszcze nie wystartowały. Trwające kończą się normalnie."""
+        self._stop.set()
+        for f in self._futures:
+            if f.cancel():
+                self.progress.record_cancelled()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import tempfile
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # opcjonalnie - bez pakietu format Parquet nie jest oferowany
+    pyarrow = None
+
+# --- EKSPORT STRONICOWANY ---
+# Dane pobieramy stronami (keyset pagination po `id`) i od razu dopisujemy do pliku
+# tymczasowego na dysku - zużycie pamięci nie zależy od liczby wierszy.
+
+DEFAULT_PAGE_SIZE = 500
+XLSX_MAX_ROWS = 1048576
+XLSX_MAX_CELL = 32767
+
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "XLSX"),
+    "csv": ("text/csv", "CSV"),
+    "jsonl": ("application/x-ndjson", "JSONL"),
+}
+if pyarrow is not None:
+    EXPORT_FORMATS["parquet"] = ("application/vnd.apache.parquet", "Parquet")
+
+
+def iter_pages(fetch_page, page_size=DEFAULT_PAGE_SIZE):
+    """Keyset pagination: `fetch_page(after_id, limit)` zwraca wiersze posortowane rosnąco po `id`."""
+    after_id = None
+    while True:
+        page = fetch_page(after_id, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]["id"]
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    return value
+
+
+class XlsxWriter:
+    def __init__(self, output, headers):
+        import xlsxwriter
+        self.workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "strings_to_urls": False})
+        self.headers = headers
+        self.sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        name = "SEO Content" if self.sheets == 1 else f"SEO Content {self.sheets}"
+        self.sheet = self.workbook.add_worksheet(name)
+        self.sheet.write_row(0, 0, self.headers)
+        self.row = 1
+
+    def write(self, values):
+        if self.row >= XLSX_MAX_ROWS:
+            self._new_sheet()
+        for col, value in enumerate(values):
+            value = _cell(value)
+            if isinstance(value, str) and len(value) > XLSX_MAX_CELL:
+                value = value[:XLSX_MAX_CELL]
+            self.sheet.write(self.row, col, value)
+        self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+
+class CsvWriter:
+    def __init__(self, output, headers):
+        self.text = io.TextIOWrapper(output, encoding="utf-8-sig", newline="", write_through=True)
+        self.writer = csv.writer(self.text)
+        self.writer.writerow(headers)
+
+    def write(self, values):
+        self.writer.writerow([_cell(v) for v in values])
+
+    def close(self):
+        self.text.flush()
+        self.text.detach()
+
+
+class JsonlWriter:
+    def __init__(self, output, headers):
+        self.output = output
+        self.headers = headers
+
+    def write(self, values):
+        line = json.dumps(dict(zip(self.headers, values)), ensure_ascii=False, default=str)
+        self.output.write(line.encode("utf-8") + b"\n")
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    """Parquet wymaga pyarrow; wiersze buforujemy tylko w obrębie jednej strony."""
+
+    def __init__(self, output, headers):
+        if pyarrow is None:
+            raise ImportError("Eksport Parquet wymaga pakietu pyarrow (pip install pyarrow)")
+        pa = self.pa = pyarrow
+        self.headers = headers
+        self.schema = pa.schema([(h, pa.int64() if h in ("id", "ID") else pa.string()) for h in headers])
+        self.writer = pyarrow.parquet.ParquetWriter(output, self.schema, compression="zstd")
+        self.buffer = []
+
+    def write(self, values):
+        self.buffer.append(values)
+
+    def flush_page(self):
+        if not self.buffer:
+            return
+        columns = list(zip(*self.buffer))
+        arrays = [
+            self.pa.array([v if v is None or field.type == self.pa.int64() else str(v) for v in column], type=field.type)
+            for field, column in zip(self.schema, columns)
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.buffer = []
+
+    def close(self):
+        self.flush_page()
+        self.writer.close()
+
+
+WRITERS = {"xlsx": XlsxWriter, "csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+def export_tasks(fetch_page, columns, fmt, headers=None, page_size=DEFAULT_PAGE_SIZE, on_progress=None):
+    """Eksportuje `columns` do pliku tymczasowego w formacie `fmt`. Zwraca (plik, liczba_wierszy).
+
+    Plik jest ustawiony na początek; wywołujący odpowiada za jego zamknięcie. Po błędzie
+    (także przy tworzeniu writera) plik tymczasowy jest zamykany tutaj.
+    """
+    writer_class = WRITERS[fmt]
+    output = tempfile.TemporaryFile()
+    count = 0
+    try:
+        writer = writer_class(output, headers or columns)
+        try:
+            for page in iter_pages(fetch_page, page_size):
+                for record in page:
+                    writer.write([record.get(col) for col in columns])
+                if hasattr(writer, "flush_page"):
+                    writer.flush_page()
+                count += len(page)
+                if on_progress:
+                    on_progress(count)
+        finally:
+            writer.close()
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output, count
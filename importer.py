@@ -0,0 +1,136 @@
+import time
+from itertools import islice
+
+import pandas as pd
+
+# --- IMPORT ZBIORCZY (STRUMIENIOWY) ---
+# Plik czytamy porcjami (CSV: pandas chunksize, XLSX: openpyxl read-only), każdą porcję
+# deduplikujemy jednym zapytaniem do bazy i wstawiamy zbiorczo - czas importu zależy
+# od przepustowości, a nie od liczby pojedynczych zapytań.
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 500
+MAX_KEYWORD_LENGTH = 500
+
+SKIP = "skip"    # istniejąca para słowo kluczowe + język: pomiń
+MERGE = "merge"  # istniejąca para: uzupełnij AIO z pliku
+
+
+def _is_xlsx(filename):
+    return filename.lower().endswith((".xlsx", ".xlsm"))
+
+
+def iter_import_chunks(file, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Zwraca kolejne porcje pliku jako listy słowników {kolumna: wartość}."""
+    if _is_xlsx(filename):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h) if h is not None else f"Kolumna {i+1}" for i, h in enumerate(next(rows, []))]
+            while True:
+                chunk = [dict(zip(header, values)) for values in islice(rows, chunk_size)]
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            workbook.close()
+    else:
+        for frame in pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            yield frame.to_dict("records")
+
+
+def read_import_preview(file, filename, rows=2):
+    """Nagłówki i kilka pierwszych wierszy bez wczytywania całego pliku."""
+    chunk = next(iter_import_chunks(file, filename, chunk_size=rows), [])
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return pd.DataFrame(chunk)
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return " ".join(str(value).split())
+
+
+def dedup_key(keyword, language):
+    return (keyword.lower(), language.lower())
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.merged = 0
+        self.duplicates = 0
+        self.rejected = []  # (nr wiersza w pliku, powód)
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def import_chunks(chunks, c_kw, c_lang=None, c_aio=None, lookup_existing=None, insert_rows=None,
+                  merge_rows=None, batch_size=DEFAULT_BATCH_SIZE, on_existing=SKIP, on_progress=None):
+    """Importuje porcje pliku. Funkcje bazy są wstrzykiwane:
+
+    - `lookup_existing(keywords)` -> [{"id", "keyword", "language"}] dla podanych słów (jedno zapytanie na porcję),
+    - `insert_rows(records)` - zbiorczy insert,
+    - `merge_rows(records)` - zbiorczy upsert {"id", "keyword", "aio_prompt"} (tryb MERGE).
+    """
+    report = ImportReport()
+    seen = set()
+    line_no = 1  # wiersz nagłówka
+    for chunk in chunks:
+        candidates = []
+        for raw in chunk:
+            line_no += 1
+            report.read += 1
+            keyword = _text(raw.get(c_kw))
+            language = _text(raw.get(c_lang)) if c_lang else ""
+            aio = _text(raw.get(c_aio)) if c_aio else ""
+            if not keyword:
+                report.rejected.append((line_no, "Puste słowo kluczowe"))
+                continue
+            if len(keyword) > MAX_KEYWORD_LENGTH:
+                report.rejected.append((line_no, f"Słowo kluczowe dłuższe niż {MAX_KEYWORD_LENGTH} znaków"))
+                continue
+            key = dedup_key(keyword, language or "pl")
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            candidates.append({"keyword": keyword, "language": language or "pl", "aio_prompt": aio, "headers_final": ""})
+
+        existing = {}
+        if candidates and lookup_existing is not None:
+            for record in lookup_existing(sorted({c["keyword"].lower() for c in candidates})):
+                existing[dedup_key(record["keyword"] or "", record["language"] or "pl")] = record
+
+        new_rows, merge = [], []
+        for candidate in candidates:
+            match = existing.get(dedup_key(candidate["keyword"], candidate["language"]))
+            if match is None:
+                new_rows.append(candidate)
+            elif on_existing == MERGE and candidate["aio_prompt"]:
+                merge.append({"id": match["id"], "keyword": match["keyword"], "aio_prompt": candidate["aio_prompt"]})
+            else:
+                report.duplicates += 1
+
+        for start in range(0, len(new_rows), batch_size):
+            batch = new_rows[start:start + batch_size]
+            insert_rows(batch)
+            report.inserted += len(batch)
+        for start in range(0, len(merge), batch_size):
+            batch = merge[start:start + batch_size]
+            merge_rows(batch)
+            report.merged += len(batch)
+        if on_progress:
+            on_progress(report)
+    return report
@@ -0,0 +1,144 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+# --- KOLEJKA ZADAŃ Z DZIERŻAWAMI (LEASE) ---
+# Jedno zadanie = para (task_id, stage) w tabeli seo_task_jobs. Worker "zajmuje"
+# zadanie atomowo (FOR UPDATE SKIP LOCKED po stronie Postgresa) na `lease_seconds`,
+# przedłuża dzierżawę heartbeatem, a po awarii wygasła dzierżawa wraca do puli.
+# Schemat tabeli i funkcje RPC: README -> "Kolejka zadań (worker)".
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+QUEUED_STATUS = "⏳ W kolejce"
+# Dzierżawa wygasła po ostatniej próbie: zadanie kończy się błędem
+EXHAUSTED_ERROR = "przekroczono limit prób"
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class SupabaseJobQueue:
+    """Kolejka oparta o tabelę seo_task_jobs i funkcje RPC w Supabase."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def enqueue(self, stage, task_ids):
+        """Dodaje (albo ponawia) zadania etapu. Zwraca ID faktycznie wstawione do kolejki.
+
+        Zadanie w trakcie z ważną dzierżawą nie jest resetowane - inaczej drugi worker
+        mógłby je zająć, zanim pierwszy skończy. Warunek jest w WHERE, więc atomowo względem claim.
+        """
+        if not task_ids:
+            return []
+        ids = [int(task_id) for task_id in task_ids]
+        now = datetime.now(timezone.utc).isoformat()
+        queued = {
+            "state": QUEUED, "lease_owner": None, "lease_expires_at": None, "attempts": 0,
+            "last_error": None, "enqueued_at": now
+        }
+        table = self.client.table("seo_task_jobs")
+        inserted = table.upsert(
+            [{"task_id": task_id, "stage": stage, **queued} for task_id in ids],
+            on_conflict="task_id,stage", ignore_duplicates=True
+        ).execute()
+        requeued = table.update(queued).eq("stage", stage).in_("task_id", ids).or_(
+            f'state.neq.{RUNNING},lease_expires_at.lt."{now}"'
+        ).execute()
+        return sorted({r["task_id"] for r in (inserted.data or []) + (requeued.data or [])})
+
+    def claim(self, stage, owner, limit, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Atomowo zajmuje maks. `limit` zadań etapu. Zwraca listę task_id.
+
+        Zadania, którym po ostatniej próbie wygasła dzierżawa, RPC kończy stanem failed
+        i ustawia "❌ Błąd: przekroczono limit prób" w kolumnie statusu etapu.
+        """
+        response = self.client.rpc("claim_seo_jobs", {
+            "p_stage": stage, "p_owner": owner, "p_limit": int(limit),
+            "p_lease_seconds": int(lease_seconds), "p_max_attempts": int(max_attempts)
+        }).execute()
+        return [r["task_id"] for r in response.data or []]
+
+    def heartbeat(self, stage, owner, task_ids, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Przedłuża dzierżawy. Zwraca ID, które nadal należą do `owner`."""
+        if not task_ids:
+            return []
+        response = self.client.rpc("heartbeat_seo_jobs", {
+            "p_stage": stage, "p_owner": owner, "p_task_ids": [int(t) for t in task_ids],
+            "p_lease_seconds": int(lease_seconds)
+        }).execute()
+        return [r["task_id"] for r in response.data or []]
+
+    def complete(self, stage, owner, task_id, error=None):
+        self.client.table("seo_task_jobs").update({
+            "state": FAILED if error else DONE, "lease_owner": None, "lease_expires_at": None,
+            "last_error": error
+        }).eq("task_id", int(task_id)).eq("stage", stage).eq("lease_owner", owner).execute()
+
+
+class InMemoryJobQueue:
+    """Odpowiednik SupabaseJobQueue w pamięci procesu (testy, uruchomienia lokalne)."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.jobs = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, stage, task_ids):
+        with self._lock:
+            now = self.clock()
+            queued = []
+            for task_id in task_ids:
+                job = self.jobs.get((int(task_id), stage))
+                if job and job["state"] == RUNNING and job["lease_expires_at"] >= now:
+                    continue
+                self._seq += 1
+                self.jobs[(int(task_id), stage)] = {
+                    "state": QUEUED, "lease_owner": None, "lease_expires_at": None,
+                    "attempts": 0, "last_error": None, "enqueued_at": self._seq
+                }
+                queued.append(int(task_id))
+            return queued
+
+    def claim(self, stage, owner, limit, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        with self._lock:
+            now = self.clock()
+            for (task_id, job_stage), job in self.jobs.items():
+                if (job_stage == stage and job["state"] == RUNNING and job["lease_expires_at"] < now
+                        and job["attempts"] >= max_attempts):
+                    job.update(state=FAILED, lease_owner=None, lease_expires_at=None, last_error=EXHAUSTED_ERROR)
+            claimable = [
+                (job["enqueued_at"], task_id) for (task_id, job_stage), job in self.jobs.items()
+                if job_stage == stage and job["attempts"] < max_attempts and (
+                    job["state"] == QUEUED or (job["state"] == RUNNING and job["lease_expires_at"] < now)
+                )
+            ]
+            claimed = []
+            for _, task_id in sorted(claimable)[:limit]:
+                job = self.jobs[(task_id, stage)]
+                job.update(state=RUNNING, lease_owner=owner, lease_expires_at=now + lease_seconds,
+                           attempts=job["attempts"] + 1)
+                claimed.append(task_id)
+            return claimed
+
+    def heartbeat(self, stage, owner, task_ids, lease_seconds=DEFAULT_LEASE_SECONDS):
+        with self._lock:
+            now = self.clock()
+            owned = []
+            for task_id in task_ids:
+                job = self.jobs.get((int(task_id), stage))
+                if job and job["state"] == RUNNING and job["lease_owner"] == owner:
+                    job["lease_expires_at"] = now + lease_seconds
+                    owned.append(int(task_id))
+            return owned
+
+    def complete(self, stage, owner, task_id, error=None):
+        with self._lock:
+            job = self.jobs.get((int(task_id), stage))
+            if job and job["lease_owner"] == owner:
+                job.update(state=FAILED if error else DONE, lease_owner=None, lease_expires_at=None,
+                           last_error=error)
@@ -0,0 +1,121 @@
+import re
+
+import numpy as np
+
+# --- WYSZUKIWANIE WIEDZY DLA NAGŁÓWKA (BM25, OFFLINE) ---
+# Zamiast wysyłać cały RAG przy każdej sekcji, dzielimy go raz na fragmenty
+# i dla każdego nagłówka wybieramy najtrafniejsze z nich w ramach budżetu bajtów.
+
+PASSAGE_CHARS = 700
+STEM_CHARS = 6  # prosty "stemming" przez obcięcie - wystarcza dla odmiany w polskim
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    text = re.sub(r"<[^>]+>", " ", text or "").lower()
+    return [t[:STEM_CHARS] for t in _TOKEN_RE.findall(text) if len(t) > 1 and not t.isdigit()]
+
+
+def _split_long(paragraph, max_chars):
+    sentences = re.split(r"(?<=[.!?])\s+", paragraph)
+    parts, current = [], ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            parts.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+        while len(current) > max_chars:
+            parts.append(current[:max_chars])
+            current = current[max_chars:]
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_text(text, max_chars=PASSAGE_CHARS):
+    """Dzieli tekst na fragmenty po akapitach, łącząc krótkie i dzieląc długie po zdaniach."""
+    passages, current = [], ""
+    for paragraph in re.split(r"\n\s*\n|\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) > max_chars:
+            if current:
+                passages.append(current)
+                current = ""
+            passages.extend(_split_long(paragraph, max_chars))
+        elif current and len(current) + len(paragraph) + 1 > max_chars:
+            passages.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+class KnowledgeIndex:
+    """Indeks BM25 fragmentów jednego wiersza - macierz częstości termów w NumPy."""
+
+    def __init__(self, passages):
+        self.passages = passages
+        vocab = {}
+        rows, cols = [], []
+        for i, passage in enumerate(passages):
+            for token in tokenize(passage):
+                rows.append(i)
+                cols.append(vocab.setdefault(token, len(vocab)))
+        self.vocab = vocab
+        self.tf = np.zeros((len(passages), max(1, len(vocab))), dtype=np.float32)
+        np.add.at(self.tf, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+        lengths = self.tf.sum(axis=1)
+        avg = lengths.mean() if len(passages) else 1.0
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (avg or 1.0))
+        df = (self.tf > 0).sum(axis=0)
+        self.idf = np.log(1 + (len(passages) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.sizes = [len(p.encode("utf-8")) for p in passages]
+
+    @classmethod
+    def from_text(cls, text, max_chars=PASSAGE_CHARS):
+        return cls(chunk_text(text, max_chars))
+
+    def scores(self, query):
+        columns = sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab})
+        if not columns or not self.passages:
+            return np.zeros(len(self.passages), dtype=np.float32)
+        tf = self.tf[:, columns]
+        return (self.idf[columns] * tf * (BM25_K1 + 1) / (tf + self.norm[:, None])).sum(axis=1)
+
+    def select(self, query, budget_bytes, top_k=None):
+        """Najtrafniejsze fragmenty mieszczące się w budżecie, w kolejności z oryginalnego tekstu."""
+        if sum(self.sizes) <= budget_bytes:
+            return "\n\n".join(self.passages)
+        scores = self.scores(query)
+        # Stabilne sortowanie: przy braku trafień (same zera) wygrywa początek tekstu
+        order = np.argsort(-scores, kind="stable")
+        chosen, used = [], 0
+        for idx in order[:top_k] if top_k else order:
+            size = self.sizes[idx] + 2
+            if used + size > budget_bytes:
+                continue
+            chosen.append(int(idx))
+            used += size
+        return "\n\n".join(self.passages[i] for i in sorted(chosen))
+
+
+def select_keywords(keywords_text, query, limit):
+    """Frazy najbliższe nagłówkowi (wspólne tokeny), uzupełnione kolejnymi z listy do `limit`."""
+    phrases = []
+    for phrase in re.split(r"[,\n;]", keywords_text or ""):
+        phrase = phrase.strip()
+        if phrase and phrase.lower() not in ("nan", "none") and phrase not in phrases:
+            phrases.append(phrase)
+    if len(phrases) <= limit:
+        return ", ".join(phrases)
+    query_tokens = set(tokenize(query))
+    overlap = [len(query_tokens.intersection(tokenize(p))) for p in phrases]
+    ranked = sorted(range(len(phrases)), key=lambda i: -overlap[i])[:limit]
+    return ", ".join(phrases[i] for i in sorted(ranked))
@@ -0,0 +1,152 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- PIPELINE: GRAF ZALEŻNOŚCI ETAPÓW ---
+# Zależności wynikają z danych, które faktycznie czyta każda funkcja stage_*:
+# - headers i rag potrzebują tylko wyników researchu (mogą iść równolegle),
+# - brief potrzebuje nagłówków,
+# - writing potrzebuje nagłówków (Finalne/rozbudowane) i bazy RAG - briefu nie czyta.
+STAGE_DEPENDENCIES = {
+    "research": [],
+    "headers": ["research"],
+    "rag": ["research"],
+    "brief": ["headers"],
+    "writing": ["headers", "rag"],
+}
+
+# Stany etapu w obrębie jednego wiersza
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+BLOCKED = "blocked"    # zależność nie powiodła się albo anulowano
+HELD = "held"          # zatrzymany przez bramkę (np. akceptacja nagłówków)
+
+
+class PipelineScheduler:
+    """Każdy wiersz przechodzi przez graf etapów niezależnie od pozostałych.
+
+    `run_stage(row, stage)` wykonuje etap i zwraca słownik aktualizacji wiersza
+    (nazwy kolumn jak w `row`), które są scalane przed uruchomieniem kolejnych etapów.
+    `is_done(row, stage)` pozwala pominąć etapy już ukończone. Etapy z `hold` nie są
+    uruchamiane (bramka human-in-the-loop) - ich wiersz kończy się stanem HELD.
+    """
+
+    def __init__(self, run_stage, limits, dependencies=STAGE_DEPENDENCIES, is_done=None, hold=()):
+        self.run_stage = run_stage
+        self.limits = {stage: max(1, int(limits.get(stage, 1))) for stage in dependencies}
+        self.dependencies = dependencies
+        self.is_done = is_done or (lambda row, stage: False)
+        self.hold = set(hold)
+        self.errors = []
+        self._reported_errors = 0
+        self._rows = []
+        self._states = []
+        self._ready = {stage: [] for stage in dependencies}
+        self._in_flight = {stage: 0 for stage in dependencies}
+        self._pool = None
+        self._stopped = False
+        self._finished = threading.Event()
+        # RLock: add_done_callback wywołuje _on_done od razu, jeśli etap już się skończył
+        self._lock = threading.RLock()
+
+    def start(self, rows):
+        self._rows = [dict(row) for row in rows]
+        self._states = [
+            {stage: DONE if self.is_done(row, stage) else PENDING for stage in self.dependencies}
+            for row in self._rows
+        ]
+        self._pool = ThreadPoolExecutor(max_workers=sum(self.limits.values()), thread_name_prefix="pipeline")
+        with self._lock:
+            for idx in range(len(self._rows)):
+                self._enqueue_ready(idx)
+            self._dispatch()
+            self._check_finished()
+
+    def _enqueue_ready(self, idx):
+        states = self._states[idx]
+        for stage, deps in self.dependencies.items():
+            if states[stage] != PENDING:
+                continue
+            if any(states[d] in (FAILED, BLOCKED) for d in deps):
+                states[stage] = BLOCKED
+            elif any(states[d] == HELD for d in deps):
+                states[stage] = HELD
+            elif all(states[d] == DONE for d in deps):
+                if stage in self.hold:
+                    states[stage] = HELD
+                else:
+                    states[stage] = RUNNING
+                    self._ready[stage].append(idx)
+        # Zablokowanie/wstrzymanie mogło odblokować decyzję dla etapów dalej w grafie
+        if any(
+            states[stage] == PENDING and any(states[d] in (FAILED, BLOCKED, HELD) for d in deps)
+            for stage, deps in self.dependencies.items()
+        ):
+            self._enqueue_ready(idx)
+
+    def _dispatch(self):
+        for stage, queue in self._ready.items():
+            while queue and self._in_flight[stage] < self.limits[stage] and not self._stopped:
+                idx = queue.pop(0)
+                self._in_flight[stage] += 1
+                row_snapshot = dict(self._rows[idx])
+                future = self._pool.submit(self.run_stage, row_snapshot, stage)
+                future.add_done_callback(lambda f, idx=idx, stage=stage: self._on_done(idx, stage, f))
+
+    def _on_done(self, idx, stage, future):
+        with self._lock:
+            self._in_flight[stage] -= 1
+            error = future.exception()
+            if error is None:
+                self._rows[idx].update(future.result() or {})
+                self._states[idx][stage] = DONE
+            else:
+                self._states[idx][stage] = FAILED
+                self.errors.append((self._rows[idx], stage, str(error)))
+            self._enqueue_ready(idx)
+            self._dispatch()
+            self._check_finished()
+
+    def _check_finished(self):
+        if not any(self._in_flight.values()) and (self._stopped or not any(self._ready.values())):
+            self._finished.set()
+
+    def wait(self, timeout=None):
+        """Czeka maks. `timeout` sekund. True = wszystkie wiersze dotarły do końca grafu."""
+        return self._finished.wait(timeout)
+
+    def stop(self):
+        """Nie uruchamia nowych etapów; trwające kończą się normalnie."""
+        with self._lock:
+            self._stopped = True
+            for stage, queue in self._ready.items():
+                for idx in queue:
+                    self._states[idx][stage] = BLOCKED
+                queue.clear()
+            self._check_finished()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def rows_in_state(self, stage, state):
+        with self._lock:
+            return [row for row, states in zip(self._rows, self._states) if states[stage] == state]
+
+    def pop_new_errors(self):
+        with self._lock:
+            new = self.errors[self._reported_errors:]
+            self._reported_errors = len(self.errors)
+            return new
+
+    def snapshot(self):
+        """Liczba wierszy w każdym stanie, osobno dla każdego etapu."""
+        with self._lock:
+            summary = {stage: {} for stage in self.dependencies}
+            for states in self._states:
+                for stage, state in states.items():
+                    summary[stage][state] = summary[stage].get(state, 0) + 1
+            for stage in self.dependencies:
+                queued = len(self._ready[stage])
+                summary[stage]["queued"] = queued
+                summary[stage][RUNNING] = summary[stage].get(RUNNING, 0) - queued
+            return summary
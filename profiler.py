@@ -0,0 +1,83 @@
+import logging
+import statistics
+import time
+from collections import deque
+from functools import wraps
+
+import pandas as pd
+
+# --- PROFIL RERUNA ---
+# Każdy rerun aplikacji (i każdy osobny rerun fragmentu) mierzy czasy kolejnych sekcji
+# skryptu: `mark(nazwa)` zamyka sekcję trwającą od poprzedniego znacznika. Wynik jest
+# pokazywany w panelu bocznym i logowany (logger "profiler"), gdy profil jest włączony;
+# reruny dłuższe niż budżet logowane są jako ostrzeżenie.
+
+DEFAULT_BUDGET_MS = 200
+HISTORY_SIZE = 50
+
+log = logging.getLogger("profiler")
+
+
+class RerunProfiler:
+    """Czasy sekcji jednego reruna [ms]; `history` (deque z sesji) zbiera sumy kolejnych rerunów."""
+
+    def __init__(self, history, enabled=False, budget_ms=DEFAULT_BUDGET_MS, clock=time.perf_counter):
+        self.history = history
+        self.enabled = enabled
+        self.budget_ms = budget_ms
+        self.clock = clock
+        self.started = self.last = clock()
+        self.sections = []
+
+    def mark(self, name):
+        now = self.clock()
+        self.sections.append((name, (now - self.last) * 1000))
+        self.last = now
+
+    @property
+    def total_ms(self):
+        return (self.last - self.started) * 1000
+
+    def finish(self, label="rerun"):
+        """Zamyka pomiar: dopisuje sumę do historii i loguje rozbicie (zawsze, gdy przekroczono budżet)."""
+        total = self.total_ms
+        self.history.append(total)
+        if self.enabled or total > self.budget_ms:
+            breakdown = ", ".join(f"{name}={ms:.0f}" for name, ms in self.sections)
+            level = logging.WARNING if total > self.budget_ms else logging.INFO
+            log.log(level, "%s %.0f ms (%s)", label, total, breakdown)
+        return total
+
+    def breakdown(self):
+        """Tabela sekcji: czas i udział w całym rerunie."""
+        df = pd.DataFrame(self.sections, columns=["Sekcja", "ms"])
+        total = self.total_ms or 1
+        df["%"] = (df["ms"] / total * 100).round(0)
+        df["ms"] = df["ms"].round(1)
+        return df
+
+    def recent(self):
+        """Mediana i maksimum sum z historii rerunów [ms]."""
+        values = list(self.history)
+        if not values:
+            return None, None
+        return statistics.median(values), max(values)
+
+
+def new_history():
+    return deque(maxlen=HISTORY_SIZE)
+
+
+def timed_fragment(name, history, enabled=lambda: False, budget_ms=DEFAULT_BUDGET_MS):
+    """Dekorator funkcji fragmentu: czas całego wywołania trafia do `history` i do logu."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = RerunProfiler(history(), enabled(), budget_ms)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.mark(name)
+                profiler.finish(f"fragment {name}")
+        return wrapper
+    return decorate
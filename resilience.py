@@ -0,0 +1,236 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# --- OCHRONA BACKENDU DIFY: LIMIT TEMPA, PONOWIENIA, BEZPIECZNIK ---
+# Każdy klucz API (= jeden workflow) ma własny token bucket, którego tempo spada
+# o połowę po 429 i rośnie liniowo przy sukcesach (AIMD), ponowienia z wykładniczym
+# opóźnieniem i losowym rozrzutem oraz bezpiecznik, który wstrzymuje wywołania
+# workflow, gdy odsetek błędów gwałtownie rośnie.
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_RATE = 5.0         # żądań/s na klucz API na starcie
+DEFAULT_MIN_RATE = 0.2
+DEFAULT_BURST = 10
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_BREAKER_WINDOW = 20       # ostatnie N wywołań branych pod uwagę
+DEFAULT_BREAKER_THRESHOLD = 0.5   # odsetek błędów otwierający bezpiecznik
+DEFAULT_BREAKER_MIN_CALLS = 10
+DEFAULT_BREAKER_COOLDOWN = 30.0   # s przerwy przed próbnym wywołaniem
+DEFAULT_MAX_PAUSE = 300.0         # maks. czas oczekiwania wywołania na zamknięcie bezpiecznika
+
+
+def parse_retry_after(value):
+    """Nagłówek Retry-After (sekundy albo data HTTP) -> sekundy; None, jeśli brak/niepoprawny."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(result, stats):
+    """Błąd przejściowy: status HTTP z RETRYABLE_STATUSES albo brak połączenia (żądanie nie wyszło).
+
+    Nie są ponawiane: błąd samego workflow (odpowiedź 200 ze statusem "failed") ani przekroczony
+    czas odczytu - żądanie dotarło do Dify, a workflow mógł się wykonać (ponowienie = podwójny koszt LLM).
+    """
+    if not isinstance(result, dict) or "error" not in result:
+        return False
+    status = stats.get("http_status")
+    if status is None:
+        return bool(stats.get("connect_error"))
+    return status in RETRYABLE_STATUSES
+
+
+def is_transport_failure(result, stats):
+    """Błąd bez odpowiedzi HTTP (także nieponawiany timeout odczytu) - liczy się do bezpiecznika."""
+    return isinstance(result, dict) and "error" in result and stats.get("http_status") is None
+
+
+class TokenBucket:
+    """Token bucket z adaptacyjnym tempem (AIMD) i pauzą wymuszoną przez Retry-After."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=DEFAULT_MIN_RATE, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.burst = max(1.0, float(burst))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Rezerwuje token i czeka, aż będzie dostępny. Zwraca czas oczekiwania w sekundach.
+
+        Rezerwacja (liczba tokenów może spaść poniżej zera) ustawia czekających w kolejce
+        bez aktywnego odpytywania.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= 1
+            delay = max(0.0, self.paused_until - now, -self.tokens / self.rate)
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+
+class CircuitBreaker:
+    """Bezpiecznik: zamknięty -> otwarty (po skoku błędów) -> półotwarty (jedno próbne wywołanie)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window=DEFAULT_BREAKER_WINDOW, threshold=DEFAULT_BREAKER_THRESHOLD,
+                 min_calls=DEFAULT_BREAKER_MIN_CALLS, cooldown=DEFAULT_BREAKER_COOLDOWN, clock=time.monotonic):
+        self.window = window
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.results = []
+        self.opened_at = 0.0
+        self._probe_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """(sekundy do ponownej próby, czy to wywołanie próbne). 0 sekund = można wywołać."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0, False
+            remaining = self.opened_at + self.cooldown - self.clock()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_running:
+                self._probe_running = True
+                return 0.0, True
+            return max(remaining, 1.0), False
+
+    def record(self, ok, probe=False):
+        with self._lock:
+            if probe:
+                self._probe_running = False
+                if ok:
+                    self.state = self.CLOSED
+                    self.results = []
+                else:
+                    self.state = self.OPEN
+                    self.opened_at = self.clock()
+                return
+            self.results = (self.results + [ok])[-self.window:]
+            failures = self.results.count(False)
+            if (self.state == self.CLOSED and len(self.results) >= self.min_calls
+                    and failures / len(self.results) >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class WorkflowGuard:
+    """Wywołania workflow przez limit tempa, ponowienia i bezpiecznik - osobno dla każdego klucza API."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY, breaker_threshold=DEFAULT_BREAKER_THRESHOLD,
+                 breaker_cooldown=DEFAULT_BREAKER_COOLDOWN, max_pause=DEFAULT_MAX_PAUSE, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.max_pause = max_pause
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _for_key(self, api_key):
+        with self._lock:
+            if api_key not in self._buckets:
+                self._buckets[api_key] = TokenBucket(self.rate, self.burst, clock=self.clock, sleep=self.sleep)
+                self._breakers[api_key] = CircuitBreaker(
+                    threshold=self.breaker_threshold, cooldown=self.breaker_cooldown, clock=self.clock
+                )
+            return self._buckets[api_key], self._breakers[api_key]
+
+    def backoff(self, attempt, retry_after=None):
+        """Pełny jitter: losowo z [0, min(max_delay, base * 2^attempt)], nie krócej niż Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def call(self, api_key, attempt):
+        """`attempt(stats)` wykonuje jedno wywołanie i zwraca wynik Dify (dict, błąd jako {"error"}).
+
+        Zwraca (wynik, liczba_ponowień, stats ostatniej próby).
+        """
+        bucket, breaker = self._for_key(api_key)
+        retries = 0
+        paused = 0.0
+        while True:
+            wait, probe = breaker.before_call()
+            if wait:
+                if paused + wait > self.max_pause:
+                    return {"error": "Workflow wstrzymany: zbyt wiele błędów (bezpiecznik otwarty)"}, retries, {}
+                self.sleep(wait)
+                paused += wait
+                continue
+            bucket.acquire()
+            stats = {}
+            result = attempt(stats)
+            retryable = is_retryable(result, stats)
+            failed = retryable or is_transport_failure(result, stats)
+            breaker.record(not failed, probe)
+            if not retryable:
+                if not failed:
+                    bucket.on_success()
+                return result, retries, stats
+            retry_after = parse_retry_after(stats.get("retry_after"))
+            if stats.get("http_status") in (429, 503):
+                bucket.on_throttle(retry_after)
+            if retries + 1 >= self.max_attempts:
+                return result, retries, stats
+            self.sleep(self.backoff(retries, retry_after))
+            retries += 1
+
+    def snapshot(self):
+        """Bieżące tempo i stan bezpiecznika per klucz (klucze skrócone)."""
+        with self._lock:
+            return {
+                f"…{key[-6:]}": {"rate": round(self._buckets[key].rate, 2), "breaker": self._breakers[key].state}
+                for key in self._buckets
+            }
@@ -0,0 +1,450 @@
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import streamlit as st
+from dify_client import DifyClient, DEFAULT_POOL_SIZE
+from dify_cache import (
+    normalize_value, DifyResultCache, SQLiteCacheStore, SupabaseCacheStore, CACHE_MODES, DEFAULT_CACHE_MODES,
+    DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
+)
+from db import (
+    supabase, update_db_record, fetch_article_sections, save_article_section, delete_article_sections
+)
+from resilience import (
+    WorkflowGuard, DEFAULT_RATE, DEFAULT_BURST, DEFAULT_MAX_ATTEMPTS, DEFAULT_BASE_DELAY, DEFAULT_BREAKER_THRESHOLD,
+    DEFAULT_BREAKER_COOLDOWN
+)
+from telemetry import (
+    MetricsRecorder, SQLiteMetricsStore, SupabaseMetricsStore, call_record, current_row, use_row
+)
+from knowledge_index import KnowledgeIndex, select_keywords
+from writing_context import (
+    CONTEXT_MODES, DEFAULT_CONTEXT, OUTLINE, build_done_context, current_context, dedupe_sections, render_article
+)
+
+log = logging.getLogger("stages")
+
+# --- STRAŻNIK ZAPISU (DZIERŻAWA WORKERA) ---
+# Worker, który stracił dzierżawę wiersza (heartbeat nie przeszedł, zadanie zajął ktoś inny),
+# nie może już zapisać wyników - przetwarzanie przerywa wyjątek LeaseLost przy pierwszym zapisie.
+
+_write_guard = contextvars.ContextVar("write_guard", default=None)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+@contextmanager
+def use_write_guard(check):
+    """`check()` jest wywoływane przed każdym zapisem wiersza; False = zapis pominięty (LeaseLost)."""
+    token = _write_guard.set(check)
+    try:
+        yield
+    finally:
+        _write_guard.reset(token)
+
+
+def write_row(row_id, updates, offload=True):
+    check = _write_guard.get()
+    if check is not None and not check():
+        raise LeaseLost(f"#{row_id}: dzierżawa utracona, wynik nie zostanie zapisany")
+    update_db_record(row_id, updates, offload=offload)
+
+# --- FUNKCJE DIFY ---
+@st.cache_resource(show_spinner=False)
+def init_dify_client():
+    """Jeden klient (pula połączeń keep-alive) współdzielony przez wszystkie etapy i wątki."""
+    cfg = st.secrets["dify"]
+    return DifyClient(
+        cfg["BASE_URL"],
+        pool_size=int(cfg.get("POOL_SIZE", DEFAULT_POOL_SIZE)),
+        gzip_requests=bool(cfg.get("GZIP_REQUESTS", False)),
+        response_mode=cfg.get("RESPONSE_MODE", "blocking")
+    )
+
+dify_client = init_dify_client()
+
+@st.cache_resource(show_spinner=False)
+def init_dify_cache():
+    """Cache wyników workflow - konfiguracja w secrets [cache] (PATH, TTL_HOURS, MAX_MB, SHARED)."""
+    cfg = st.secrets.get("cache", {})
+    ttl_seconds = float(cfg.get("TTL_HOURS", DEFAULT_TTL_SECONDS / 3600)) * 3600
+    local = SQLiteCacheStore(
+        cfg.get("PATH", ".cache/dify_results.sqlite"),
+        ttl_seconds=ttl_seconds,
+        max_bytes=int(float(cfg.get("MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024)
+    )
+    shared = SupabaseCacheStore(supabase, ttl_seconds) if cfg.get("SHARED", False) else None
+    return DifyResultCache(local, shared)
+
+dify_cache = init_dify_cache()
+
+def configured_cache_modes():
+    """Tryby cache per etap z secrets [cache] (np. RESEARCH = "use") albo domyślne."""
+    cfg = st.secrets.get("cache", {})
+    modes = {}
+    for stage, default in DEFAULT_CACHE_MODES.items():
+        mode = str(cfg.get(stage.upper(), default)).lower()
+        modes[stage] = mode if mode in CACHE_MODES else default
+    return modes
+
+@st.cache_resource(show_spinner=False)
+def init_metrics():
+    """Telemetria wywołań - konfiguracja w secrets [telemetry] (ENABLED, PATH, RETENTION_DAYS, SHARED)."""
+    cfg = st.secrets.get("telemetry", {})
+    if not cfg.get("ENABLED", True):
+        return MetricsRecorder()
+    local = SQLiteMetricsStore(cfg.get("PATH", ".cache/metrics.sqlite"), int(cfg.get("RETENTION_DAYS", 30)))
+    shared = SupabaseMetricsStore(supabase) if cfg.get("SHARED", False) else None
+    return MetricsRecorder(local, shared)
+
+metrics = init_metrics()
+
+@st.cache_resource(show_spinner=False)
+def init_workflow_guard():
+    """Limit tempa, ponowienia i bezpiecznik per klucz API - secrets [rate_limit]."""
+    cfg = st.secrets.get("rate_limit", {})
+    return WorkflowGuard(
+        rate=float(cfg.get("RATE", DEFAULT_RATE)),
+        burst=float(cfg.get("BURST", DEFAULT_BURST)),
+        max_attempts=int(cfg.get("MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        base_delay=float(cfg.get("BASE_DELAY", DEFAULT_BASE_DELAY)),
+        breaker_threshold=float(cfg.get("BREAKER_THRESHOLD", DEFAULT_BREAKER_THRESHOLD)),
+        breaker_cooldown=float(cfg.get("BREAKER_COOLDOWN", DEFAULT_BREAKER_COOLDOWN))
+    )
+
+workflow_guard = init_workflow_guard()
+
+def run_dify_workflow(api_key, inputs, user_id="streamlit_user", stage=None):
+    def call():
+        started = time.time()
+        result, retries, stats = workflow_guard.call(
+            api_key, lambda stats: dify_client.run_workflow(api_key, inputs, user_id, stats=stats)
+        )
+        metrics.record(call_record(stage, current_row(), started, time.time() - started, result, stats, retries))
+        return result
+    return dify_cache.run(stage, api_key, inputs, call)
+
+# --- LOGIKA BIZNESOWA (ETAPY) ---
+
+def extract_headers_from_text(text):
+    if not isinstance(text, str): return []
+    html_headers = re.findall(r'<h2.*?>(.*?)</h2>', text, re.IGNORECASE)
+    if html_headers:
+        return [re.sub(r'<.*?>', '', h).strip() for h in html_headers]
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+def stage_research(row):
+    inputs = {"keyword": row['Słowo kluczowe'], "language": row['Język'], "aio": row['AIO'] if row['AIO'] else ""}
+    resp = run_dify_workflow(st.secrets['dify']['API_KEY_RESEARCH'], inputs, stage="research")
+    if "data" in resp and "outputs" in resp["data"]:
+        out = resp["data"]["outputs"]
+        return {
+            "status_research": "✅ Gotowe",
+            "serp_phrases": out.get("frazy z serp", ""),
+            "senuto_phrases": out.get("frazy_senuto", ""),
+            "info_graph": out.get("grafinformacji", ""),
+            "competitors_headers": out.get("naglowki", ""),
+            "knowledge_graph": out.get("knowledge_graph", "")
+        }
+    else:
+        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
+
+def stage_headers(row):
+    frazy_full = f"{row['Frazy z wyników']}\n{row['Frazy Senuto']}"
+    inputs = {"keyword": row['Słowo kluczowe'], "language": row['Język'], "frazy": frazy_full, "graf": row['Graf informacji'], "headings": row['Nagłówki konkurencji']}
+    resp = run_dify_workflow(st.secrets['dify']['API_KEY_HEADERS'], inputs, stage="headers")
+    if "data" in resp and "outputs" in resp["data"]:
+        out = resp["data"]["outputs"]
+        h2 = out.get("naglowki_h2", "")
+        questions = out.get("naglowki_pytania", "")
+        final_headers = row['Nagłówki (Finalne)']
+        if not final_headers: final_headers = questions if questions else h2
+        return {
+            "status_headers": "✅ Gotowe",
+            "headers_expanded": out.get("naglowki_rozbudowane", ""),
+            "headers_h2": h2,
+            "headers_questions": questions,
+            "headers_final": final_headers
+        }
+    else:
+        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
+
+def stage_rag(row):
+    inputs = {"keyword": row['Słowo kluczowe'], "language": row['Język'], "headings": row['Nagłówki konkurencji']}
+    resp = run_dify_workflow(st.secrets['dify']['API_KEY_RAG'], inputs, stage="rag")
+    if "data" in resp and "outputs" in resp["data"]:
+        out = resp["data"]["outputs"]
+        return {"status_rag": "✅ Gotowe", "rag_content": out.get("dokladne", ""), "rag_general": out.get("ogolne", "")}
+    else:
+        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
+
+def stage_brief(row):
+    h2_source = row['Nagłówki H2'] if row['Nagłówki H2'] else row['Nagłówki (Finalne)']
+    if not h2_source: raise Exception("Brak nagłówków H2 do stworzenia briefu.")
+    frazy_full = f"{row['Frazy z wyników']}\n{row['Frazy Senuto']}"
+    inputs = {"keyword": row['Słowo kluczowe'], "keywords": frazy_full, "headings": h2_source, "knowledge_graph": row['Knowledge graph'], "information_graph": row['Graf informacji']}
+    resp = run_dify_workflow(st.secrets['dify']['API_KEY_BRIEF'], inputs, stage="brief")
+    if "data" in resp and "outputs" in resp["data"]:
+        out = resp["data"]["outputs"]
+        return {"status_brief": "✅ Gotowe", "brief_json": out.get("brief", ""), "brief_html": out.get("html", "")}
+    else:
+        raise Exception(f"Dify Error: {resp.get('error', 'Unknown error')}")
+
+WRITING_ERROR_MARKER = "[BŁĄD GENEROWANIA:"
+# Status ustawiany przy dodaniu do kolejki artykułu, który był już gotowy -
+# taki przebieg zaczyna od nowa zamiast wznawiać zapisane sekcje.
+WRITING_RESTART_STATUS = "⏳ W kolejce (od nowa)"
+
+def completed_sections(article, headers_list):
+    """Zwraca listę (nagłówek, treść) kolejnych poprawnie wygenerowanych sekcji od początku listy nagłówków."""
+    if not isinstance(article, str) or not article:
+        return []
+    pos = 0
+    sections = []
+    for i, h2 in enumerate(headers_list):
+        marker = f"<h2>{h2}</h2>\n"
+        if not article.startswith(marker, pos):
+            break
+        end = len(article)
+        if i + 1 < len(headers_list):
+            next_pos = article.find(f"<h2>{headers_list[i + 1]}</h2>\n", pos + len(marker))
+            if next_pos != -1:
+                end = next_pos
+        chunk = article[pos + len(marker):end]
+        if WRITING_ERROR_MARKER in chunk:
+            break
+        sections.append((h2, chunk[:-2] if chunk.endswith("\n\n") else chunk))
+        pos = end
+        if end == len(article):
+            break
+    return sections
+
+def configured_writing_context():
+    """Ustawienia kontekstu pisania z secrets [writing] (CONTEXT_MODE, WINDOW, BUDGET_BYTES,
+    RETRIEVAL, KNOWLEDGE_BYTES, TOP_K, KEYWORDS_LIMIT, PARALLEL, PARALLEL_WORKERS, STITCH,
+    REUSE_SECTIONS) albo domyślne."""
+    cfg = st.secrets.get("writing", {})
+    mode = str(cfg.get("CONTEXT_MODE", DEFAULT_CONTEXT["mode"])).lower()
+    return {
+        "mode": mode if mode in CONTEXT_MODES else DEFAULT_CONTEXT["mode"],
+        "window": int(cfg.get("WINDOW", DEFAULT_CONTEXT["window"])),
+        "budget_bytes": int(cfg.get("BUDGET_BYTES", DEFAULT_CONTEXT["budget_bytes"])),
+        "retrieval": bool(cfg.get("RETRIEVAL", DEFAULT_CONTEXT["retrieval"])),
+        "knowledge_bytes": int(cfg.get("KNOWLEDGE_BYTES", DEFAULT_CONTEXT["knowledge_bytes"])),
+        "top_k": int(cfg.get("TOP_K", DEFAULT_CONTEXT["top_k"])),
+        "keywords_limit": int(cfg.get("KEYWORDS_LIMIT", DEFAULT_CONTEXT["keywords_limit"])),
+        "parallel": bool(cfg.get("PARALLEL", DEFAULT_CONTEXT["parallel"])),
+        "parallel_workers": int(cfg.get("PARALLEL_WORKERS", DEFAULT_CONTEXT["parallel_workers"])),
+        "stitch": bool(cfg.get("STITCH", DEFAULT_CONTEXT["stitch"])),
+        "reuse_sections": bool(cfg.get("REUSE_SECTIONS", DEFAULT_CONTEXT["reuse_sections"])),
+    }
+
+WRITING_SECTION_ATTEMPTS = 2  # w trybie równoległym każda sekcja jest ponawiana osobno
+
+# Kolumny wiersza, od których zależy treść sekcji (poza samym nagłówkiem i konspektem).
+# Zmiana którejkolwiek unieważnia zapisane sekcje; zmiana nagłówka - tylko jego sekcję.
+SECTION_INPUT_COLUMNS = ['Słowo kluczowe', 'Język', 'RAG', 'RAG General', 'Frazy z wyników', 'Frazy Senuto', 'Dodatkowe instrukcje']
+
+def section_inputs_hash(row):
+    source = {col: normalize_value(col, row.get(col)) for col in SECTION_INPUT_COLUMNS}
+    return hashlib.sha256(json.dumps(source, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class SectionStore:
+    """Sekcje artykułu zapisane per nagłówek (tabela seo_article_sections).
+
+    Magazyn jest tylko optymalizacją - jego błędy (np. brak tabeli) nie przerywają pisania.
+    """
+
+    def __init__(self, task_id, input_hash, reuse=True):
+        self.task_id = task_id
+        self.input_hash = input_hash
+        self.available = True
+        self.stored = {}
+        if reuse:
+            try:
+                self.stored = fetch_article_sections(task_id)
+            except Exception as e:
+                self._disable(e)
+
+    def _disable(self, error):
+        log.warning("seo_article_sections niedostępne (%s) - pisanie bez ponownego użycia sekcji", error)
+        self.available = False
+
+    def reusable(self, headers_list):
+        """{indeks nagłówka: treść} dla nagłówków bez zmian od ostatniego przebiegu."""
+        return {
+            i: self.stored[h2]["content"] for i, h2 in enumerate(headers_list)
+            if h2 in self.stored and self.stored[h2]["input_hash"] == self.input_hash
+        }
+
+    def save(self, heading, content):
+        if not self.available:
+            return
+        try:
+            save_article_section(self.task_id, heading, self.input_hash, content)
+        except Exception as e:
+            self._disable(e)
+
+    def prune(self, headers_list):
+        stale = set(self.stored) - set(headers_list)
+        if stale and self.available:
+            try:
+                delete_article_sections(self.task_id, stale)
+            except Exception as e:
+                self._disable(e)
+
+def write_section(row, h2, done, knowledge_index, context, label):
+    """Jedno wywołanie workflow pisania dla nagłówka. Zwraca treść sekcji albo rzuca wyjątek."""
+    full_knowledge = f"{row['RAG']}\n{row['RAG General']}"
+    full_keywords = f"{row['Frazy z wyników']}, {row['Frazy Senuto']}"
+    knowledge, keywords = full_knowledge, full_keywords
+    if knowledge_index is not None:
+        query = f"{h2} {row['Słowo kluczowe']}"
+        knowledge = knowledge_index.select(query, context["knowledge_bytes"], context["top_k"])
+        keywords = select_keywords(full_keywords, query, context["keywords_limit"])
+    inputs = {
+        "naglowek": h2, "language": row['Język'], "knowledge": knowledge, "keywords": keywords,
+        "headings": row['Nagłówki rozbudowane'], "done": done, "keyword": row['Słowo kluczowe'], "instruction": row['Dodatkowe instrukcje']
+    }
+    log.info("writing %s sekcja %s: done=%d B, knowledge=%d B, payload=%d B (%s)", row['ID'], label,
+             len(done.encode("utf-8")), len(knowledge.encode("utf-8")),
+             len(json.dumps(inputs, ensure_ascii=False).encode("utf-8")), context["mode"])
+    resp = run_dify_workflow(st.secrets['dify']['API_KEY_WRITE'], inputs, stage="writing")
+    if "data" in resp and "outputs" in resp["data"]:
+        return resp["data"]["outputs"].get("result", "")
+    raise Exception(f"Sekcja {label} '{h2}': {resp.get('error')} (ponowne uruchomienie wznowi od tej sekcji)")
+
+def stage_writing(row):
+    headers_text = row['Nagłówki (Finalne)']
+    headers_list = extract_headers_from_text(headers_text)
+    if not headers_list: raise Exception("Pusta kolumna 'Nagłówki (Finalne)'.")
+    context = current_context()
+    # Indeks budujemy raz na wiersz; każda sekcja dostaje tylko pasujące fragmenty RAG i frazy
+    knowledge_index = KnowledgeIndex.from_text(f"{row['RAG']}\n{row['RAG General']}") if context["retrieval"] else None
+    
+    # Wznawianie: jeśli poprzedni przebieg nie skończył się sukcesem, zachowujemy
+    # już zapisane sekcje i kontynuujemy od pierwszego brakującego nagłówka.
+    sections = []
+    if row.get('Status Generacja') not in ("✅ Gotowe", WRITING_RESTART_STATUS):
+        sections = completed_sections(row.get('Generowanie contentu'), headers_list)
+    # Regeneracja przyrostowa: sekcje nagłówków, które się nie zmieniły (ta sama treść
+    # nagłówka i te same dane wiersza), są brane z magazynu zamiast z Dify
+    store = SectionStore(row['ID'], section_inputs_hash(row), reuse=context["reuse_sections"])
+    reusable = store.reusable(headers_list)
+    if reusable:
+        log.info("writing %s: ponowne użycie %d z %d sekcji", row['ID'], len(reusable), len(headers_list))
+    
+    if context["parallel"]:
+        sections = write_sections_parallel(row, headers_list, sections, knowledge_index, context, store, reusable)
+    else:
+        total = len(headers_list)
+        for i in range(len(sections), total):
+            h2 = headers_list[i]
+            if i in reusable:
+                sections.append((h2, reusable[i]))
+                continue
+            # Wejście "done" ma ograniczony rozmiar (okno/konspekt/streszczenie), a nie cały dotychczasowy artykuł
+            done = build_done_context(sections, context["mode"], context["window"], context["budget_bytes"])
+            sections.append((h2, write_section(row, h2, done, knowledge_index, context, f"{i+1}/{total}")))
+            store.save(h2, sections[-1][1])
+            # Każda ukończona sekcja od razu trafia do bazy - awaria nie kasuje postępu
+            write_row(row['ID'], {"final_article": render_article(sections), "status_writing": f"🔄 W trakcie... ({i+1}/{total})"}, offload=False)
+    store.prune(headers_list)
+    return {"status_writing": "✅ Gotowe", "final_article": render_article(sections)}
+
+def write_sections_parallel(row, headers_list, sections, knowledge_index, context, store, reusable):
+    """Tryb równoległy: brakujące sekcje powstają naraz z konspektu, wynik składany w kolejności nagłówków.
+
+    Sekcje nie widzą swojej treści nawzajem - "done" zawiera tylko nagłówki poprzedzające
+    dany nagłówek. Zapisywany jest zawsze ciągły prefiks gotowych sekcji, żeby wznawianie
+    (completed_sections) działało jak w trybie sekwencyjnym.
+    """
+    total = len(headers_list)
+    start = len(sections)
+    drafts = {i: body for i, body in reusable.items() if i >= start}
+    errors = []
+
+    def advance():
+        grown = False
+        while len(sections) in drafts:
+            idx = len(sections)
+            sections.append((headers_list[idx], drafts.pop(idx)))
+            grown = True
+        if grown:
+            write_row(row['ID'], {"final_article": render_article(sections), "status_writing": f"🔄 W trakcie... ({len(sections)}/{total})"}, offload=False)
+
+    def draft(i):
+        h2 = headers_list[i]
+        done = build_done_context([(h, "") for h in headers_list[:i]], OUTLINE)
+        for attempt in range(1, WRITING_SECTION_ATTEMPTS + 1):
+            try:
+                return write_section(row, h2, done, knowledge_index, context, f"{i+1}/{total}")
+            except Exception:
+                if attempt == WRITING_SECTION_ATTEMPTS:
+                    raise
+
+    workers = max(1, int(context["parallel_workers"]))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"writing-{row['ID']}") as pool:
+        # Wątki puli nie dziedziczą ContextVar (tryby cache itp.) - każde zadanie dostaje kopię kontekstu
+        pending = [i for i in range(start, total) if i not in drafts]
+        futures = {pool.submit(contextvars.copy_context().run, draft, i): i for i in pending}
+        advance()
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                drafts[i] = future.result()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            store.save(headers_list[i], drafts[i])
+            advance()
+    if errors:
+        raise Exception(f"{len(errors)} z {len(pending)} sekcji nie powstało. {errors[0]}")
+
+    if context["stitch"]:
+        sections, removed = dedupe_sections(sections)
+        if removed:
+            log.info("writing %s: usunięto %d powtórzonych akapitów", row['ID'], removed)
+    return sections
+
+# --- RÓWNOLEGŁOŚĆ (maks. liczba wierszy przetwarzanych naraz na etap) ---
+# Domyślne wartości można nadpisać w secrets.toml w sekcji [concurrency]
+# (np. RESEARCH = 8), w panelu bocznym (sesja) albo flagą workera.
+DEFAULT_STAGE_CONCURRENCY = {"research": 4, "headers": 4, "rag": 4, "brief": 4, "writing": 2}
+
+def configured_concurrency(stage):
+    """Limit wierszy w locie z secrets [concurrency] albo wartość domyślna."""
+    configured = st.secrets.get("concurrency", {})
+    return int(configured.get(stage.upper(), DEFAULT_STAGE_CONCURRENCY[stage]))
+
+# --- REJESTR ETAPÓW: klucz -> (funkcja, kolumna statusu w bazie) ---
+STAGE_DEFS = {
+    "research": (stage_research, "status_research"),
+    "headers": (stage_headers, "status_headers"),
+    "rag": (stage_rag, "status_rag"),
+    "brief": (stage_brief, "status_brief"),
+    "writing": (stage_writing, "status_writing"),
+}
+STAGES = list(STAGE_DEFS)
+
+def process_row(row, process_func, status_col_db):
+    """Przetwarza jeden wiersz i zapisuje wynik/błąd w bazie. Zwraca zapisane aktualizacje."""
+    row_id = row['ID']
+    write_row(row_id, {status_col_db: "🔄 W trakcie..."})
+    try:
+        with use_row(row_id):
+            updates = process_func(row)
+    except LeaseLost:
+        raise
+    except Exception as e:
+        write_row(row_id, {status_col_db: f"❌ Błąd: {str(e)[:100]}"})
+        raise
+    write_row(row_id, updates)
+    return updates
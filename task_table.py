@@ -0,0 +1,151 @@
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# --- TABELA ZADAŃ W SESJI (STRONA + ODŚWIEŻANIE PRZYROSTOWE) ---
+# Filtry, wyszukiwanie, sortowanie i stronicowanie (keyset) wykonuje baza - w sesji jest
+# tylko bieżąca strona. Przy kolejnych rerunach pobierane są same klucze strony (id +
+# kolumna sortowania) oraz wiersze z updated_at >= ostatnio widziany (z kilkusekundowym
+# zapasem na transakcje zatwierdzone z opóźnieniem); pełne wiersze tylko dla tych, które
+# na stronę weszły. Pełne pobranie strony co `resync_seconds`, po zmianie filtrów/strony
+# albo gdy widok nie ma kolumny updated_at.
+
+DELTA_OVERLAP_SECONDS = 5
+FULL_RESYNC_SECONDS = 600
+
+
+def _parse_ts(value):
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+class TaskTable:
+    """Strona listy zadań w pamięci sesji (kolumny jak w bazie, indeks = id, kolejność jak w zapytaniu).
+
+    `fetch_page(query, after, limit, keys_only)` zwraca rekordy strony, `cursor_of(query, record)`
+    kursor strony następnej, `fetch_rows(ids, since)` wiersze o podanych ID zmienione od `since`
+    (None = wszystkie), a `count_rows(query)` liczbę wierszy spełniających filtry.
+    """
+
+    def __init__(self, columns, fetch_page, cursor_of, fetch_rows, count_rows, page_size,
+                 overlap_seconds=DELTA_OVERLAP_SECONDS, resync_seconds=FULL_RESYNC_SECONDS, clock=time.monotonic):
+        self.columns = list(columns)
+        self.fetch_page = fetch_page
+        self.cursor_of = cursor_of
+        self.fetch_rows = fetch_rows
+        self.count_rows = count_rows
+        self.page_size = page_size
+        self.overlap_seconds = overlap_seconds
+        self.resync_seconds = resync_seconds
+        self.clock = clock
+        self.query = {}
+        self.cursors = [None]  # kursor początku każdej odwiedzonej strony
+        self.next_cursor = None
+        self.total = None
+        self.frame = self._frame([])
+        self.last_seen = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.version = 0
+
+    # --- nawigacja ---
+    @property
+    def page(self):
+        return len(self.cursors) - 1
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None and len(self.frame) >= self.page_size
+
+    def set_query(self, query, page_size):
+        """Nowe filtry/sortowanie albo rozmiar strony: powrót na pierwszą stronę."""
+        if query == self.query and page_size == self.page_size:
+            return
+        self.query, self.page_size = dict(query), page_size
+        self.cursors = [None]
+        self.total = None
+        self.last_seen = None
+
+    def next_page(self):
+        if self.has_next:
+            self.cursors.append(self.next_cursor)
+            self.last_seen = None
+
+    def prev_page(self):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+            self.last_seen = None
+
+    # --- dane ---
+    def _frame(self, records):
+        df = pd.DataFrame(records).reindex(columns=self.columns)
+        df.index = pd.Index(df["id"].astype("int64"), name=None)
+        return df
+
+    def _see(self, records):
+        seen = [_parse_ts(r["updated_at"]) for r in records if r.get("updated_at")]
+        if seen:
+            self.last_seen = max([self.last_seen, *seen] if self.last_seen else seen)
+
+    def _differs(self, delta):
+        """Maska wierszy `delta`, które są nowe albo różnią się od trzymanych w tabeli."""
+        current = self.frame.reindex(delta.index)
+        return (delta.astype(object).fillna("") != current.astype(object).fillna("")).any(axis=1)
+
+    def _reload(self, now):
+        records = self.fetch_page(self.query, self.cursors[-1], self.page_size, False)
+        fresh = self._frame(records)
+        changed = int(self._differs(fresh).sum()) + len(self.frame.index.difference(fresh.index))
+        if changed or list(fresh.index) != list(self.frame.index):
+            self.version += 1
+        self.frame = fresh
+        self.next_cursor = self.cursor_of(self.query, records[-1]) if records else None
+        self.last_seen = None
+        self._see(records)
+        self.loaded_at = now
+        if self.total is None:
+            self.total = self.count_rows(self.query)
+        return changed
+
+    def _merge(self, records):
+        self._see(records)
+        if not records:
+            return 0
+        delta = self._frame(records)
+        delta = delta[self._differs(delta)]
+        if delta.empty:
+            return 0
+        kept = self.frame.drop(delta.index, errors="ignore")
+        self.frame = pd.concat([kept, delta]) if not kept.empty else delta
+        return len(delta)
+
+    def refresh(self, max_age=0):
+        """Dociąga zmiany bieżącej strony; zwraca liczbę wierszy, które faktycznie się zmieniły.
+
+        `max_age`: nie odpytuje bazy, jeśli poprzednie odświeżenie było młodsze (sekundy).
+        """
+        now = self.clock()
+        if self.refreshed_at is not None and now - self.refreshed_at < max_age:
+            return 0
+        self.refreshed_at = now
+        if self.last_seen is None or now - self.loaded_at >= self.resync_seconds:
+            if self.loaded_at is not None and now - self.loaded_at >= self.resync_seconds:
+                self.total = None
+            return self._reload(now)
+        keys = self.fetch_page(self.query, self.cursors[-1], self.page_size, True)
+        ids = [record["id"] for record in keys]
+        since = (self.last_seen - timedelta(seconds=self.overlap_seconds)).isoformat()
+        changed = self._merge(self.fetch_rows([i for i in ids if i in self.frame.index], since))
+        entered = [i for i in ids if i not in self.frame.index]
+        if entered:
+            changed += self._merge(self.fetch_rows(entered, None))
+        order = [i for i in ids if i in self.frame.index]
+        dropped = len(self.frame.index.difference(order))
+        if entered or dropped:
+            self.total = self.count_rows(self.query)
+        changed += dropped
+        if changed or list(self.frame.index) != order:
+            self.frame = self.frame.loc[order]
+            self.next_cursor = self.cursor_of(self.query, keys[-1]) if keys else None
+            self.version += 1
+        return changed
@@ -0,0 +1,209 @@
+import atexit
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# --- TELEMETRIA WYWOŁAŃ WORKFLOW ---
+# Każde faktyczne wywołanie Dify (trafienia w cache się nie liczą) zapisuje jeden rekord:
+# etap, wiersz, czas po naszej stronie, czas/tokeny/kroki raportowane przez Dify,
+# rozmiary żądania i odpowiedzi oraz liczbę ponowień. Rekordy są buforowane
+# i zapisywane paczkami, żeby pomiar nie spowalniał samych wywołań.
+
+METRIC_FIELDS = [
+    "ts", "stage", "row_id", "latency_ms", "dify_elapsed_ms", "tokens", "steps",
+    "request_bytes", "response_bytes", "http_status", "retries", "ok",
+]
+DEFAULT_FLUSH_SIZE = 50
+DEFAULT_FLUSH_SECONDS = 5.0
+
+_row = contextvars.ContextVar("telemetry_row", default=None)
+
+
+@contextmanager
+def use_row(row_id):
+    """Oznacza wywołania workflow w bieżącym wątku/zadaniu identyfikatorem wiersza."""
+    token = _row.set(row_id)
+    try:
+        yield
+    finally:
+        _row.reset(token)
+
+
+def current_row():
+    return _row.get()
+
+
+def call_record(stage, row_id, started, latency, result, stats=None, retries=0):
+    """Rekord metryk jednego wywołania na podstawie odpowiedzi Dify (blocking/streaming)."""
+    stats = stats or {}
+    data = result.get("data") if isinstance(result, dict) else None
+    data = data if isinstance(data, dict) else {}
+    elapsed = data.get("elapsed_time")
+    return {
+        "ts": started,
+        "stage": stage or "-",
+        "row_id": row_id,
+        "latency_ms": round(latency * 1000, 1),
+        "dify_elapsed_ms": round(float(elapsed) * 1000, 1) if elapsed is not None else None,
+        "tokens": data.get("total_tokens"),
+        "steps": data.get("total_steps"),
+        "request_bytes": stats.get("request_bytes"),
+        "response_bytes": stats.get("response_bytes"),
+        "http_status": stats.get("http_status"),
+        "retries": retries,
+        "ok": "error" not in result and data.get("status") in (None, "succeeded"),
+    }
+
+
+class SQLiteMetricsStore:
+    """Lokalny magazyn metryk (SQLite), z retencją w dniach."""
+
+    def __init__(self, path, retention_days=30):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.retention_seconds = retention_days * 24 * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workflow_calls (ts REAL, stage TEXT, row_id INTEGER, latency_ms REAL, "
+            "dify_elapsed_ms REAL, tokens INTEGER, steps INTEGER, request_bytes INTEGER, response_bytes INTEGER, "
+            "http_status INTEGER, retries INTEGER, ok INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS workflow_calls_ts_idx ON workflow_calls (ts)")
+        self._conn.commit()
+
+    def insert_many(self, records):
+        placeholders = ", ".join("?" for _ in METRIC_FIELDS)
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO workflow_calls ({', '.join(METRIC_FIELDS)}) VALUES ({placeholders})",
+                [tuple(r.get(f) for f in METRIC_FIELDS) for r in records]
+            )
+            self._conn.execute("DELETE FROM workflow_calls WHERE ts < ?", (time.time() - self.retention_seconds,))
+            self._conn.commit()
+
+    def query(self, since):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(METRIC_FIELDS)} FROM workflow_calls WHERE ts >= ? ORDER BY ts", (since,)
+            ).fetchall()
+        return [dict(zip(METRIC_FIELDS, row)) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM workflow_calls")
+            self._conn.commit()
+
+
+class SupabaseMetricsStore:
+    """Magazyn współdzielony (tabela seo_workflow_metrics) - metryki wszystkich sesji i workerów."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def insert_many(self, records):
+        rows = [dict(r, ts=datetime.fromtimestamp(r["ts"], timezone.utc).isoformat()) for r in records]
+        self.client.table("seo_workflow_metrics").insert(rows).execute()
+
+    def query(self, since):
+        since_iso = datetime.fromtimestamp(since, timezone.utc).isoformat()
+        records, offset = [], 0
+        while True:
+            page = (
+                self.client.table("seo_workflow_metrics").select(",".join(METRIC_FIELDS))
+                .gte("ts", since_iso).order("ts").range(offset, offset + 999).execute().data
+            )
+            for record in page:
+                record["ts"] = datetime.fromisoformat(record["ts"].replace("Z", "+00:00")).timestamp()
+            records.extend(page)
+            if len(page) < 1000:
+                return records
+            offset += 1000
+
+
+class MetricsRecorder:
+    """Bufor rekordów zapisywany paczkami (co `flush_size` rekordów albo `flush_seconds`)."""
+
+    def __init__(self, store=None, shared=None, flush_size=DEFAULT_FLUSH_SIZE, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.store = store
+        self.shared = shared
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def enabled(self):
+        return self.store is not None or self.shared is not None
+
+    def record(self, record):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._buffer.append(record)
+            due = len(self._buffer) >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not records:
+            return
+        for store in (self.store, self.shared):
+            if store is None:
+                continue
+            try:
+                store.insert_many(records)
+            except Exception:
+                pass  # telemetria nie może przerwać przetwarzania
+
+    def query(self, since):
+        """Rekordy od `since` (timestamp): z magazynu współdzielonego, jeśli jest, inaczej lokalnego."""
+        self.flush()
+        store = self.shared or self.store
+        return store.query(since) if store is not None else []
+
+
+def summarize(records, window_seconds):
+    """Podsumowanie per etap: liczba wywołań, błędy, p50/p95 opóźnienia, tokeny, przepustowość."""
+    df = pd.DataFrame(records, columns=METRIC_FIELDS)
+    if df.empty:
+        return df
+    grouped = df.groupby("stage")
+    summary = pd.DataFrame({
+        "wywołania": grouped.size(),
+        "błędy": grouped["ok"].apply(lambda s: int((~s.astype(bool)).sum())),
+        "p50 [s]": grouped["latency_ms"].quantile(0.5) / 1000,
+        "p95 [s]": grouped["latency_ms"].quantile(0.95) / 1000,
+        "Dify p50 [s]": grouped["dify_elapsed_ms"].quantile(0.5) / 1000,
+        "tokeny": grouped["tokens"].sum(min_count=1),
+        "tokeny/wywołanie": grouped["tokens"].mean(),
+        "ponowienia": grouped["retries"].sum(),
+        "wywołania/min": grouped.size() / (window_seconds / 60),
+        "KB wysłane": grouped["request_bytes"].sum() / 1024,
+    })
+    return summary.round(2)
+
+
+def timeline(records, freq="1h"):
+    """Przebieg w czasie: (p95 opóźnienia [s], tokeny) w przedziałach `freq`, kolumny = etapy."""
+    df = pd.DataFrame(records, columns=METRIC_FIELDS)
+    if df.empty:
+        return df, df
+    df["czas"] = pd.to_datetime(df["ts"], unit="s")
+    grouped = df.groupby([pd.Grouper(key="czas", freq=freq), "stage"])
+    p95 = (grouped["latency_ms"].quantile(0.95) / 1000).unstack("stage")
+    tokens = grouped["tokens"].sum(min_count=1).unstack("stage")
+    return p95, tokens
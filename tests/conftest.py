@@ -0,0 +1,99 @@
+import ast
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "bench")]
+
+# Minimalne secrets: db/stages czytają je przy imporcie (klient Supabase nie łączy się od razu)
+SECRETS = """
+[SUPABASE]
+URL = "http://127.0.0.1:9"
+KEY = "test"
+
+[dify]
+BASE_URL = "http://127.0.0.1:9/v1"
+"""
+
+
+class FakeClock:
+    """Zegar testowy (jak time.monotonic); `sleep` przesuwa czas zamiast czekać."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.advance(seconds)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope="session")
+def secrets_dir(tmp_path_factory):
+    """Katalog z tymczasowym .streamlit/secrets.toml (st.secrets czyta z katalogu bieżącego)."""
+    workdir = tmp_path_factory.mktemp("secrets")
+    (workdir / ".streamlit").mkdir()
+    (workdir / ".streamlit" / "secrets.toml").write_text(SECRETS, encoding="utf-8")
+    return workdir
+
+
+def import_with_secrets(secrets_dir, name):
+    cwd = os.getcwd()
+    os.chdir(secrets_dir)
+    try:
+        return __import__(name)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def stages(secrets_dir):
+    return import_with_secrets(secrets_dir, "stages")
+
+
+@pytest.fixture(scope="session")
+def db(secrets_dir):
+    return import_with_secrets(secrets_dir, "db")
+
+
+@pytest.fixture
+def fake_supabase(db, monkeypatch):
+    """Baza w pamięci (bench/fake_supabase.py) zamiast klienta Supabase w module db."""
+    from fake_supabase import FakeSupabase
+    fake = FakeSupabase()
+    monkeypatch.setattr(db, "supabase", fake)
+    return fake
+
+
+@pytest.fixture
+def load_app(secrets_dir):
+    """Wybrane funkcje z app.py bez uruchamiania interfejsu (jak bench/run.py), z `st.session_state` jako dict."""
+    def load(*names):
+        with open(os.path.join(REPO_ROOT, "app.py"), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+        nodes += [n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name in names]
+        namespace = {}
+        cwd = os.getcwd()
+        os.chdir(secrets_dir)
+        try:
+            exec(compile(ast.Module(body=nodes, type_ignores=[]), "app.py", "exec"), namespace)
+        finally:
+            os.chdir(cwd)
+        namespace["st"] = SimpleNamespace(session_state={})
+        return namespace
+    return load
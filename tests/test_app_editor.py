@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+
+class FakeTaskTable:
+    """Strona zadań: `rows` to stan bazy, `refresh()` go wczytuje (jak TaskTable)."""
+
+    def __init__(self, columns, rows):
+        self.columns = list(columns)
+        self.rows = rows
+        self.refreshes = 0
+        self.version = 0
+        self.frame = None
+
+    def set_query(self, query, page_size):
+        pass
+
+    def refresh(self, max_age=0):
+        self.refreshes += 1
+        self.version += 1
+        self.frame = pd.DataFrame(self.rows).reindex(columns=self.columns).set_index("id", drop=False)
+
+
+@pytest.fixture
+def app(load_app):
+    app = load_app("fetch_data", "get_task_table", "editor_key", "reset_editor", "editor_has_edits")
+    rows = [{"id": 1, "keyword": "rower", "status_research": ""}, {"id": 2, "keyword": "hulajnoga", "status_research": ""}]
+    app["st"].session_state["task_table"] = FakeTaskTable(app["COLUMN_MAP"], rows)
+    return app
+
+
+def edit(app, edited_rows):
+    app["st"].session_state[app["editor_key"]()] = {"edited_rows": edited_rows, "added_rows": [], "deleted_rows": []}
+
+
+def test_selection_freezes_page(app):
+    table = app["get_task_table"]()
+    app["fetch_data"]()
+    edit(app, {0: {"Select": True}})
+    assert app["editor_has_edits"]()
+    table.rows[0]["status_research"] = "✅ Gotowe"
+    df = app["fetch_data"]()
+    assert table.refreshes == 1
+    assert list(df["Status Research"]) == ["", ""]
+
+
+def test_reset_editor_unfreezes_page(app):
+    table = app["get_task_table"]()
+    app["fetch_data"]()
+    edit(app, {0: {"Select": True}, 1: {"AIO": "nowy"}})
+    del table.rows[0]  # np. usunięcie zaznaczonych
+    app["reset_editor"]()
+    assert not app["editor_has_edits"]()
+    df = app["fetch_data"]()
+    assert table.refreshes == 2
+    assert list(df["ID"]) == [2]
+    assert not df["Select"].any()
+
+
+def test_empty_editor_state_does_not_freeze(app):
+    app["fetch_data"]()
+    edit(app, {})
+    app["fetch_data"]()
+    assert app["get_task_table"]().refreshes == 2
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from artifacts import Artifacts, LocalArtifactStore, is_reference
+
+BIG = "Treść artykułu o rowerach. " * 200
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalArtifactStore(str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def artifacts(store):
+    return Artifacts(store, enabled=True, codec="gz", min_bytes=1024)
+
+
+def stored_files(store):
+    return [name for _, _, files in os.walk(store.root) for name in files]
+
+
+def test_only_full_references_are_references(artifacts):
+    ref = artifacts.save(BIG)
+    assert is_reference(ref)
+    assert not is_reference("artifact:jak wybrać rower")
+    assert not is_reference(ref + " i więcej")
+    assert not is_reference("artifact:gz:" + "0" * 63)
+    assert not is_reference(None)
+
+
+def test_keyword_starting_with_prefix_is_not_resolved(artifacts):
+    records = [{"keyword": "artifact:gz:" + "a" * 64, "final_article": "artifact:krótki tekst"}]
+    artifacts.resolve_many(records)
+    assert records == [{"keyword": "artifact:gz:" + "a" * 64, "final_article": "artifact:krótki tekst"}]
+
+
+def test_small_values_stay_inline(artifacts, store):
+    updates = {"final_article": "krótko", "rag_content": "x" * 1023, "keyword": BIG}
+    assert artifacts.offload(updates) == updates
+    assert stored_files(store) == []
+
+
+def test_disabled_store_does_not_offload(store):
+    updates = {"final_article": BIG}
+    assert Artifacts(store, enabled=False, codec="gz").offload(updates) == updates
+
+
+def test_identical_payloads_are_stored_once(artifacts, store):
+    first = artifacts.offload({"rag_content": BIG, "rag_general": BIG})
+    second = artifacts.offload({"final_article": BIG})
+    assert first["rag_content"] == first["rag_general"] == second["final_article"]
+    assert len(stored_files(store)) == 1
+    counters = artifacts.counters()
+    assert (counters["stored"], counters["deduplicated"]) == (1, 2)
+
+
+def test_resolve_many_on_mixed_rows(artifacts, store):
+    other = "Inna treść. " * 300
+    rows = [
+        artifacts.offload({"id": 1, "final_article": BIG, "brief_html": "<p>krótki</p>"}),
+        artifacts.offload({"id": 2, "final_article": other, "rag_content": BIG}),
+        {"id": 3, "final_article": "stary wiersz z treścią w kolumnie", "info_graph": None},
+    ]
+    # Nowa instancja bez cache - treść musi przyjść z magazynu
+    fresh = Artifacts(store, enabled=False)
+    assert fresh.resolve_many(rows) is rows
+    assert rows == [
+        {"id": 1, "final_article": BIG, "brief_html": "<p>krótki</p>"},
+        {"id": 2, "final_article": other, "rag_content": BIG},
+        {"id": 3, "final_article": "stary wiersz z treścią w kolumnie", "info_graph": None},
+    ]
+
+
+def test_zstd_round_trip(store):
+    pytest.importorskip("zstandard")
+    artifacts = Artifacts(store, enabled=True, codec="zst", min_bytes=10)
+    ref = artifacts.offload({"final_article": BIG})["final_article"]
+    assert ref.startswith("artifact:zst:")
+    assert Artifacts(store).resolve_many([{"final_article": ref}]) == [{"final_article": BIG}]
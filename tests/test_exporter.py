@@ -0,0 +1,63 @@
+import io
+
+import pytest
+
+import exporter
+from exporter import EXPORT_FORMATS, export_tasks
+
+ROWS = [{"id": i, "keyword": f"słowo {i}"} for i in range(1, 6)]
+
+
+def fetch_page(after_id, limit):
+    return [row for row in ROWS if after_id is None or row["id"] > after_id][:limit]
+
+
+class TrackedFile:
+    """Plik tymczasowy z zapamiętanym zamknięciem."""
+    opened = []
+
+    def __init__(self):
+        self.file = io.BytesIO()
+        self.closed = False
+        TrackedFile.opened.append(self)
+
+    def close(self):
+        self.closed = True
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+@pytest.fixture
+def tracked_files(monkeypatch):
+    TrackedFile.opened = []
+    monkeypatch.setattr(exporter.tempfile, "TemporaryFile", TrackedFile)
+    return TrackedFile.opened
+
+
+def test_jsonl_export_pages_through_all_rows():
+    output, count = export_tasks(fetch_page, ["id", "keyword"], "jsonl", page_size=2)
+    with output:
+        lines = output.read().decode("utf-8").splitlines()
+    assert count == 5 and len(lines) == 5
+    assert lines[0] == '{"id": 1, "keyword": "słowo 1"}'
+
+
+def test_parquet_is_offered_only_with_pyarrow():
+    assert ("parquet" in EXPORT_FORMATS) == (exporter.pyarrow is not None)
+
+
+def test_temp_file_is_closed_when_writer_cannot_be_created(monkeypatch, tracked_files):
+    monkeypatch.setattr(exporter, "pyarrow", None)
+    with pytest.raises(ImportError):
+        export_tasks(fetch_page, ["id"], "parquet")
+    assert [f.closed for f in tracked_files] == [True]
+
+
+def test_temp_file_is_closed_when_fetching_fails(tracked_files):
+    def failing_page(after_id, limit):
+        raise ConnectionError("sieć")
+
+    with pytest.raises(ConnectionError):
+        export_tasks(failing_page, ["id"], "csv")
+    assert [f.closed for f in tracked_files] == [True]
@@ -0,0 +1,24 @@
+import pytest
+
+KEYWORDS = ['Buty "Nike" Air', "100% bawełna", "100 x bawełna", "rower_miejski", "rowerXmiejski", r"c:\dane"]
+
+
+@pytest.fixture(params=["rpc", "fallback"])
+def tasks(request, fake_supabase):
+    """Istniejące zadania; `fallback` = baza bez funkcji find_existing_tasks (zapytania ilike)."""
+    if request.param == "fallback":
+        del fake_supabase.rpc_handlers["find_existing_tasks"]
+    for keyword in KEYWORDS:
+        fake_supabase.table("seo_content_tasks").insert({"keyword": keyword, "language": "pl"}).execute()
+    return fake_supabase
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_keyword_matches_only_itself(db, tasks, keyword):
+    found = db.find_existing_tasks([keyword.lower()])
+    assert [record["keyword"] for record in found] == [keyword]
+
+
+def test_lookup_is_case_insensitive(db, tasks):
+    found = db.find_existing_tasks(['buty "nike" air', "rower_miejski"])
+    assert sorted(record["keyword"] for record in found) == ['Buty "Nike" Air', "rower_miejski"]
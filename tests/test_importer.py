@@ -0,0 +1,81 @@
+from importer import MAX_KEYWORD_LENGTH, MERGE, SKIP, import_chunks
+
+
+class FakeTasks:
+    """Tabela zadań w pamięci: wstrzykiwane funkcje lookup/insert/merge dla import_chunks."""
+
+    def __init__(self, rows=()):
+        self.rows = [dict(row) for row in rows]
+        self.lookups = []
+        self.merged = []
+
+    def lookup_existing(self, keywords):
+        self.lookups.append(keywords)
+        return [row for row in self.rows if row["keyword"].lower() in keywords]
+
+    def insert_rows(self, records):
+        for record in records:
+            self.rows.append({"id": len(self.rows) + 1, **record})
+
+    def merge_rows(self, records):
+        self.merged.extend(records)
+
+
+def run_import(chunks, tasks, **kwargs):
+    return import_chunks(chunks, "kw", "lang", "aio", lookup_existing=tasks.lookup_existing,
+                         insert_rows=tasks.insert_rows, merge_rows=tasks.merge_rows, **kwargs)
+
+
+def test_duplicates_within_file_are_skipped_across_chunks():
+    tasks = FakeTasks()
+    chunks = [
+        [{"kw": "Buty  zimowe", "lang": "pl"}, {"kw": "buty zimowe", "lang": "PL"}],
+        [{"kw": "BUTY ZIMOWE", "lang": "pl"}, {"kw": "buty zimowe", "lang": "en"}],
+    ]
+    report = run_import(chunks, tasks)
+    assert (report.read, report.inserted, report.duplicates) == (4, 2, 2)
+    assert [(row["keyword"], row["language"]) for row in tasks.rows] == [("Buty zimowe", "pl"), ("buty zimowe", "en")]
+
+
+def test_missing_language_defaults_to_pl():
+    tasks = FakeTasks()
+    report = run_import([[{"kw": "rower"}, {"kw": "rower", "lang": "pl"}]], tasks)
+    assert (report.inserted, report.duplicates) == (1, 1)
+    assert tasks.rows[0]["language"] == "pl"
+
+
+def test_existing_rows_are_skipped():
+    tasks = FakeTasks([{"id": 1, "keyword": "Rower", "language": "pl", "aio_prompt": ""}])
+    report = run_import([[{"kw": "rower", "lang": "pl", "aio": "nowy"}, {"kw": "rower", "lang": "de"}]], tasks,
+                        on_existing=SKIP)
+    assert (report.inserted, report.merged, report.duplicates) == (1, 0, 1)
+    assert tasks.merged == []
+    assert tasks.lookups == [["rower"]]
+
+
+def test_existing_rows_are_merged_only_with_aio():
+    tasks = FakeTasks([
+        {"id": 1, "keyword": "Rower", "language": "pl"},
+        {"id": 2, "keyword": "Hulajnoga", "language": "pl"},
+    ])
+    chunks = [[{"kw": "rower", "lang": "pl", "aio": "Opisz rower"}, {"kw": "hulajnoga", "lang": "pl", "aio": ""}]]
+    report = run_import(chunks, tasks, on_existing=MERGE)
+    assert (report.inserted, report.merged, report.duplicates) == (0, 1, 1)
+    assert tasks.merged == [{"id": 1, "keyword": "Rower", "aio_prompt": "Opisz rower"}]
+
+
+def test_invalid_rows_are_rejected_with_file_line_numbers():
+    tasks = FakeTasks()
+    chunks = [[{"kw": "ok"}, {"kw": "  "}], [{"kw": None}, {"kw": "x" * (MAX_KEYWORD_LENGTH + 1)}]]
+    report = run_import(chunks, tasks)
+    assert report.inserted == 1
+    assert [line for line, _ in report.rejected] == [3, 4, 5]
+
+
+def test_inserts_are_batched():
+    batches = []
+    tasks = FakeTasks()
+    report = import_chunks([[{"kw": f"słowo {i}"} for i in range(5)]], "kw", lookup_existing=tasks.lookup_existing,
+                           insert_rows=lambda records: batches.append(len(records)), batch_size=2)
+    assert report.inserted == 5
+    assert batches == [2, 2, 1]
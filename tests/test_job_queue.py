@@ -0,0 +1,178 @@
+import threading
+
+from job_queue import DONE, EXHAUSTED_ERROR, FAILED, QUEUED, RUNNING, InMemoryJobQueue
+from worker import Worker
+
+
+# --- InMemoryJobQueue ---
+
+def test_claim_takes_jobs_in_enqueue_order_up_to_limit(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [3, 1, 2])
+    assert queue.claim("research", "w1", limit=2, lease_seconds=60) == [3, 1]
+    assert queue.claim("research", "w2", limit=5, lease_seconds=60) == [2]
+    assert queue.claim("research", "w2", limit=5, lease_seconds=60) == []
+    assert queue.jobs[(3, "research")]["lease_owner"] == "w1"
+
+
+def test_claim_is_per_stage(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1])
+    assert queue.claim("writing", "w1", limit=5) == []
+
+
+def test_expired_lease_returns_job_to_pool(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1])
+    queue.claim("research", "w1", limit=1, lease_seconds=60)
+    clock.advance(59)
+    assert queue.claim("research", "w2", limit=1, lease_seconds=60) == []
+    clock.advance(2)
+    assert queue.claim("research", "w2", limit=1, lease_seconds=60) == [1]
+    assert queue.jobs[(1, "research")]["attempts"] == 2
+
+
+def test_claim_gives_up_after_max_attempts(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1])
+    for _ in range(2):
+        assert queue.claim("research", "w1", limit=1, lease_seconds=10, max_attempts=2) == [1]
+        clock.advance(11)
+    assert queue.claim("research", "w1", limit=1, lease_seconds=10, max_attempts=2) == []
+    job = queue.jobs[(1, "research")]
+    assert job["state"] == FAILED and job["last_error"] == EXHAUSTED_ERROR
+    assert job["lease_owner"] is None and job["lease_expires_at"] is None
+
+
+def test_last_attempt_is_not_failed_while_its_lease_is_valid(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1])
+    queue.claim("research", "w1", limit=1, lease_seconds=10, max_attempts=1)
+    clock.advance(5)
+    assert queue.claim("research", "w2", limit=1, lease_seconds=10, max_attempts=1) == []
+    assert queue.jobs[(1, "research")]["state"] == RUNNING
+
+
+def test_heartbeat_extends_only_own_leases(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1, 2])
+    queue.claim("research", "w1", limit=1, lease_seconds=60)
+    queue.claim("research", "w2", limit=1, lease_seconds=60)
+    clock.advance(50)
+    assert queue.heartbeat("research", "w1", [1, 2], lease_seconds=60) == [1]
+    clock.advance(20)
+    # Zadanie 1 odnowione, zadanie 2 wygasło i może je zająć inny worker
+    assert queue.claim("research", "w3", limit=5, lease_seconds=60) == [2]
+    assert queue.heartbeat("research", "w2", [2], lease_seconds=60) == []
+
+
+def test_complete_requires_lease_owner(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1, 2])
+    queue.claim("research", "w1", limit=2, lease_seconds=60)
+    queue.complete("research", "w2", 1)
+    assert queue.jobs[(1, "research")]["state"] == RUNNING
+    queue.complete("research", "w1", 1)
+    queue.complete("research", "w1", 2, error="boom")
+    assert queue.jobs[(1, "research")]["state"] == DONE
+    assert queue.jobs[(2, "research")]["state"] == FAILED
+    assert queue.jobs[(2, "research")]["last_error"] == "boom"
+
+
+def test_enqueue_does_not_reset_running_job_with_valid_lease(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1, 2])
+    queue.claim("research", "w1", limit=1, lease_seconds=60)
+    assert queue.enqueue("research", [1, 2]) == [2]
+    assert queue.jobs[(1, "research")]["state"] == RUNNING
+    assert queue.claim("research", "w2", limit=5, lease_seconds=60) == [2]
+
+
+def test_enqueue_resets_finished_and_expired_jobs(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1, 2])
+    queue.claim("research", "w1", limit=2, lease_seconds=60)
+    queue.complete("research", "w1", 1, error="boom")
+    clock.advance(61)
+    assert queue.enqueue("research", [1, 2]) == [1, 2]
+    assert all(queue.jobs[(i, "research")]["state"] == QUEUED for i in (1, 2))
+    assert all(queue.jobs[(i, "research")]["attempts"] == 0 for i in (1, 2))
+
+
+# --- Worker ---
+
+def rows_by_id(ids):
+    return [{"ID": task_id} for task_id in ids]
+
+
+class FlakyQueue(InMemoryJobQueue):
+    """Pierwsze `failures` wywołań claim kończy się wyjątkiem (np. chwilowy błąd PostgREST)."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def claim(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("PostgREST niedostępny")
+        return super().claim(*args, **kwargs)
+
+
+def test_worker_survives_claim_errors():
+    queue = FlakyQueue(failures=2)
+    queue.enqueue("research", [1, 2, 3])
+    handled = []
+    worker = Worker(queue, "research", rows_by_id, lambda row, holds_lease: handled.append(row["ID"]),
+                    concurrency=2, poll_interval=0.01, owner="w1")
+    worker.run(once=True)
+    assert sorted(handled) == [1, 2, 3]
+    assert worker.processed == 3
+    assert all(job["state"] == DONE for job in queue.jobs.values())
+
+
+def test_worker_records_handler_errors_as_failed():
+    queue = InMemoryJobQueue()
+    queue.enqueue("research", [1])
+
+    def handle_row(row, holds_lease):
+        raise ValueError("zły wiersz")
+
+    worker = Worker(queue, "research", rows_by_id, handle_row, poll_interval=0.01, owner="w1")
+    worker.run(once=True)
+    assert worker.failed == 1
+    assert queue.jobs[(1, "research")]["state"] == FAILED
+    assert queue.jobs[(1, "research")]["last_error"] == "zły wiersz"
+
+
+def test_worker_drops_result_of_lost_lease(clock):
+    queue = InMemoryJobQueue(clock=clock)
+    queue.enqueue("research", [1])
+    leases = []
+    lock = threading.Lock()
+
+    def handle_row(row, holds_lease):
+        with lock:
+            leases.append(holds_lease())
+            if len(leases) == 1:
+                # Przetwarzanie dłuższe niż dzierżawa: zadanie wraca do kolejki
+                clock.advance(61)
+                leases.append(holds_lease())
+
+    worker = Worker(queue, "research", rows_by_id, handle_row, lease_seconds=60, poll_interval=0.01,
+                    owner="w1", clock=clock)
+    worker.run(once=True)
+    assert leases == [True, False, True]
+    assert worker.lost == 1
+    assert worker.processed == 1
+    assert queue.jobs[(1, "research")]["state"] == DONE
+    assert queue.jobs[(1, "research")]["attempts"] == 2
+
+
+def test_worker_completes_missing_rows_as_failed():
+    queue = InMemoryJobQueue()
+    queue.enqueue("research", [1])
+    worker = Worker(queue, "research", lambda ids: [], lambda row, holds_lease: None, poll_interval=0.01,
+                    owner="w1")
+    worker.run(once=True)
+    assert queue.jobs[(1, "research")]["state"] == FAILED
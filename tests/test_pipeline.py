@@ -0,0 +1,120 @@
+import threading
+import time
+
+from pipeline import BLOCKED, DONE, FAILED, HELD, STAGE_DEPENDENCIES, PipelineScheduler
+
+
+def run_pipeline(run_stage, rows, limits=None, **kwargs):
+    scheduler = PipelineScheduler(run_stage, limits or {stage: 2 for stage in STAGE_DEPENDENCIES}, **kwargs)
+    scheduler.start(rows)
+    assert scheduler.wait(timeout=10)
+    return scheduler
+
+
+def states_of(scheduler, row_id):
+    return {
+        stage: state
+        for stage in STAGE_DEPENDENCIES
+        for state in (DONE, FAILED, BLOCKED, HELD)
+        if any(row["id"] == row_id for row in scheduler.rows_in_state(stage, state))
+    }
+
+
+def test_stages_run_in_dependency_order_with_merged_updates():
+    calls = []
+    lock = threading.Lock()
+
+    def run_stage(row, stage):
+        with lock:
+            calls.append((row["id"], stage))
+        if stage == "writing":
+            assert row["headers"] == f"h{row['id']}" and row["rag"] == f"r{row['id']}"
+        return {stage: f"{stage[0]}{row['id']}"}
+
+    scheduler = run_pipeline(run_stage, [{"id": 1}, {"id": 2}])
+    assert states_of(scheduler, 1) == {stage: DONE for stage in STAGE_DEPENDENCIES}
+    for row_id in (1, 2):
+        order = [stage for i, stage in calls if i == row_id]
+        for stage, deps in STAGE_DEPENDENCIES.items():
+            assert all(order.index(dep) < order.index(stage) for dep in deps)
+    assert scheduler.rows_in_state("writing", DONE)[0]["writing"] in ("w1", "w2")
+
+
+def test_failed_stage_blocks_only_dependent_stages_of_that_row():
+    def run_stage(row, stage):
+        if row["id"] == 1 and stage == "headers":
+            raise RuntimeError("Dify 500")
+        return {}
+
+    scheduler = run_pipeline(run_stage, [{"id": 1}, {"id": 2}])
+    assert states_of(scheduler, 1) == {
+        "research": DONE, "headers": FAILED, "rag": DONE, "brief": BLOCKED, "writing": BLOCKED
+    }
+    assert states_of(scheduler, 2) == {stage: DONE for stage in STAGE_DEPENDENCIES}
+    assert [(row["id"], stage, error) for row, stage, error in scheduler.pop_new_errors()] == [
+        (1, "headers", "Dify 500")
+    ]
+    assert scheduler.pop_new_errors() == []
+
+
+def test_held_stage_holds_dependents_and_lets_others_run():
+    ran = []
+
+    def run_stage(row, stage):
+        ran.append(stage)
+        return {}
+
+    scheduler = run_pipeline(run_stage, [{"id": 1}], hold={"headers"})
+    assert states_of(scheduler, 1) == {
+        "research": DONE, "headers": HELD, "rag": DONE, "brief": HELD, "writing": HELD
+    }
+    assert sorted(ran) == ["rag", "research"]
+
+
+def test_done_stages_are_skipped():
+    ran = []
+
+    def run_stage(row, stage):
+        ran.append(stage)
+        return {}
+
+    done = {"research", "headers"}
+    scheduler = run_pipeline(run_stage, [{"id": 1}], is_done=lambda row, stage: stage in done)
+    assert sorted(ran) == ["brief", "rag", "writing"]
+    assert states_of(scheduler, 1) == {stage: DONE for stage in STAGE_DEPENDENCIES}
+
+
+def test_per_stage_limit_is_respected():
+    running = {stage: 0 for stage in STAGE_DEPENDENCIES}
+    peak = dict(running)
+    lock = threading.Lock()
+
+    def run_stage(row, stage):
+        with lock:
+            running[stage] += 1
+            peak[stage] = max(peak[stage], running[stage])
+        time.sleep(0.01)
+        with lock:
+            running[stage] -= 1
+        return {}
+
+    limits = {"research": 3, "headers": 1, "rag": 2, "brief": 1, "writing": 2}
+    run_pipeline(run_stage, [{"id": i} for i in range(10)], limits=limits)
+    assert all(peak[stage] <= limits[stage] for stage in limits)
+    assert peak["research"] == 3
+
+
+def test_stop_blocks_queued_stages():
+    release = threading.Event()
+
+    def run_stage(row, stage):
+        release.wait(5)
+        return {}
+
+    scheduler = PipelineScheduler(run_stage, {stage: 1 for stage in STAGE_DEPENDENCIES})
+    scheduler.start([{"id": 1}, {"id": 2}])
+    scheduler.stop()
+    release.set()
+    assert scheduler.wait(timeout=10)
+    # Wiersz 1 był w trakcie researchu, wiersz 2 czekał w kolejce
+    assert states_of(scheduler, 2) == {"research": BLOCKED}
@@ -0,0 +1,167 @@
+from resilience import CircuitBreaker, TokenBucket, WorkflowGuard, is_retryable, parse_retry_after
+
+
+# --- is_retryable ---
+
+def test_retryable_statuses():
+    error = {"error": "HTTP"}
+    for status in (408, 429, 500, 502, 503, 504):
+        assert is_retryable(error, {"http_status": status})
+    for status in (400, 401, 404, 422):
+        assert not is_retryable(error, {"http_status": status})
+
+
+def test_connection_error_is_retried_but_read_timeout_is_not():
+    error = {"error": "timeout"}
+    assert is_retryable(error, {"connect_error": True})
+    assert not is_retryable(error, {"connect_error": False})
+    assert not is_retryable(error, {})
+
+
+def test_workflow_failure_and_success_are_not_retried():
+    assert not is_retryable({"error": "Workflow status: failed"}, {"http_status": 200})
+    assert not is_retryable({"data": {"status": "succeeded"}}, {"http_status": 200})
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("jutro") is None
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_failure_ratio_and_probes_after_cooldown(clock):
+    breaker = CircuitBreaker(window=4, threshold=0.5, min_calls=4, cooldown=30, clock=clock)
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    wait, probe = breaker.before_call()
+    assert wait == 30 and not probe
+
+    clock.advance(30)
+    assert breaker.before_call() == (0.0, True)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Tylko jedno wywołanie próbne naraz
+    wait, probe = breaker.before_call()
+    assert wait > 0 and not probe
+
+    breaker.record(True, probe=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.before_call() == (0.0, False)
+
+
+def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker(window=2, threshold=0.5, min_calls=2, cooldown=10, clock=clock)
+    breaker.record(False)
+    breaker.record(False)
+    clock.advance(10)
+    assert breaker.before_call() == (0.0, True)
+    breaker.record(False, probe=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.before_call()[0] == 10
+
+
+def test_breaker_needs_min_calls(clock):
+    breaker = CircuitBreaker(window=20, threshold=0.5, min_calls=10, clock=clock)
+    for _ in range(9):
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+# --- TokenBucket ---
+
+def test_bucket_allows_burst_then_paces_at_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == 0.5
+    assert clock.slept == [0.5]
+
+
+def test_bucket_halves_rate_on_throttle_and_recovers(clock):
+    bucket = TokenBucket(rate=4, burst=4, min_rate=1, clock=clock, sleep=clock.sleep)
+    bucket.on_throttle(retry_after=5)
+    assert bucket.rate == 2
+    assert bucket.acquire() == 5
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 1
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == 4
+
+
+# --- WorkflowGuard ---
+
+def make_guard(clock, **kwargs):
+    return WorkflowGuard(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def scripted(*outcomes):
+    """Funkcja `attempt` zwracająca kolejne (wynik, stats)."""
+    calls = []
+
+    def attempt(stats):
+        result, attempt_stats = outcomes[len(calls)]
+        calls.append(result)
+        stats.update(attempt_stats)
+        return result
+
+    return attempt, calls
+
+
+def test_guard_retries_transient_errors(clock):
+    guard = make_guard(clock, max_attempts=4)
+    attempt, calls = scripted(
+        ({"error": "refused"}, {"connect_error": True}),
+        ({"error": "503"}, {"http_status": 503}),
+        ({"data": {}}, {"http_status": 200}),
+    )
+    result, retries, stats = guard.call("key", attempt)
+    assert result == {"data": {}}
+    assert retries == 2 and len(calls) == 3
+
+
+def test_guard_does_not_retry_read_timeout(clock):
+    guard = make_guard(clock, max_attempts=4)
+    attempt, calls = scripted(({"error": "Read timed out"}, {"connect_error": False}))
+    result, retries, _ = guard.call("key", attempt)
+    assert result == {"error": "Read timed out"}
+    assert retries == 0 and len(calls) == 1
+
+
+def test_guard_stops_after_max_attempts(clock):
+    guard = make_guard(clock, max_attempts=3)
+    attempt, calls = scripted(*[({"error": "502"}, {"http_status": 502})] * 3)
+    _, retries, stats = guard.call("key", attempt)
+    assert retries == 2 and len(calls) == 3
+    assert stats["http_status"] == 502
+
+
+def test_guard_opens_breaker_on_timeouts_and_closes_after_probe(clock):
+    guard = make_guard(clock, max_attempts=1, breaker_cooldown=30, max_pause=60)
+    failure = ({"error": "Read timed out"}, {})
+    attempt, _ = scripted(*[failure] * 10)
+    for _ in range(10):
+        guard.call("key", attempt)
+    assert guard.snapshot()["…key"]["breaker"] == CircuitBreaker.OPEN
+
+    # Po przerwie jedno udane wywołanie próbne zamyka bezpiecznik
+    attempt, calls = scripted(({"data": {}}, {"http_status": 200}))
+    result, _, _ = guard.call("key", attempt)
+    assert result == {"data": {}}
+    assert guard.snapshot()["…key"]["breaker"] == CircuitBreaker.CLOSED
+
+
+def test_guard_gives_up_when_pause_exceeds_limit(clock):
+    guard = make_guard(clock, max_attempts=1, breaker_cooldown=120, max_pause=60)
+    attempt, _ = scripted(*[({"error": "500"}, {"http_status": 500})] * 10)
+    for _ in range(10):
+        guard.call("key", attempt)
+    attempt, calls = scripted(({"data": {}}, {"http_status": 200}))
+    result, _, _ = guard.call("key", attempt)
+    assert "bezpiecznik" in result["error"]
+    assert calls == []
@@ -0,0 +1,103 @@
+import pytest
+
+
+@pytest.fixture(params=["rpc", "fallback"])
+def tasks(request, fake_supabase):
+    """Zadania w bazie w pamięci; `fallback` = baza bez funkcji update_task_cells."""
+    if request.param == "fallback":
+        del fake_supabase.rpc_handlers["update_task_cells"]
+    for keyword in ("rower", "hulajnoga", "rolki"):
+        fake_supabase.table("seo_content_tasks").insert(
+            {"keyword": keyword, "aio_prompt": "", "instructions": None, "status_headers": "Oczekuje"}
+        ).execute()
+    return fake_supabase
+
+
+def row(tasks, row_id):
+    return tasks.tables["seo_content_tasks"][(row_id,)]
+
+
+def test_saves_unchanged_cells(db, tasks):
+    saved, conflicts = db.bulk_update_cells({1: {"aio_prompt": (None, "Opisz rower"), "instructions": (None, "krótko")}})
+    assert (saved, conflicts) == (1, [])
+    assert row(tasks, 1)["aio_prompt"] == "Opisz rower"
+    assert row(tasks, 1)["instructions"] == "krótko"
+
+
+def test_cell_changed_in_db_is_skipped_as_conflict(db, tasks):
+    # Worker zapisał status po wczytaniu tabeli do edytora
+    tasks.table("seo_content_tasks").update({"status_headers": "✅ Gotowe"}).eq("id", 1).execute()
+    saved, conflicts = db.bulk_update_cells({
+        1: {"status_headers": ("Oczekuje", "Oczekuje ręcznie"), "aio_prompt": ("", "Opisz rower")},
+    })
+    assert (saved, conflicts) == (1, [(1, "status_headers")])
+    assert row(tasks, 1)["status_headers"] == "✅ Gotowe"
+    assert row(tasks, 1)["aio_prompt"] == "Opisz rower"
+
+
+def test_row_deleted_before_save_is_not_recreated(db, tasks):
+    tasks.table("seo_content_tasks").delete().eq("id", 2).execute()
+    saved, conflicts = db.bulk_update_cells({
+        1: {"aio_prompt": ("", "a")},
+        2: {"aio_prompt": ("", "b"), "instructions": (None, "c")},
+    })
+    assert (saved, conflicts) == (1, [(2, None)])
+    assert (2,) not in tasks.tables["seo_content_tasks"]
+
+
+def test_rows_with_different_column_sets_keep_other_columns(db, tasks):
+    tasks.table("seo_content_tasks").update({"instructions": "stare"}).eq("id", 1).execute()
+    saved, conflicts = db.bulk_update_cells({
+        1: {"aio_prompt": ("", "a")},
+        2: {"instructions": (None, "b")},
+        3: {"aio_prompt": ("", "a"), "instructions": (None, "b")},
+    })
+    assert (saved, conflicts) == (3, [])
+    assert (row(tasks, 1)["aio_prompt"], row(tasks, 1)["instructions"]) == ("a", "stare")
+    assert (row(tasks, 2)["aio_prompt"], row(tasks, 2)["instructions"]) == ("", "b")
+    assert (row(tasks, 3)["aio_prompt"], row(tasks, 3)["instructions"]) == ("a", "b")
+
+
+def test_fallback_groups_identical_cells_into_one_update(db, fake_supabase):
+    del fake_supabase.rpc_handlers["update_task_cells"]
+    for keyword in ("a", "b", "c"):
+        fake_supabase.table("seo_content_tasks").insert({"keyword": keyword, "status_rag": "❌ Błąd"}).execute()
+    queries = fake_supabase.queries
+    saved, conflicts = db.bulk_update_cells({i: {"status_rag": ("❌ Błąd", "Oczekuje")} for i in (1, 2, 3)})
+    assert (saved, conflicts) == (3, [])
+    # Nieudane RPC + jeden warunkowy UPDATE dla trzech wierszy
+    assert fake_supabase.queries - queries == 2
+
+
+def test_other_errors_are_not_hidden_by_fallback(db, fake_supabase):
+    def broken(db, p_cells):
+        raise ConnectionError("sieć")
+
+    fake_supabase.rpc_handlers["update_task_cells"] = broken
+    with pytest.raises(ConnectionError):
+        db.bulk_update_cells({1: {"aio_prompt": ("", "a")}})
+
+
+# --- diff_editor_changes (app.py) ---
+
+@pytest.fixture
+def diff_editor_changes(load_app):
+    return load_app("diff_editor_changes")["diff_editor_changes"]
+
+
+def test_diff_maps_editor_positions_to_snapshot_ids(diff_editor_changes):
+    snapshot = {
+        "ids": [7, 3],
+        "cells": {7: {"aio_prompt": "", "instructions": None}, 3: {"aio_prompt": "stare", "instructions": None}},
+    }
+    edited_rows = {1: {"AIO": "nowe"}, 0: {"Dodatkowe instrukcje": "x"}}
+    assert diff_editor_changes(snapshot, edited_rows) == {
+        3: {"aio_prompt": ("stare", "nowe")},
+        7: {"instructions": (None, "x")},
+    }
+
+
+def test_diff_ignores_selection_and_unchanged_cells(diff_editor_changes):
+    snapshot = {"ids": [1], "cells": {1: {"aio_prompt": None, "instructions": "a"}}}
+    edited_rows = {0: {"Select": True, "AIO": "", "Dodatkowe instrukcje": "a"}}
+    assert diff_editor_changes(snapshot, edited_rows) == {}
@@ -0,0 +1,28 @@
+def article_of(sections):
+    return "\n\n".join(f"<h2>{h2}</h2>\n{body}" for h2, body in sections)
+
+
+def test_completed_sections_returns_all_sections_in_order(stages):
+    sections = [("Wstęp", "<p>a</p>"), ("Rozwinięcie", "<p>b</p>"), ("Podsumowanie", "<p>c</p>")]
+    assert stages.completed_sections(article_of(sections), [h2 for h2, _ in sections]) == sections
+
+
+def test_completed_sections_stops_at_failed_section(stages):
+    sections = [("A", "<p>a</p>"), ("B", f"{stages.WRITING_ERROR_MARKER} timeout]"), ("C", "<p>c</p>")]
+    assert stages.completed_sections(article_of(sections), ["A", "B", "C"]) == [("A", "<p>a</p>")]
+
+
+def test_completed_sections_stops_when_first_header_changed(stages):
+    article = article_of([("A", "<p>a</p>"), ("B", "<p>b</p>")])
+    assert stages.completed_sections(article, ["Inny", "B"]) == []
+
+
+def test_completed_sections_of_partial_article(stages):
+    article = article_of([("A", "<p>a</p>"), ("B", "<p>b</p>")])
+    assert stages.completed_sections(article, ["A", "B", "C"]) == [("A", "<p>a</p>"), ("B", "<p>b</p>")]
+
+
+def test_completed_sections_of_empty_article(stages):
+    assert stages.completed_sections("", ["A"]) == []
+    assert stages.completed_sections(None, ["A"]) == []
+    assert stages.completed_sections(float("nan"), ["A"]) == []
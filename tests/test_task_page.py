@@ -0,0 +1,42 @@
+import pytest
+from postgrest.exceptions import APIError
+
+
+def missing_view(db):
+    raise APIError({"code": "PGRST205", "message": "Could not find the table 'public.seo_content_tasks_list'"})
+
+
+@pytest.fixture
+def tasks(fake_supabase):
+    for keyword in ("a", "b", "c"):
+        fake_supabase.table("seo_content_tasks").insert({"keyword": keyword, "final_article": "x" * 500}).execute()
+    return fake_supabase
+
+
+def test_missing_view_falls_back_to_light_columns_with_sort_column(db, tasks):
+    tasks.views["seo_content_tasks_list"] = missing_view
+    query = {"sort": "updated"}
+    page = db.fetch_task_page(query, limit=2)
+    assert [record["id"] for record in page] == [3, 2]
+    assert "final_article" not in page[0]
+    cursor = db.task_cursor(query, page[-1])
+    assert cursor[0] is not None
+    assert [record["id"] for record in db.fetch_task_page(query, after=cursor, limit=2)] == [1]
+
+
+def test_missing_view_fallback_for_changed_rows(db, tasks):
+    tasks.views["seo_content_tasks_list"] = missing_view
+    records = db.fetch_task_rows([1, 2], updated_since="2000-01-01T00:00:00+00:00")
+    assert sorted(record["id"] for record in records) == [1, 2]
+    assert all("updated_at" in record and "final_article" not in record for record in records)
+
+
+def test_other_errors_do_not_switch_to_base_table(db, tasks):
+    def unreachable(db):
+        raise ConnectionError("sieć")
+
+    tasks.views["seo_content_tasks_list"] = unreachable
+    with pytest.raises(ConnectionError):
+        db.fetch_task_page({"sort": "newest"})
+    with pytest.raises(ConnectionError):
+        db.fetch_task_rows([1])
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+
+from task_table import TaskTable
+
+COLUMNS = ["id", "keyword", "status", "updated_at"]
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeView:
+    """Widok zadań w pamięci: strona = kolejne id rosnąco (kursor = ostatnie id), zegar bazy w `ts`."""
+
+    def __init__(self, count):
+        self.ts = START
+        self.rows = {}
+        self.calls = []
+        for i in range(1, count + 1):
+            self.write(i, keyword=f"słowo {i}", status="")
+
+    def write(self, row_id, **values):
+        self.ts += timedelta(seconds=1)
+        row = self.rows.setdefault(row_id, {"id": row_id})
+        row.update(values, updated_at=self.ts.isoformat())
+
+    def fetch_page(self, query, after, limit, keys_only):
+        self.calls.append(("page", keys_only))
+        ids = sorted(i for i in self.rows if after is None or i > after)[:limit]
+        return [{"id": i} if keys_only else dict(self.rows[i]) for i in ids]
+
+    def fetch_rows(self, ids, since):
+        self.calls.append(("rows", sorted(ids), since))
+        return [dict(self.rows[i]) for i in ids if i in self.rows and (since is None or self.rows[i]["updated_at"] >= since)]
+
+    def count_rows(self, query):
+        return len(self.rows)
+
+
+def make_table(view, clock, page_size=3, **kwargs):
+    table = TaskTable(COLUMNS, view.fetch_page, lambda query, record: record["id"], view.fetch_rows,
+                      view.count_rows, page_size, clock=clock, **kwargs)
+    table.refresh()
+    view.calls.clear()
+    return table
+
+
+def test_first_refresh_loads_full_page(clock):
+    view = FakeView(5)
+    table = make_table(view, clock)
+    assert list(table.frame.index) == [1, 2, 3]
+    assert table.total == 5 and table.version == 1 and table.has_next
+
+
+def test_unchanged_delta_keeps_version(clock):
+    view = FakeView(5)
+    table = make_table(view, clock)
+    assert table.refresh() == 0
+    assert table.version == 1
+    assert view.calls[0] == ("page", True)
+
+
+def test_delta_merges_changed_rows_only(clock):
+    view = FakeView(5)
+    table = make_table(view, clock)
+    view.write(2, status="✅ Gotowe")
+    view.write(5, status="✅ Gotowe")  # spoza strony - ignorowany
+    assert table.refresh() == 1
+    assert table.frame.loc[2, "status"] == "✅ Gotowe"
+    assert list(table.frame.index) == [1, 2, 3]
+    assert table.version == 2
+    # Zmiany od ostatnio widzianego updated_at na stronie (wiersz 3) z zapasem na spóźnione transakcje
+    _, ids, since = view.calls[1]
+    assert ids == [1, 2, 3]
+    assert since == (START + timedelta(seconds=3) - timedelta(seconds=5)).isoformat()
+
+
+def test_rows_entering_and_leaving_page_are_fetched_in_full(clock):
+    view = FakeView(5)
+    table = make_table(view, clock)
+    del view.rows[2]
+    assert table.refresh() == 2  # wiersz 4 wszedł na stronę, wiersz 2 z niej wypadł
+    assert list(table.frame.index) == [1, 3, 4]
+    assert table.frame.loc[4, "keyword"] == "słowo 4"
+    assert ("rows", [4], None) in view.calls
+    assert table.total == 4
+    assert table.version == 2
+
+
+def test_max_age_skips_refresh(clock):
+    view = FakeView(3)
+    table = make_table(view, clock)
+    view.write(1, status="x")
+    assert table.refresh(max_age=5) == 0
+    assert view.calls == []
+    clock.advance(5)
+    assert table.refresh(max_age=5) == 1
+
+
+def test_periodic_full_resync(clock):
+    view = FakeView(3)
+    table = make_table(view, clock, resync_seconds=60)
+    clock.advance(60)
+    table.refresh()
+    assert view.calls[0] == ("page", False)
+    assert table.version == 1
+
+
+def test_navigation_and_query_change_reload_page(clock):
+    view = FakeView(5)
+    table = make_table(view, clock)
+    table.next_page()
+    table.refresh()
+    assert list(table.frame.index) == [4, 5]
+    assert table.page == 1 and not table.has_next
+    table.prev_page()
+    table.refresh()
+    assert list(table.frame.index) == [1, 2, 3]
+
+    table.next_page()
+    table.set_query({"status": "x"}, 3)
+    assert table.page == 0 and table.total is None
+    table.refresh()
+    assert view.calls[-2] == ("page", False)
@@ -0,0 +1,235 @@
+"""Worker kolejki: przetwarza etapy poza sesją Streamlit.
+
+Przykład:
+    python worker.py --stage research --concurrency 8
+    python worker.py --stage writing --once      # opróżnij kolejkę i zakończ
+
+Można uruchomić dowolnie wiele workerów (także na różnych maszynach) - zadania
+są zajmowane atomowo z dzierżawą, więc żaden wiersz nie zostanie przetworzony
+podwójnie, a zadania martwego workera wracają do kolejki po wygaśnięciu dzierżawy.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from job_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+
+log = logging.getLogger("worker")
+
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class Worker:
+    """Pętla: zajmij wolne sloty -> przetwarzaj w puli wątków -> heartbeat -> zakończ zadania.
+
+    `handle_row(row, holds_lease)` przetwarza wiersz; `holds_lease()` mówi, czy dzierżawa jest
+    nadal ważna - po jej utracie wynik nie może trafić do bazy. Błędy kolejki i bazy (claim,
+    pobranie wierszy, heartbeat) są logowane, a pętla ponawia je z rosnącym odstępem.
+    """
+
+    def __init__(self, queue, stage, fetch_rows, handle_row, concurrency=4,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 poll_interval=5.0, owner=None, clock=time.monotonic):
+        self.queue = queue
+        self.stage = stage
+        self.fetch_rows = fetch_rows
+        self.handle_row = handle_row
+        self.concurrency = max(1, int(concurrency))
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.clock = clock
+        self.processed = 0
+        self.failed = 0
+        self.lost = 0
+        self._stop = threading.Event()
+        self._in_flight = {}   # task_id -> True (w puli) / False (zajęte, wiersz jeszcze nie pobrany)
+        self._lease_until = {}  # task_id -> termin dzierżawy wg zegara workera (ostrożnie: od chwili przed RPC)
+        self._lock = threading.Lock()
+
+    def stop(self, *_):
+        """Łagodne zatrzymanie: nie zajmuje nowych zadań, trwające kończy."""
+        log.info("Zatrzymywanie workera %s...", self.owner)
+        self._stop.set()
+
+    def holds_lease(self, task_id):
+        with self._lock:
+            return self.clock() < self._lease_until.get(task_id, 0)
+
+    def _release(self, task_id):
+        with self._lock:
+            self._in_flight.pop(task_id, None)
+            self._lease_until.pop(task_id, None)
+
+    def _process(self, row):
+        task_id = row['ID']
+        error = None
+        try:
+            self.handle_row(row, lambda: self.holds_lease(task_id))
+        except Exception as e:
+            error = str(e)[:500]
+        if not self.holds_lease(task_id):
+            # Zadanie mógł już zająć inny worker - nie zamykamy go i nie liczymy wyniku
+            self._release(task_id)
+            with self._lock:
+                self.lost += 1
+            log.warning("[%s] #%s dzierżawa utracona - wynik porzucony", self.stage, task_id)
+            return
+        try:
+            self.queue.complete(self.stage, self.owner, task_id, error)
+        except Exception:
+            # Dzierżawa wygaśnie i zadanie wróci do kolejki
+            log.exception("[%s] #%s nie udało się zamknąć zadania", self.stage, task_id)
+        finally:
+            self._release(task_id)
+            with self._lock:
+                if error:
+                    self.failed += 1
+                else:
+                    self.processed += 1
+        if error:
+            log.warning("[%s] #%s błąd: %s", self.stage, task_id, error)
+        else:
+            log.info("[%s] #%s gotowe", self.stage, task_id)
+
+    def _claim(self, pool):
+        """Zajmuje wolne sloty i uruchamia zadania. Zajęte, a niepobrane (błąd bazy) próbuje w kolejnym obiegu."""
+        with self._lock:
+            free = self.concurrency - len(self._in_flight)
+        if free > 0:
+            requested_at = self.clock()
+            claimed = self.queue.claim(self.stage, self.owner, free, self.lease_seconds, self.max_attempts)
+            with self._lock:
+                for task_id in claimed:
+                    self._in_flight[task_id] = False
+                    self._lease_until[task_id] = requested_at + self.lease_seconds
+        with self._lock:
+            waiting = [task_id for task_id, started in self._in_flight.items() if not started]
+        if not waiting:
+            return 0
+        rows = {row['ID']: row for row in self.fetch_rows(waiting)}
+        for task_id in waiting:
+            row = rows.get(task_id)
+            if not self.holds_lease(task_id):
+                # Dzierżawa wygasła, zanim udało się pobrać wiersz - zadanie wraca do kolejki
+                self._release(task_id)
+                continue
+            if row is None:
+                # Wiersz usunięty po dodaniu do kolejki
+                self.queue.complete(self.stage, self.owner, task_id, "Brak wiersza w seo_content_tasks")
+                self._release(task_id)
+                continue
+            with self._lock:
+                self._in_flight[task_id] = True
+            pool.submit(self._process, row)
+        return len(waiting)
+
+    def _heartbeat(self):
+        with self._lock:
+            task_ids = list(self._in_flight)
+        if not task_ids:
+            return
+        requested_at = self.clock()
+        try:
+            owned = set(self.queue.heartbeat(self.stage, self.owner, task_ids, self.lease_seconds))
+        except Exception:
+            # Bez odnowienia dzierżawy wygasają wg _lease_until, a zapis wyników jest blokowany
+            log.exception("[%s] heartbeat nieudany", self.stage)
+            return
+        lost = [t for t in task_ids if t not in owned]
+        with self._lock:
+            for task_id in task_ids:
+                if task_id in owned:
+                    self._lease_until[task_id] = requested_at + self.lease_seconds
+                elif task_id in self._lease_until:
+                    self._lease_until[task_id] = 0
+        if lost:
+            log.warning("[%s] utracone dzierżawy (wyniki nie zostaną zapisane): %s", self.stage, lost)
+
+    def run(self, once=False):
+        """Działa do `stop()`; z `once=True` kończy, gdy kolejka i pula są puste."""
+        log.info("Worker %s: etap=%s, równoległość=%d", self.owner, self.stage, self.concurrency)
+        heartbeat_every = max(1.0, self.lease_seconds / 3)
+        last_heartbeat = self.clock()
+        backoff = 0.0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"worker-{self.stage}") as pool:
+            while not self._stop.is_set():
+                try:
+                    claimed = self._claim(pool)
+                    backoff = 0.0
+                except Exception:
+                    # Przejściowy błąd PostgREST / sieci nie zatrzymuje workera
+                    backoff = min(MAX_BACKOFF_SECONDS, backoff * 2 or self.poll_interval)
+                    log.exception("[%s] błąd kolejki - ponowienie za %.1f s", self.stage, backoff)
+                    claimed = 0
+                if self.clock() - last_heartbeat >= heartbeat_every:
+                    self._heartbeat()
+                    last_heartbeat = self.clock()
+                with self._lock:
+                    idle = not self._in_flight
+                if once and idle and not claimed and not backoff:
+                    break
+                self._stop.wait(backoff or (0.2 if claimed else self.poll_interval))
+            # Trwające zadania kończymy (z heartbeatem), nowych nie zajmujemy
+            while True:
+                with self._lock:
+                    if not any(self._in_flight.values()):
+                        break
+                if self.clock() - last_heartbeat >= heartbeat_every:
+                    self._heartbeat()
+                    last_heartbeat = self.clock()
+                time.sleep(0.2)
+        log.info("Worker %s zakończony. Sukces: %d, Błędy: %d, Utracone dzierżawy: %d",
+                 self.owner, self.processed, self.failed, self.lost)
+
+
+def main():
+    from db import supabase, fetch_rows_by_ids
+    from job_queue import SupabaseJobQueue
+    from dify_cache import use_cache_modes
+    from writing_context import use_writing_context
+    from stages import (
+        STAGES, STAGE_DEFS, configured_cache_modes, configured_concurrency, configured_writing_context, process_row,
+        use_write_guard
+    )
+
+    parser = argparse.ArgumentParser(description="Worker kolejki SEO Content Factory")
+    parser.add_argument("--stage", required=True, choices=STAGES)
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="maks. wierszy w locie (domyślnie jak w secrets [concurrency])")
+    parser.add_argument("--lease", type=int, default=DEFAULT_LEASE_SECONDS, help="czas dzierżawy w sekundach")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--poll", type=float, default=5.0, help="odstęp odpytywania pustej kolejki (s)")
+    parser.add_argument("--once", action="store_true", help="zakończ po opróżnieniu kolejki")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    concurrency = args.concurrency or configured_concurrency(args.stage)
+    process_func, status_col_db = STAGE_DEFS[args.stage]
+    cache_modes = configured_cache_modes()
+    writing_context = configured_writing_context()
+
+    def handle_row(row, holds_lease):
+        with use_cache_modes(cache_modes), use_writing_context(writing_context), use_write_guard(holds_lease):
+            process_row(row, process_func, status_col_db)
+
+    worker = Worker(
+        SupabaseJobQueue(supabase), args.stage, fetch_rows_by_ids, handle_row,
+        concurrency=concurrency, lease_seconds=args.lease, max_attempts=args.max_attempts,
+        poll_interval=args.poll
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import contextvars
+import re
+from contextlib import contextmanager
+
+# --- KONTEKST "done" DLA PĘTLI PISANIA ---
+# Przekazywanie całego dotychczasowego artykułu przy każdej sekcji daje koszt
+# kwadratowy względem liczby nagłówków. Strategie poniżej ograniczają wejście
+# "done" do stałego rozmiaru, zachowując informację, co zostało już napisane.
+
+FULL = "full"        # cały dotychczasowy artykuł (dawne zachowanie)
+WINDOW = "window"    # ostatnie N sekcji w całości + same nagłówki wcześniejszych
+OUTLINE = "outline"  # tylko nagłówki napisanych sekcji
+SUMMARY = "summary"  # nagłówek + pierwsze zdania każdej sekcji (streszczenie bez LLM)
+CONTEXT_MODES = [FULL, WINDOW, OUTLINE, SUMMARY]
+
+# parallel/parallel_workers/stitch: szkice wszystkich sekcji naraz z konspektu
+# i końcowe usunięcie powtórzeń (tryb równoległy, patrz stage_writing)
+# reuse_sections: ponowne użycie sekcji niezmienionych nagłówków (seo_article_sections)
+# retrieval/knowledge_bytes/top_k/keywords_limit: wybór fragmentów RAG i fraz
+# dla każdego nagłówka (knowledge_index.py) zamiast pełnych pól przy każdej sekcji
+DEFAULT_CONTEXT = {
+    "mode": WINDOW, "window": 3, "budget_bytes": 24000,
+    "retrieval": True, "knowledge_bytes": 12000, "top_k": 12, "keywords_limit": 40,
+    "parallel": False, "parallel_workers": 4, "stitch": True,
+    "reuse_sections": True,
+}
+SUMMARY_CHARS = 300
+
+_context = contextvars.ContextVar("writing_context", default=None)
+
+
+@contextmanager
+def use_writing_context(settings):
+    """Ustawia ustawienia kontekstu pisania (patrz DEFAULT_CONTEXT) dla bieżącego wątku/zadania."""
+    token = _context.set(dict(settings))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    settings = dict(DEFAULT_CONTEXT)
+    settings.update(_context.get() or {})
+    return settings
+
+
+def format_section(h2, section):
+    return f"<h2>{h2}</h2>\n{section}\n\n"
+
+
+def render_article(sections):
+    return "".join(format_section(h2, body) for h2, body in sections)
+
+
+def summarize_section(body, limit=SUMMARY_CHARS):
+    """Pierwsze zdania sekcji (bez HTML), przycięte do `limit` znaków."""
+    text = " ".join(re.sub(r"<[^>]+>", " ", body or "").split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    return cut[:sentence_end + 1] if sentence_end > limit // 3 else cut.rsplit(" ", 1)[0] + "…"
+
+
+def _outline(h2):
+    return f"<h2>{h2}</h2>\n"
+
+
+def build_done_context(sections, mode=FULL, window=3, budget_bytes=None):
+    """Buduje wejście "done" z listy (nagłówek, treść) już napisanych sekcji."""
+    if mode == OUTLINE:
+        parts = [_outline(h2) for h2, _ in sections]
+    elif mode == SUMMARY:
+        parts = [f"<h2>{h2}</h2>\n<p>{summarize_section(body)}</p>\n\n" for h2, body in sections]
+    elif mode == WINDOW:
+        split = max(0, len(sections) - max(0, int(window)))
+        parts = [_outline(h2) for h2, _ in sections[:split]]
+        parts += [format_section(h2, body) for h2, body in sections[split:]]
+    else:
+        parts = [format_section(h2, body) for h2, body in sections]
+
+    if budget_bytes:
+        # Budżet: najpierw odrzucamy najstarsze części, ostatnią w razie potrzeby przycinamy od początku
+        sizes = [len(p.encode("utf-8")) for p in parts]
+        total = sum(sizes)
+        while len(parts) > 1 and total > budget_bytes:
+            total -= sizes.pop(0)
+            parts.pop(0)
+        if parts and total > budget_bytes:
+            tail = parts[0].encode("utf-8")[-int(budget_bytes):]
+            parts = [tail.decode("utf-8", errors="ignore")]
+    return "".join(parts)
+
+
+_BLOCK_SPLIT_RE = re.compile(r"(</p>\s*|</li>\s*|\n\s*\n)", re.IGNORECASE)
+MIN_DUPLICATE_CHARS = 40
+
+
+def _block_key(block):
+    return " ".join(re.sub(r"<[^>]+>", " ", block).split()).casefold()
+
+
+def dedupe_sections(sections):
+    """Usuwa akapity powtórzone w późniejszych sekcjach (szkice równoległe nie widzą się nawzajem).
+
+    Zwraca (sekcje, liczba usuniętych akapitów). Krótkie bloki (< MIN_DUPLICATE_CHARS) zostają.
+    """
+    seen = set()
+    removed = 0
+    result = []
+    for h2, body in sections:
+        parts = _BLOCK_SPLIT_RE.split(body or "")
+        kept = []
+        dropped = False
+        for i in range(0, len(parts), 2):
+            block = parts[i]
+            separator = parts[i + 1] if i + 1 < len(parts) else ""
+            key = _block_key(block + separator)
+            if len(key) >= MIN_DUPLICATE_CHARS:
+                if key in seen:
+                    removed += 1
+                    dropped = True
+                    continue
+                seen.add(key)
+            kept.append(block + separator)
+        text = "".join(kept)
+        result.append((h2, text.rstrip() if dropped else text))
+    return result, removed